@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Wire format benchmark: JSON vs binary frames (python-publisher/wire.py)
+Builds the same messages in both formats and measures, per message, the payload size
+(raw and gzip-compressed in Kafka-sized batches) and the CPU spent at each hop:
+publisher encoding, bridge key extraction and consumer decoding into insert rows.
+Checks that both formats decode to the same rows. Needs the dependencies of the
+three services (paho-mqtt, kafka-python, msgspec, numpy).
+
+    python benchmark_wire.py [--data-dir DIR] [--messages N]
+"""
+
+import argparse
+import gzip
+import os
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+for service in ('pipeline-common', 'python-publisher', 'mqtt-kafka-bridge', 'kafka-mysql-consumer'):
+    sys.path.insert(0, os.path.join(ROOT, service))
+
+from benchmark_publisher import sample_indices, write_synthetic_corpus  # noqa: E402
+from bridge import extract_user_id, frame_user_id  # noqa: E402
+from publisher import TwitterDataPublisher  # noqa: E402
+import records  # noqa: E402
+
+SOURCE = ('twitter-tweets', 0, 0)
+KAFKA_BATCH = 500
+
+
+def per_message_us(function, items, repeat=3):
+    """Best of repeat runs of function over items, in microseconds per item"""
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for item in items:
+            function(item)
+        best = min(best, time.perf_counter() - started)
+    return best / len(items) * 1e6
+
+
+def compressed_size(payloads):
+    """Average gzip-compressed bytes per message over batches of KAFKA_BATCH messages"""
+    total = 0
+    for start in range(0, len(payloads), KAFKA_BATCH):
+        total += len(gzip.compress(b''.join(payloads[start:start + KAFKA_BATCH]), compresslevel=6))
+    return total / len(payloads)
+
+
+def measure(wire_format, data_dir, indices):
+    publisher = TwitterDataPublisher(data_dir=data_dir, snapshot_path='', wire_format=wire_format)
+    start = datetime(2026, 1, 1)
+    moments = [start + timedelta(microseconds=i * 1237) for i in range(len(indices))]
+    jobs = list(zip(indices, moments))
+    # Warm up lazily built state (per-second timestamp, frame templates, profile cache)
+    payloads = [publisher.render_message(user_idx, tweet_idx, now) for (user_idx, tweet_idx), now in jobs]
+    records._profiles.clear()
+
+    extract = frame_user_id if wire_format == 'avro' else extract_user_id
+    results = {
+        'bytes': sum(len(payload) for payload in payloads) / len(payloads),
+        'gzip_bytes': compressed_size(payloads),
+        'encode_us': per_message_us(lambda job: publisher.render_message(job[0][0], job[0][1], job[1]), jobs),
+        'bridge_us': per_message_us(extract, payloads),
+        'decode_us': per_message_us(lambda payload: records.decode_tweet(payload).as_row(SOURCE), payloads),
+    }
+    rows = [records.decode_tweet(payload).as_row(SOURCE) for payload in payloads]
+    return results, rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="JSON vs binary frame size and CPU benchmark")
+    parser.add_argument('--data-dir', help="Corpus directory (default: generate a synthetic one)")
+    parser.add_argument('--users', type=int, default=8328, help="Synthetic users to generate")
+    parser.add_argument('--tweets-per-user', type=int, default=20, help="Average synthetic tweets per user")
+    parser.add_argument('--messages', type=int, default=50000, help="Messages per format")
+    args = parser.parse_args()
+
+    tmp_dir = None
+    data_dir = args.data_dir
+    if not data_dir:
+        tmp_dir = tempfile.mkdtemp(prefix='wire-bench-')
+        write_synthetic_corpus(tmp_dir, args.users, args.tweets_per_user)
+        data_dir = tmp_dir
+
+    try:
+        probe = TwitterDataPublisher(data_dir=data_dir, snapshot_path='')
+        indices = sample_indices(probe.corpus, args.messages)
+        json_results, json_rows = measure('json', data_dir, indices)
+        avro_results, avro_rows = measure('avro', data_dir, indices)
+    finally:
+        if tmp_dir:
+            shutil.rmtree(tmp_dir)
+
+    mismatches = sum(a != b for a, b in zip(json_rows, avro_rows))
+    print(f"\n{args.messages} messages, decoded rows identical: {mismatches == 0}"
+          + (f" ({mismatches} differ)" if mismatches else ""))
+    print(f"\n{'':<34}{'json':>10}{'avro':>10}{'change':>10}")
+    labels = [
+        ('bytes', "bytes / message"),
+        ('gzip_bytes', f"gzip bytes / message ({KAFKA_BATCH}/batch)"),
+        ('encode_us', "publisher encode (us)"),
+        ('bridge_us', "bridge key extraction (us)"),
+        ('decode_us', "consumer decode + row (us)"),
+    ]
+    for key, label in labels:
+        before, after = json_results[key], avro_results[key]
+        print(f"{label:<34}{before:>10.2f}{after:>10.2f}{(after - before) / before:>+10.0%}")
+    if mismatches:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,24 +1,183 @@
 CREATE DATABASE IF NOT EXISTS twitter_analytics;
 USE twitter_analytics;
 
-CREATE TABLE IF NOT EXISTS tweets (
-    id BIGINT AUTO_INCREMENT PRIMARY KEY,
-    user_id BIGINT NOT NULL,
+-- User dimension: the profile fields the publisher repeats in every message, one row per user.
+-- The consumer upserts a row only when a user's attributes change (kafka-mysql-consumer/users.py).
+CREATE TABLE IF NOT EXISTS users (
+    user_id BIGINT PRIMARY KEY,
     screen_name VARCHAR(255),
-    tweet TEXT,
-    timestamp DATETIME,
-    iso_timestamp DATETIME,
     location VARCHAR(255),
     verified BOOLEAN DEFAULT FALSE,
     statuses_count BIGINT DEFAULT 0,
     mbti_personality VARCHAR(10),
     total_retweet_count BIGINT DEFAULT 0,
     total_favorite_count BIGINT DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    INDEX idx_screen_name (screen_name),
+    INDEX idx_mbti (mbti_personality)
+);
+
+-- One row per tweet; user attributes live in users (the tweets view joins them back).
+-- RANGE partitioned on timestamp: `python partitions.py maintain` (kafka-mysql-consumer) splits daily
+-- partitions off p_future ahead of time and drops expired ones, and time-bounded queries only read the
+-- partitions they need. MySQL requires the partitioning column in every unique key, so timestamp is part of
+-- the primary key and of uq_kafka_source.
+CREATE TABLE IF NOT EXISTS tweet_facts (
+    id BIGINT AUTO_INCREMENT,
+    user_id BIGINT NOT NULL,
+    tweet TEXT,
+    timestamp DATETIME NOT NULL,
+    iso_timestamp DATETIME,
+    -- Kafka coordinates of the source record: replays and redeliveries hit the unique key
+    -- instead of adding rows (NULL for rows written outside the consumer)
+    kafka_topic VARCHAR(255),
+    kafka_partition INT,
+    kafka_offset BIGINT,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id, timestamp),
+    UNIQUE KEY uq_kafka_source (kafka_topic, kafka_partition, kafka_offset, timestamp),
     INDEX idx_user_id (user_id),
-    INDEX idx_screen_name (screen_name),
-    INDEX idx_mbti (mbti_personality),
     INDEX idx_timestamp (timestamp)
+)
+PARTITION BY RANGE COLUMNS (timestamp) (
+    PARTITION p_history VALUES LESS THAN ('2020-01-01 00:00:00'),
+    PARTITION p_future VALUES LESS THAN (MAXVALUE)
+);
+
+-- The original wide table, kept as a view so existing queries and Superset datasets work unchanged.
+-- Tweets show their user's current attributes.
+CREATE VIEW tweets AS
+SELECT 
+    f.id,
+    f.user_id,
+    u.screen_name,
+    f.tweet,
+    f.timestamp,
+    f.iso_timestamp,
+    u.location,
+    u.verified,
+    u.statuses_count,
+    u.mbti_personality,
+    u.total_retweet_count,
+    u.total_favorite_count,
+    f.kafka_topic,
+    f.kafka_partition,
+    f.kafka_offset,
+    f.created_at
+FROM tweet_facts f
+LEFT JOIN users u ON u.user_id = f.user_id;
+
+-- Records the consumer could not decode or validate, kept with the reason for inspection or replay
+CREATE TABLE IF NOT EXISTS rejected_tweets (
+    id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    kafka_topic VARCHAR(255),
+    kafka_partition INT,
+    kafka_offset BIGINT,
+    error VARCHAR(512),
+    payload MEDIUMBLOB,
+    rejected_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE KEY uq_kafka_source (kafka_topic, kafka_partition, kafka_offset)
+);
+
+-- Rollups maintained by the consumer in the same transaction as each batch (kafka-mysql-consumer/rollups.py).
+-- The analytics views read these instead of scanning tweets; `python rollups.py rebuild` backfills them.
+CREATE TABLE IF NOT EXISTS tweet_rollup_minute (
+    bucket DATETIME NOT NULL,
+    mbti_personality VARCHAR(10) NOT NULL,
+    verified BOOLEAN NOT NULL,
+    tweet_count BIGINT NOT NULL DEFAULT 0,
+    statuses_sum BIGINT NOT NULL DEFAULT 0,
+    retweet_sum BIGINT NOT NULL DEFAULT 0,
+    favorite_sum BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (bucket, mbti_personality, verified)
+);
+
+CREATE TABLE IF NOT EXISTS tweet_rollup_hour (
+    bucket DATETIME NOT NULL,
+    mbti_personality VARCHAR(10) NOT NULL,
+    verified BOOLEAN NOT NULL,
+    tweet_count BIGINT NOT NULL DEFAULT 0,
+    statuses_sum BIGINT NOT NULL DEFAULT 0,
+    retweet_sum BIGINT NOT NULL DEFAULT 0,
+    favorite_sum BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (bucket, mbti_personality, verified)
+);
+
+-- Distinct users per hour are not additive, so their presence is recorded instead
+CREATE TABLE IF NOT EXISTS tweet_rollup_hour_users (
+    bucket DATETIME NOT NULL,
+    user_id BIGINT NOT NULL,
+    PRIMARY KEY (bucket, user_id)
+);
+
+CREATE TABLE IF NOT EXISTS user_rollup (
+    user_id BIGINT PRIMARY KEY,
+    screen_name VARCHAR(255),
+    mbti_personality VARCHAR(10) NOT NULL,
+    location VARCHAR(255),
+    verified BOOLEAN NOT NULL,
+    tweet_count BIGINT NOT NULL DEFAULT 0,
+    statuses_sum BIGINT NOT NULL DEFAULT 0,
+    retweet_sum BIGINT NOT NULL DEFAULT 0,
+    favorite_sum BIGINT NOT NULL DEFAULT 0,
+    first_tweet DATETIME,
+    last_tweet DATETIME,
+    INDEX idx_mbti (mbti_personality)
+);
+
+-- Closed event-time windows from the consumer's window stage (kafka-mysql-consumer/windows.py, CONSUMER_WINDOWS).
+-- One row per window, group and Kafka partition; tweet_window_totals sums the partitions.
+CREATE TABLE IF NOT EXISTS tweet_windows (
+    window_start DATETIME NOT NULL,
+    window_seconds INT NOT NULL,
+    slide_seconds INT NOT NULL,
+    mbti_personality VARCHAR(10) NOT NULL,
+    location VARCHAR(255) NOT NULL,
+    verified BOOLEAN NOT NULL,
+    kafka_partition INT NOT NULL,
+    tweet_count BIGINT NOT NULL DEFAULT 0,
+    statuses_sum BIGINT NOT NULL DEFAULT 0,
+    retweet_sum BIGINT NOT NULL DEFAULT 0,
+    favorite_sum BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (window_seconds, slide_seconds, window_start, mbti_personality, location, verified, kafka_partition)
+);
+
+-- Mergeable sketches from the consumer (kafka-mysql-consumer/sketches.py, CONSUMER_SKETCHES): per bucket and
+-- dimension a HyperLogLog of user ids, a Space-Saving top-k and a Count-Min sketch of screen names.
+-- Query them with `python sketches.py users|top`, which merges any range of buckets.
+CREATE TABLE IF NOT EXISTS tweet_sketches (
+    bucket_seconds INT NOT NULL,
+    bucket DATETIME NOT NULL,
+    dimension VARCHAR(16) NOT NULL,
+    dimension_value VARCHAR(64) NOT NULL,
+    tweet_count BIGINT NOT NULL DEFAULT 0,
+    users_hll MEDIUMBLOB NOT NULL,
+    names_topk MEDIUMBLOB NOT NULL,
+    names_cms MEDIUMBLOB NOT NULL,
+    PRIMARY KEY (bucket_seconds, bucket, dimension, dimension_value)
+);
+
+-- Next offset per partition not yet merged into tweet_sketches, so replayed records are not counted twice
+CREATE TABLE IF NOT EXISTS sketch_offsets (
+    kafka_topic VARCHAR(255) NOT NULL,
+    kafka_partition INT NOT NULL,
+    next_offset BIGINT NOT NULL,
+    PRIMARY KEY (kafka_topic, kafka_partition)
+);
+
+-- Per-minute end-to-end and per-hop latency of traced records (kafka-mysql-consumer/latency.py), one row
+-- per consumer worker and hop: publish_to_bridge, bridge_to_kafka, kafka_to_mysql, end_to_end
+CREATE TABLE IF NOT EXISTS pipeline_latency (
+    bucket_start DATETIME NOT NULL,
+    bucket_seconds INT NOT NULL,
+    worker VARCHAR(64) NOT NULL,
+    hop VARCHAR(32) NOT NULL,
+    samples BIGINT NOT NULL,
+    p50_ms DOUBLE NOT NULL,
+    p99_ms DOUBLE NOT NULL,
+    p999_ms DOUBLE NOT NULL,
+    max_ms DOUBLE NOT NULL,
+    PRIMARY KEY (bucket_start, hop, worker)
 );
 
 -- Create aggregated views for analytics
@@ -29,32 +188,66 @@ SELECT
     mbti_personality,
     location,
     verified,
-    COUNT(*) as tweet_count,
-    AVG(statuses_count) as avg_statuses_count,
-    AVG(total_retweet_count) as avg_retweet_count,
-    AVG(total_favorite_count) as avg_favorite_count,
-    MIN(timestamp) as first_tweet,
-    MAX(timestamp) as last_tweet
-FROM tweets 
-GROUP BY user_id, screen_name, mbti_personality, location, verified;
+    tweet_count,
+    statuses_sum / tweet_count as avg_statuses_count,
+    retweet_sum / tweet_count as avg_retweet_count,
+    favorite_sum / tweet_count as avg_favorite_count,
+    first_tweet,
+    last_tweet
+FROM user_rollup;
 
 CREATE VIEW mbti_analytics AS
 SELECT 
-    mbti_personality,
-    COUNT(*) as total_tweets,
-    COUNT(DISTINCT user_id) as unique_users,
-    AVG(statuses_count) as avg_statuses_count,
-    AVG(total_retweet_count) as avg_retweet_count,
-    AVG(total_favorite_count) as avg_favorite_count
-FROM tweets 
-WHERE mbti_personality != 'unknown'
-GROUP BY mbti_personality;
+    h.mbti_personality,
+    SUM(h.tweet_count) as total_tweets,
+    u.unique_users,
+    SUM(h.statuses_sum) / SUM(h.tweet_count) as avg_statuses_count,
+    SUM(h.retweet_sum) / SUM(h.tweet_count) as avg_retweet_count,
+    SUM(h.favorite_sum) / SUM(h.tweet_count) as avg_favorite_count
+FROM tweet_rollup_hour h
+JOIN (
+    SELECT mbti_personality, COUNT(*) as unique_users
+    FROM user_rollup
+    GROUP BY mbti_personality
+) u ON u.mbti_personality = h.mbti_personality
+WHERE h.mbti_personality != 'unknown'
+GROUP BY h.mbti_personality, u.unique_users;
 
 CREATE VIEW hourly_tweet_volume AS
 SELECT 
-    DATE_FORMAT(timestamp, '%Y-%m-%d %H:00:00') as hour,
-    COUNT(*) as tweet_count,
-    COUNT(DISTINCT user_id) as unique_users
-FROM tweets 
-GROUP BY DATE_FORMAT(timestamp, '%Y-%m-%d %H:00:00')
+    DATE_FORMAT(h.bucket, '%Y-%m-%d %H:00:00') as hour,
+    SUM(h.tweet_count) as tweet_count,
+    (SELECT COUNT(*) FROM tweet_rollup_hour_users hu WHERE hu.bucket = h.bucket) as unique_users
+FROM tweet_rollup_hour h
+GROUP BY h.bucket
 ORDER BY hour;
+
+CREATE VIEW tweet_window_totals AS
+SELECT 
+    window_start,
+    window_start + INTERVAL window_seconds SECOND as window_end,
+    window_seconds,
+    slide_seconds,
+    mbti_personality,
+    location,
+    verified,
+    SUM(tweet_count) as tweet_count,
+    SUM(statuses_sum) as statuses_sum,
+    SUM(retweet_sum) as retweet_sum,
+    SUM(favorite_sum) as favorite_sum
+FROM tweet_windows
+GROUP BY window_seconds, slide_seconds, window_start, mbti_personality, location, verified;
+
+-- Latency per minute and hop across consumer workers, for Superset. Percentiles do not add up, so
+-- these are the worst worker's (an upper bound of the pipeline-wide percentile)
+CREATE VIEW pipeline_latency_stats AS
+SELECT 
+    bucket_start,
+    hop,
+    SUM(samples) as samples,
+    MAX(p50_ms) as p50_ms,
+    MAX(p99_ms) as p99_ms,
+    MAX(p999_ms) as p999_ms,
+    MAX(max_ms) as max_ms
+FROM pipeline_latency
+GROUP BY bucket_start, hop;
@@ -0,0 +1,10 @@
+-- Idempotent ingestion for databases created before the Kafka source key existed.
+-- Fresh installs get these columns from init.sql; this directory is not run by the MySQL entrypoint.
+-- Existing rows keep NULL coordinates, which the unique key does not compare.
+USE twitter_analytics;
+
+ALTER TABLE tweets
+    ADD COLUMN kafka_topic VARCHAR(255) AFTER total_favorite_count,
+    ADD COLUMN kafka_partition INT AFTER kafka_topic,
+    ADD COLUMN kafka_offset BIGINT AFTER kafka_partition,
+    ADD UNIQUE KEY uq_kafka_source (kafka_topic, kafka_partition, kafka_offset);
@@ -0,0 +1,13 @@
+-- Side table for records the consumer rejects, for databases created before it existed.
+USE twitter_analytics;
+
+CREATE TABLE IF NOT EXISTS rejected_tweets (
+    id BIGINT AUTO_INCREMENT PRIMARY KEY,
+    kafka_topic VARCHAR(255),
+    kafka_partition INT,
+    kafka_offset BIGINT,
+    error VARCHAR(512),
+    payload MEDIUMBLOB,
+    rejected_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE KEY uq_kafka_source (kafka_topic, kafka_partition, kafka_offset)
+);
@@ -0,0 +1,90 @@
+-- Rollup tables behind the analytics views, for databases created before they existed.
+-- Afterwards backfill them with: python kafka-mysql-consumer/rollups.py rebuild
+USE twitter_analytics;
+
+-- Rollups maintained by the consumer in the same transaction as each batch (kafka-mysql-consumer/rollups.py).
+-- The analytics views read these instead of scanning tweets; `python rollups.py rebuild` backfills them.
+CREATE TABLE IF NOT EXISTS tweet_rollup_minute (
+    bucket DATETIME NOT NULL,
+    mbti_personality VARCHAR(10) NOT NULL,
+    verified BOOLEAN NOT NULL,
+    tweet_count BIGINT NOT NULL DEFAULT 0,
+    statuses_sum BIGINT NOT NULL DEFAULT 0,
+    retweet_sum BIGINT NOT NULL DEFAULT 0,
+    favorite_sum BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (bucket, mbti_personality, verified)
+);
+
+CREATE TABLE IF NOT EXISTS tweet_rollup_hour (
+    bucket DATETIME NOT NULL,
+    mbti_personality VARCHAR(10) NOT NULL,
+    verified BOOLEAN NOT NULL,
+    tweet_count BIGINT NOT NULL DEFAULT 0,
+    statuses_sum BIGINT NOT NULL DEFAULT 0,
+    retweet_sum BIGINT NOT NULL DEFAULT 0,
+    favorite_sum BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (bucket, mbti_personality, verified)
+);
+
+-- Distinct users per hour are not additive, so their presence is recorded instead
+CREATE TABLE IF NOT EXISTS tweet_rollup_hour_users (
+    bucket DATETIME NOT NULL,
+    user_id BIGINT NOT NULL,
+    PRIMARY KEY (bucket, user_id)
+);
+
+CREATE TABLE IF NOT EXISTS user_rollup (
+    user_id BIGINT PRIMARY KEY,
+    screen_name VARCHAR(255),
+    mbti_personality VARCHAR(10) NOT NULL,
+    location VARCHAR(255),
+    verified BOOLEAN NOT NULL,
+    tweet_count BIGINT NOT NULL DEFAULT 0,
+    statuses_sum BIGINT NOT NULL DEFAULT 0,
+    retweet_sum BIGINT NOT NULL DEFAULT 0,
+    favorite_sum BIGINT NOT NULL DEFAULT 0,
+    first_tweet DATETIME,
+    last_tweet DATETIME,
+    INDEX idx_mbti (mbti_personality)
+);
+
+CREATE OR REPLACE VIEW user_tweet_stats AS
+SELECT 
+    user_id,
+    screen_name,
+    mbti_personality,
+    location,
+    verified,
+    tweet_count,
+    statuses_sum / tweet_count as avg_statuses_count,
+    retweet_sum / tweet_count as avg_retweet_count,
+    favorite_sum / tweet_count as avg_favorite_count,
+    first_tweet,
+    last_tweet
+FROM user_rollup;
+
+CREATE OR REPLACE VIEW mbti_analytics AS
+SELECT 
+    h.mbti_personality,
+    SUM(h.tweet_count) as total_tweets,
+    u.unique_users,
+    SUM(h.statuses_sum) / SUM(h.tweet_count) as avg_statuses_count,
+    SUM(h.retweet_sum) / SUM(h.tweet_count) as avg_retweet_count,
+    SUM(h.favorite_sum) / SUM(h.tweet_count) as avg_favorite_count
+FROM tweet_rollup_hour h
+JOIN (
+    SELECT mbti_personality, COUNT(*) as unique_users
+    FROM user_rollup
+    GROUP BY mbti_personality
+) u ON u.mbti_personality = h.mbti_personality
+WHERE h.mbti_personality != 'unknown'
+GROUP BY h.mbti_personality, u.unique_users;
+
+CREATE OR REPLACE VIEW hourly_tweet_volume AS
+SELECT 
+    DATE_FORMAT(h.bucket, '%Y-%m-%d %H:00:00') as hour,
+    SUM(h.tweet_count) as tweet_count,
+    (SELECT COUNT(*) FROM tweet_rollup_hour_users hu WHERE hu.bucket = h.bucket) as unique_users
+FROM tweet_rollup_hour h
+GROUP BY h.bucket
+ORDER BY hour;
@@ -0,0 +1,35 @@
+-- Window stage output table, for databases created before it existed.
+USE twitter_analytics;
+
+-- Closed event-time windows from the consumer's window stage (kafka-mysql-consumer/windows.py, CONSUMER_WINDOWS).
+-- One row per window, group and Kafka partition; tweet_window_totals sums the partitions.
+CREATE TABLE IF NOT EXISTS tweet_windows (
+    window_start DATETIME NOT NULL,
+    window_seconds INT NOT NULL,
+    slide_seconds INT NOT NULL,
+    mbti_personality VARCHAR(10) NOT NULL,
+    location VARCHAR(255) NOT NULL,
+    verified BOOLEAN NOT NULL,
+    kafka_partition INT NOT NULL,
+    tweet_count BIGINT NOT NULL DEFAULT 0,
+    statuses_sum BIGINT NOT NULL DEFAULT 0,
+    retweet_sum BIGINT NOT NULL DEFAULT 0,
+    favorite_sum BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (window_seconds, slide_seconds, window_start, mbti_personality, location, verified, kafka_partition)
+);
+
+CREATE OR REPLACE VIEW tweet_window_totals AS
+SELECT 
+    window_start,
+    window_start + INTERVAL window_seconds SECOND as window_end,
+    window_seconds,
+    slide_seconds,
+    mbti_personality,
+    location,
+    verified,
+    SUM(tweet_count) as tweet_count,
+    SUM(statuses_sum) as statuses_sum,
+    SUM(retweet_sum) as retweet_sum,
+    SUM(favorite_sum) as favorite_sum
+FROM tweet_windows
+GROUP BY window_seconds, slide_seconds, window_start, mbti_personality, location, verified;
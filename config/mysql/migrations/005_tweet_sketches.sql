@@ -0,0 +1,25 @@
+-- Sketch tables, for databases created before they existed.
+USE twitter_analytics;
+
+-- Mergeable sketches from the consumer (kafka-mysql-consumer/sketches.py, CONSUMER_SKETCHES): per bucket and
+-- dimension a HyperLogLog of user ids, a Space-Saving top-k and a Count-Min sketch of screen names.
+-- Query them with `python sketches.py users|top`, which merges any range of buckets.
+CREATE TABLE IF NOT EXISTS tweet_sketches (
+    bucket_seconds INT NOT NULL,
+    bucket DATETIME NOT NULL,
+    dimension VARCHAR(16) NOT NULL,
+    dimension_value VARCHAR(64) NOT NULL,
+    tweet_count BIGINT NOT NULL DEFAULT 0,
+    users_hll MEDIUMBLOB NOT NULL,
+    names_topk MEDIUMBLOB NOT NULL,
+    names_cms MEDIUMBLOB NOT NULL,
+    PRIMARY KEY (bucket_seconds, bucket, dimension, dimension_value)
+);
+
+-- Next offset per partition not yet merged into tweet_sketches, so replayed records are not counted twice
+CREATE TABLE IF NOT EXISTS sketch_offsets (
+    kafka_topic VARCHAR(255) NOT NULL,
+    kafka_partition INT NOT NULL,
+    next_offset BIGINT NOT NULL,
+    PRIMARY KEY (kafka_topic, kafka_partition)
+);
@@ -0,0 +1,62 @@
+-- Split the wide tweets table into the users dimension and the tweet_facts table, for databases created
+-- before they existed. Apply 001 first. Stop the consumers while this runs, and deploy the consumer
+-- version that writes tweet_facts before restarting them.
+USE twitter_analytics;
+
+CREATE TABLE IF NOT EXISTS users (
+    user_id BIGINT PRIMARY KEY,
+    screen_name VARCHAR(255),
+    location VARCHAR(255),
+    verified BOOLEAN DEFAULT FALSE,
+    statuses_count BIGINT DEFAULT 0,
+    mbti_personality VARCHAR(10),
+    total_retweet_count BIGINT DEFAULT 0,
+    total_favorite_count BIGINT DEFAULT 0,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    INDEX idx_screen_name (screen_name),
+    INDEX idx_mbti (mbti_personality)
+);
+
+-- Each user's attributes from their latest tweet
+INSERT INTO users (
+    user_id, screen_name, location, verified, statuses_count,
+    mbti_personality, total_retweet_count, total_favorite_count
+)
+SELECT t.user_id, t.screen_name, t.location, t.verified, t.statuses_count,
+       t.mbti_personality, t.total_retweet_count, t.total_favorite_count
+FROM tweets t
+JOIN (SELECT user_id, MAX(id) AS last_id FROM tweets GROUP BY user_id) l ON l.last_id = t.id
+ON DUPLICATE KEY UPDATE user_id = users.user_id;
+
+RENAME TABLE tweets TO tweet_facts;
+
+-- Dropping the columns also drops their single-column indexes (idx_screen_name, idx_mbti)
+ALTER TABLE tweet_facts
+    DROP COLUMN screen_name,
+    DROP COLUMN location,
+    DROP COLUMN verified,
+    DROP COLUMN statuses_count,
+    DROP COLUMN mbti_personality,
+    DROP COLUMN total_retweet_count,
+    DROP COLUMN total_favorite_count;
+
+CREATE OR REPLACE VIEW tweets AS
+SELECT
+    f.id,
+    f.user_id,
+    u.screen_name,
+    f.tweet,
+    f.timestamp,
+    f.iso_timestamp,
+    u.location,
+    u.verified,
+    u.statuses_count,
+    u.mbti_personality,
+    u.total_retweet_count,
+    u.total_favorite_count,
+    f.kafka_topic,
+    f.kafka_partition,
+    f.kafka_offset,
+    f.created_at
+FROM tweet_facts f
+LEFT JOIN users u ON u.user_id = f.user_id;
@@ -0,0 +1,21 @@
+-- RANGE partitioning of tweet_facts on timestamp, for databases created before it existed. Apply 006 first.
+-- Rebuilds the table (copies every row), so run it with the consumers stopped, then run
+-- `python partitions.py maintain` once (kafka-mysql-consumer) to split the existing rows into partitions.
+USE twitter_analytics;
+
+-- timestamp becomes NOT NULL (a NULL in uq_kafka_source would never match a replay); give old rows their best known time
+UPDATE tweet_facts SET timestamp = COALESCE(iso_timestamp, created_at) WHERE timestamp IS NULL;
+
+-- Every unique key must include the partitioning column
+ALTER TABLE tweet_facts
+    MODIFY COLUMN timestamp DATETIME NOT NULL,
+    DROP PRIMARY KEY,
+    ADD PRIMARY KEY (id, timestamp),
+    DROP INDEX uq_kafka_source,
+    ADD UNIQUE KEY uq_kafka_source (kafka_topic, kafka_partition, kafka_offset, timestamp);
+
+ALTER TABLE tweet_facts
+PARTITION BY RANGE COLUMNS (timestamp) (
+    PARTITION p_history VALUES LESS THAN ('2020-01-01 00:00:00'),
+    PARTITION p_future VALUES LESS THAN (MAXVALUE)
+);
@@ -0,0 +1,31 @@
+-- Latency tracing table and view, for databases created before they existed.
+USE twitter_analytics;
+
+-- Per-minute end-to-end and per-hop latency of traced records (kafka-mysql-consumer/latency.py), one row
+-- per consumer worker and hop: publish_to_bridge, bridge_to_kafka, kafka_to_mysql, end_to_end
+CREATE TABLE IF NOT EXISTS pipeline_latency (
+    bucket_start DATETIME NOT NULL,
+    bucket_seconds INT NOT NULL,
+    worker VARCHAR(64) NOT NULL,
+    hop VARCHAR(32) NOT NULL,
+    samples BIGINT NOT NULL,
+    p50_ms DOUBLE NOT NULL,
+    p99_ms DOUBLE NOT NULL,
+    p999_ms DOUBLE NOT NULL,
+    max_ms DOUBLE NOT NULL,
+    PRIMARY KEY (bucket_start, hop, worker)
+);
+
+-- Latency per minute and hop across consumer workers, for Superset. Percentiles do not add up, so
+-- these are the worst worker's (an upper bound of the pipeline-wide percentile)
+CREATE OR REPLACE VIEW pipeline_latency_stats AS
+SELECT 
+    bucket_start,
+    hop,
+    SUM(samples) as samples,
+    MAX(p50_ms) as p50_ms,
+    MAX(p99_ms) as p99_ms,
+    MAX(p999_ms) as p999_ms,
+    MAX(max_ms) as max_ms
+FROM pipeline_latency
+GROUP BY bucket_start, hop;
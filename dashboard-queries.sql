@@ -7,24 +7,23 @@
 -- =====================================================
 SELECT 
     mbti_personality,
-    COUNT(*) as tweet_count,
-    ROUND(COUNT(*) * 100.0 / (SELECT COUNT(*) FROM tweets), 1) as percentage
-FROM tweets 
+    SUM(tweet_count) as tweet_count,
+    ROUND(SUM(tweet_count) * 100.0 / (SELECT SUM(tweet_count) FROM tweet_rollup_hour), 1) as percentage
+FROM tweet_rollup_hour 
 WHERE mbti_personality != 'unknown'
 GROUP BY mbti_personality 
 ORDER BY tweet_count DESC;
 
 -- =====================================================
--- Query 2: Tweet Volume Over Time (5-minute intervals)
--- Use for: Line Chart
+-- Query 2: Tweet Volume Over Time (1-minute buckets)
+-- Use for: Line Chart (unique users per hour: hourly_tweet_volume)
 -- =====================================================
 SELECT 
-    DATE_FORMAT(timestamp, '%Y-%m-%d %H:%i:00') as time_bucket,
-    COUNT(*) as tweet_count,
-    COUNT(DISTINCT user_id) as unique_users
-FROM tweets 
-GROUP BY DATE_FORMAT(timestamp, '%Y-%m-%d %H:%i:00')
-ORDER BY time_bucket;
+    DATE_FORMAT(bucket, '%Y-%m-%d %H:%i:00') as time_bucket,
+    SUM(tweet_count) as tweet_count
+FROM tweet_rollup_minute 
+GROUP BY bucket
+ORDER BY bucket;
 
 -- =====================================================
 -- Query 3: Verification Analysis by MBTI
@@ -32,11 +31,11 @@ ORDER BY time_bucket;
 -- =====================================================
 SELECT 
     mbti_personality,
-    SUM(CASE WHEN verified = 1 THEN 1 ELSE 0 END) as verified_count,
-    SUM(CASE WHEN verified = 0 THEN 1 ELSE 0 END) as unverified_count,
-    COUNT(*) as total_count,
-    ROUND(SUM(CASE WHEN verified = 1 THEN 1 ELSE 0 END) * 100.0 / COUNT(*), 1) as verification_rate
-FROM tweets 
+    SUM(CASE WHEN verified = 1 THEN tweet_count ELSE 0 END) as verified_count,
+    SUM(CASE WHEN verified = 0 THEN tweet_count ELSE 0 END) as unverified_count,
+    SUM(tweet_count) as total_count,
+    ROUND(SUM(CASE WHEN verified = 1 THEN tweet_count ELSE 0 END) * 100.0 / SUM(tweet_count), 1) as verification_rate
+FROM tweet_rollup_hour 
 WHERE mbti_personality != 'unknown'
 GROUP BY mbti_personality 
 ORDER BY verification_rate DESC;
@@ -56,6 +55,8 @@ SELECT
     timestamp,
     statuses_count
 FROM tweets 
+-- Bounded so only the latest tweet_facts partitions are read
+WHERE timestamp >= NOW() - INTERVAL 1 DAY
 ORDER BY timestamp DESC 
 LIMIT 25;
 
@@ -68,9 +69,9 @@ SELECT
         WHEN mbti_personality LIKE '%E%' THEN 'Extrovert'
         ELSE 'Introvert'
     END as personality_dimension,
-    COUNT(*) as count,
-    ROUND(COUNT(*) * 100.0 / (SELECT COUNT(*) FROM tweets WHERE mbti_personality != 'unknown'), 1) as percentage
-FROM tweets 
+    SUM(tweet_count) as count,
+    ROUND(SUM(tweet_count) * 100.0 / (SELECT SUM(tweet_count) FROM tweet_rollup_hour WHERE mbti_personality != 'unknown'), 1) as percentage
+FROM tweet_rollup_hour 
 WHERE mbti_personality != 'unknown'
 GROUP BY personality_dimension
 UNION ALL
@@ -79,9 +80,9 @@ SELECT
         WHEN mbti_personality LIKE '%S%' THEN 'Sensing'
         ELSE 'Intuition'
     END as personality_dimension,
-    COUNT(*) as count,
-    ROUND(COUNT(*) * 100.0 / (SELECT COUNT(*) FROM tweets WHERE mbti_personality != 'unknown'), 1) as percentage
-FROM tweets 
+    SUM(tweet_count) as count,
+    ROUND(SUM(tweet_count) * 100.0 / (SELECT SUM(tweet_count) FROM tweet_rollup_hour WHERE mbti_personality != 'unknown'), 1) as percentage
+FROM tweet_rollup_hour 
 WHERE mbti_personality != 'unknown'
 GROUP BY personality_dimension
 UNION ALL
@@ -90,9 +91,9 @@ SELECT
         WHEN mbti_personality LIKE '%T%' THEN 'Thinking'
         ELSE 'Feeling'
     END as personality_dimension,
-    COUNT(*) as count,
-    ROUND(COUNT(*) * 100.0 / (SELECT COUNT(*) FROM tweets WHERE mbti_personality != 'unknown'), 1) as percentage
-FROM tweets 
+    SUM(tweet_count) as count,
+    ROUND(SUM(tweet_count) * 100.0 / (SELECT SUM(tweet_count) FROM tweet_rollup_hour WHERE mbti_personality != 'unknown'), 1) as percentage
+FROM tweet_rollup_hour 
 WHERE mbti_personality != 'unknown'
 GROUP BY personality_dimension
 UNION ALL
@@ -101,9 +102,9 @@ SELECT
         WHEN mbti_personality LIKE '%J%' THEN 'Judging'
         ELSE 'Perceiving'
     END as personality_dimension,
-    COUNT(*) as count,
-    ROUND(COUNT(*) * 100.0 / (SELECT COUNT(*) FROM tweets WHERE mbti_personality != 'unknown'), 1) as percentage
-FROM tweets 
+    SUM(tweet_count) as count,
+    ROUND(SUM(tweet_count) * 100.0 / (SELECT SUM(tweet_count) FROM tweet_rollup_hour WHERE mbti_personality != 'unknown'), 1) as percentage
+FROM tweet_rollup_hour 
 WHERE mbti_personality != 'unknown'
 GROUP BY personality_dimension;
 
@@ -112,11 +113,11 @@ GROUP BY personality_dimension;
 -- Use for: Heatmap or Line Chart
 -- =====================================================
 SELECT 
-    HOUR(timestamp) as hour_of_day,
-    COUNT(*) as tweet_count,
-    AVG(statuses_count) as avg_user_activity
-FROM tweets 
-GROUP BY HOUR(timestamp)
+    HOUR(bucket) as hour_of_day,
+    SUM(tweet_count) as tweet_count,
+    SUM(statuses_sum) / SUM(tweet_count) as avg_user_activity
+FROM tweet_rollup_hour 
+GROUP BY HOUR(bucket)
 ORDER BY hour_of_day;
 
 -- =====================================================
@@ -125,14 +126,27 @@ ORDER BY hour_of_day;
 -- =====================================================
 SELECT 
     mbti_personality,
-    COUNT(*) as tweet_count,
-    COUNT(DISTINCT user_id) as unique_users,
-    ROUND(COUNT(*) / COUNT(DISTINCT user_id), 1) as tweets_per_user
-FROM tweets 
-WHERE mbti_personality != 'unknown'
-GROUP BY mbti_personality 
+    total_tweets as tweet_count,
+    unique_users,
+    ROUND(total_tweets / unique_users, 1) as tweets_per_user
+FROM mbti_analytics
 ORDER BY tweets_per_user DESC;
 
+-- =====================================================
+-- Bonus Query 8: Pipeline Latency (dashboard staleness SLO)
+-- Use for: Line Chart (x: bucket_start, series: hop, metric: p99_ms)
+-- =====================================================
+SELECT
+    bucket_start,
+    hop,
+    samples,
+    p50_ms,
+    p99_ms,
+    p999_ms
+FROM pipeline_latency_stats
+WHERE bucket_start >= NOW() - INTERVAL 1 DAY
+ORDER BY bucket_start, hop;
+
 -- =====================================================
 -- Data Verification Queries
 -- =====================================================
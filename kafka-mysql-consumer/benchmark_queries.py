@@ -0,0 +1,377 @@
+#!/usr/bin/env python3
+"""
+Dashboard query benchmark and index advisor
+Loads synthetic tweets into a scratch database built from config/mysql/init.sql,
+growing it through each scale (e.g. 1M, 10M, 50M rows). At every scale it runs
+each query of dashboard-queries.sql plus the SQL behind the create-dashboard.py
+charts under every candidate index set. It reports median latency and saves
+EXPLAIN ANALYZE plans, then recommends the candidates that pay off at the largest
+scale.
+
+Candidate indexes are built once per scale and switched with invisible indexes, so
+comparing candidates costs no index rebuilds. Needs MySQL 8.0.18+ and a user allowed
+to create databases (e.g. root):
+
+    python benchmark_queries.py --scales 1M,10M,50M --user root --password rootpassword
+"""
+
+import argparse
+import logging
+import os
+import re
+import statistics
+import time
+from datetime import datetime, timedelta
+
+import mysql.connector
+
+from partitions import maintain
+from rollups import rebuild
+
+logger = logging.getLogger(__name__)
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+INIT_SQL = os.path.join(ROOT, 'config', 'mysql', 'init.sql')
+DASHBOARD_SQL = os.path.join(ROOT, 'dashboard-queries.sql')
+
+MBTI_TYPES = ['intj', 'intp', 'entj', 'entp', 'infj', 'infp', 'enfj', 'enfp',
+              'istj', 'isfj', 'estj', 'esfj', 'istp', 'isfp', 'estp', 'esfp']
+USERS = 8328
+FIRST_USER_ID = 10_000_000
+CHUNK_ROWS = 500_000
+
+# The SQL Superset issues for the create-dashboard.py charts (dataset: the tweets view)
+CHART_QUERIES = {
+    'Chart: MBTI Personality Distribution': """
+        SELECT mbti_personality, COUNT(*) AS count FROM tweets
+        GROUP BY mbti_personality ORDER BY count DESC LIMIT 16""",
+    'Chart: MBTI Distribution (known types)': """
+        SELECT mbti_personality, COUNT(*) AS count FROM tweets
+        WHERE mbti_personality != 'unknown'
+        GROUP BY mbti_personality ORDER BY count DESC LIMIT 16""",
+    'Chart: Tweet Volume Over Time (PT5M)': """
+        SELECT DATE_ADD(DATE(timestamp), INTERVAL (HOUR(timestamp) * 60 + MINUTE(timestamp) DIV 5 * 5) MINUTE)
+               AS __timestamp, COUNT(*) AS count
+        FROM tweets GROUP BY __timestamp LIMIT 10000""",
+    'Chart: Verification Status by MBTI': """
+        SELECT mbti_personality, verified, COUNT(*) AS count FROM tweets
+        GROUP BY mbti_personality, verified ORDER BY count DESC LIMIT 50""",
+    'Chart: Recent Tweets Feed': """
+        SELECT user_id, mbti_personality, tweet, timestamp, verified FROM tweets
+        ORDER BY timestamp DESC LIMIT 20""",
+}
+
+
+class Candidate:
+    """A named set of indexes (table, index, ALTER TABLE add clause, drop clause) plus queries that rely on them
+
+    Each extra query names the workload query it would replace, for the recommendation.
+    """
+
+    def __init__(self, name, indexes=(), queries=None):
+        self.name = name
+        self.indexes = list(indexes)
+        self.queries = queries or {}
+
+
+TS_USER = ('tweet_facts', 'idx_ts_user', "ADD INDEX idx_ts_user (timestamp, user_id)", "DROP INDEX idx_ts_user")
+USER_TS = ('tweet_facts', 'idx_user_ts', "ADD INDEX idx_user_ts (user_id, timestamp)", "DROP INDEX idx_user_ts")
+MBTI_VERIFIED = ('users', 'idx_mbti_verified', "ADD INDEX idx_mbti_verified (mbti_personality, verified)",
+                 "DROP INDEX idx_mbti_verified")
+# Virtual column: indexing it does not rebuild the (partitioned) table
+BUCKET_5M = ('tweet_facts', 'idx_bucket_5m',
+             "ADD COLUMN bucket_5m DATETIME AS "
+             "(timestamp - INTERVAL (MINUTE(timestamp) % 5 * 60 + SECOND(timestamp)) SECOND) VIRTUAL, "
+             "ADD INDEX idx_bucket_5m (bucket_5m)",
+             "DROP COLUMN bucket_5m")
+BUCKET_QUERY = {
+    'Chart: Tweet Volume Over Time (bucket_5m column)': (
+        'Chart: Tweet Volume Over Time (PT5M)',
+        "SELECT bucket_5m AS __timestamp, COUNT(*) AS count FROM tweet_facts GROUP BY bucket_5m LIMIT 10000"),
+}
+
+CANDIDATES = [
+    Candidate('baseline'),
+    Candidate('facts_ts_user', [TS_USER]),
+    Candidate('facts_user_ts', [USER_TS]),
+    Candidate('users_mbti_verified', [MBTI_VERIFIED]),
+    Candidate('bucket_5m', [BUCKET_5M], BUCKET_QUERY),
+    Candidate('combined', [TS_USER, MBTI_VERIFIED, BUCKET_5M], BUCKET_QUERY),
+]
+
+
+def parse_count(text):
+    """'1M' -> 1000000, '500K' -> 500000"""
+    match = re.match(r'^(\d+(?:\.\d+)?)([KkMm]?)$', text.strip())
+    if not match:
+        raise ValueError(f"Invalid row count: {text!r} (expected e.g. 500K, 1M)")
+    return int(float(match.group(1)) * {'': 1, 'k': 10 ** 3, 'm': 10 ** 6}[match.group(2).lower()])
+
+
+def sql_statements(text):
+    """Statements of a SQL script, comments stripped"""
+    body = "\n".join(line for line in text.splitlines() if not line.strip().startswith('--'))
+    return [statement.strip() for statement in body.split(';') if statement.strip()]
+
+
+def dashboard_queries(path=DASHBOARD_SQL):
+    """{name: sql} of dashboard-queries.sql, named after their '-- Query N: ...' or '-- Check ...' comment"""
+    with open(path, encoding='utf-8') as f:
+        text = f.read()
+    queries = {}
+    for chunk in text.split(';'):
+        names = re.findall(r'^-- ((?:Bonus )?Query \d+: .+|Check .+)$', chunk, re.MULTILINE)
+        sql = sql_statements(chunk)
+        if names and sql:
+            queries[names[-1].strip()] = sql[0]
+    return queries
+
+
+class QueryBenchmark:
+    def __init__(self, connection, database, span_days, repeat, timeout_ms, explain_dir):
+        self.connection = connection
+        self.database = database
+        self.span = timedelta(days=span_days)
+        self.repeat = repeat
+        self.timeout_ms = timeout_ms
+        self.explain_dir = explain_dir
+        # Newest synthetic tweet; older rows are added as scales grow
+        self.end = datetime.now().replace(microsecond=0)
+        self.cursor = connection.cursor()
+
+    def execute(self, statement):
+        self.cursor.execute(statement)
+        if self.cursor.with_rows:
+            return self.cursor.fetchall()
+        return None
+
+    def create_schema(self, reset):
+        """Create the scratch database from init.sql, with daily partitions covering the synthetic span"""
+        if reset:
+            self.execute(f"DROP DATABASE IF EXISTS {self.database}")
+        self.execute("SHOW DATABASES")
+        if self.database in [name for (name,) in self.cursor.fetchall()]:
+            self.execute(f"USE {self.database}")
+            (newest,), = self.execute("SELECT MAX(timestamp) FROM tweet_facts")
+            self.end = newest or self.end
+            logger.info(f"Reusing database {self.database}")
+            return
+
+        with open(INIT_SQL, encoding='utf-8') as f:
+            script = f.read().replace('twitter_analytics', self.database)
+        for statement in sql_statements(script):
+            self.execute(statement)
+        maintain(self.connection, now=self.end, backfill_from=self.end - self.span)
+        self.load_users()
+        logger.info(f"Created database {self.database}")
+
+    def load_users(self):
+        rows = []
+        for i in range(USERS):
+            mbti = 'unknown' if i % 10 == 0 else MBTI_TYPES[(i * 7) % len(MBTI_TYPES)]
+            rows.append((FIRST_USER_ID + i, f"user_{i}", ['New York, NY', 'London', 'Berlin', ''][i % 4],
+                         i % 9 == 0, (i * 37) % 50000, mbti, (i * 13) % 5000, (i * 17) % 5000))
+        self.cursor.executemany("""
+            INSERT INTO users (user_id, screen_name, location, verified, statuses_count,
+                               mbti_personality, total_retweet_count, total_favorite_count)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s)""", rows)
+
+    def grow(self, target, largest):
+        """Insert synthetic tweets until tweet_facts holds target rows
+
+        Row n is n steps before the newest tweet, the step spreading the largest scale
+        over the whole span; user ids are skewed towards a few very active users.
+        """
+        (count,), = self.execute("SELECT COUNT(*) FROM tweet_facts")
+        if count >= target:
+            return 0.0
+        step_us = int(self.span.total_seconds() * 1e6 / largest)
+        self.execute(f"SET SESSION cte_max_recursion_depth = {CHUNK_ROWS + 1}")
+        start = time.perf_counter()
+        for base in range(count, target, CHUNK_ROWS):
+            last = min(base + CHUNK_ROWS, target) - 1
+            self.execute(f"""
+                INSERT INTO tweet_facts (user_id, tweet, timestamp, iso_timestamp,
+                                         kafka_topic, kafka_partition, kafka_offset)
+                WITH RECURSIVE seq (n) AS (SELECT {base} UNION ALL SELECT n + 1 FROM seq WHERE n < {last})
+                SELECT {FIRST_USER_ID} + FLOOR(POW((CRC32(n) % 1000003) / 1000003, 2) * {USERS}),
+                       CONCAT('synthetic tweet ', n, REPEAT(' lorem ipsum', 1 + CRC32(n) % 12)),
+                       '{self.end}' - INTERVAL n * {step_us} MICROSECOND,
+                       '{self.end}' - INTERVAL n * {step_us} MICROSECOND,
+                       'benchmark', n % 3, n
+                FROM seq""")
+            logger.info(f"Loaded {last + 1:,} / {target:,} rows")
+        elapsed = time.perf_counter() - start
+        logger.info(f"Loaded {target - count:,} rows in {elapsed:.0f} s ({(target - count) / elapsed:,.0f} rows/s)")
+        self.execute("ANALYZE TABLE tweet_facts, users")
+        rebuild(self.connection)
+        return elapsed
+
+    def existing_indexes(self, table):
+        self.execute(f"SHOW INDEX FROM {table}")
+        return {row[2] for row in self.cursor.fetchall()}
+
+    def candidate_indexes(self):
+        """Every candidate index once, in CANDIDATES order"""
+        return list(dict.fromkeys(index for candidate in CANDIDATES for index in candidate.indexes))
+
+    def drop_candidates(self):
+        """Remove candidate indexes before loading, so loads and index builds are measured alone"""
+        for table, index, _, drop in self.candidate_indexes():
+            if index in self.existing_indexes(table):
+                self.execute(f"ALTER TABLE {table} {drop}")
+
+    def build_candidates(self):
+        """Create every candidate index; returns {index: seconds to build}"""
+        costs = {}
+        for table, index, add, _ in self.candidate_indexes():
+            if index in self.existing_indexes(table):
+                continue
+            start = time.perf_counter()
+            self.execute(f"ALTER TABLE {table} {add}")
+            costs[index] = time.perf_counter() - start
+            logger.info(f"Built {index} in {costs[index]:.1f} s")
+        return costs
+
+    def activate(self, candidate):
+        """Make exactly the candidate's indexes visible to the optimizer (metadata-only changes)"""
+        wanted = {index for _, index, _, _ in candidate.indexes}
+        for table, index, _, _ in self.candidate_indexes():
+            self.execute(f"ALTER TABLE {table} ALTER INDEX {index} {'VISIBLE' if index in wanted else 'INVISIBLE'}")
+
+    def time_query(self, sql):
+        """Median latency in ms over repeat runs after one warm-up, or None on timeout"""
+        self.execute(f"SET SESSION MAX_EXECUTION_TIME = {self.timeout_ms}")
+        timings = []
+        try:
+            for _ in range(self.repeat + 1):
+                start = time.perf_counter()
+                self.execute(sql)
+                timings.append((time.perf_counter() - start) * 1000)
+        except mysql.connector.Error as e:
+            # 3024: maximum statement execution time exceeded
+            if e.errno != 3024:
+                raise
+            return None
+        return statistics.median(timings[1:])
+
+    def explain(self, sql, path):
+        try:
+            plan = "\n".join(row[0] for row in self.execute(f"EXPLAIN ANALYZE {sql}"))
+        except mysql.connector.Error as e:
+            plan = f"EXPLAIN ANALYZE failed: {e}"
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(sql.strip() + "\n\n" + plan + "\n")
+
+    def run_scale(self, rows, queries):
+        """{candidate: {query: ms or None}} at the current scale"""
+        results = {}
+        for candidate in CANDIDATES:
+            self.activate(candidate)
+            workload = dict(queries)
+            workload.update({name: sql for name, (_, sql) in candidate.queries.items()})
+            results[candidate.name] = {}
+            for name, sql in workload.items():
+                latency = self.time_query(sql)
+                results[candidate.name][name] = latency
+                slug = re.sub(r'[^a-z0-9]+', '-', name.lower()).strip('-')
+                self.explain(sql, os.path.join(self.explain_dir, f"{rows}_{candidate.name}_{slug}.txt"))
+                logger.info(f"{rows:,} rows, {candidate.name}, {name}: "
+                            f"{'timeout' if latency is None else f'{latency:.1f} ms'}")
+        return results
+
+
+def format_ms(value):
+    return 'timeout' if value is None else f"{value:,.1f}"
+
+
+def report(scales, min_speedup):
+    """Markdown latency tables per scale and the index recommendation at the largest scale"""
+    names = [candidate.name for candidate in CANDIDATES]
+    lines = ["# Dashboard query benchmark", ""]
+    for rows, load_seconds, costs, results in scales:
+        lines += [f"## {rows:,} rows", "",
+                  f"Load: {load_seconds:.0f} s. Index build: " +
+                  (", ".join(f"{index} {seconds:.1f} s" for index, seconds in costs.items()) or "already built"), "",
+                  "| Query (median ms) | " + " | ".join(names) + " |",
+                  "|---|" + "---|" * len(names)]
+        queries = list(dict.fromkeys(query for result in results.values() for query in result))
+        for query in queries:
+            lines.append(f"| {query} | " + " | ".join(
+                format_ms(results[name][query]) if query in results[name] else '' for name in names) + " |")
+        lines.append("")
+
+    rows, _, _, results = scales[-1]
+    baseline = results['baseline']
+    lines += [f"## Recommendation ({rows:,} rows, at least {min_speedup}x faster than baseline)", ""]
+    recommended = []
+    for candidate in CANDIDATES[1:]:
+        wins = []
+        for query, latency in results[candidate.name].items():
+            original = candidate.queries[query][0] if query in candidate.queries else query
+            before = baseline.get(original)
+            if latency is None:
+                continue
+            if before is None or before / latency >= min_speedup:
+                wins.append(f"{query} ({format_ms(before)} -> {format_ms(latency)} ms)")
+        if wins:
+            recommended.append(candidate)
+            lines.append(f"- **{candidate.name}**: " + "; ".join(wins))
+    if not recommended:
+        lines.append("- No candidate beats the current schema; keep it")
+    else:
+        lines += ["", "```sql"]
+        clauses = dict.fromkeys((table, clause) for c in recommended for table, _, clause, _ in c.indexes)
+        lines += [f"ALTER TABLE {table} {clause};" for table, clause in clauses]
+        lines += ["```"]
+    return "\n".join(lines) + "\n"
+
+
+def main():
+    from consumer import MYSQL_HOST, MYSQL_PASSWORD, MYSQL_PORT, MYSQL_USER
+
+    parser = argparse.ArgumentParser(description="Benchmark the dashboard workload and candidate indexes")
+    parser.add_argument('--scales', default='1M,10M,50M', help="Comma-separated row counts, loaded in increasing order")
+    parser.add_argument('--database', default='twitter_analytics_bench', help="Scratch database (never the live one)")
+    parser.add_argument('--reset', action='store_true', help="Drop and recreate the scratch database first")
+    parser.add_argument('--span-days', type=int, default=30, help="Time span of the largest scale")
+    parser.add_argument('--repeat', type=int, default=5, help="Timed runs per query (after one warm-up)")
+    parser.add_argument('--timeout-ms', type=int, default=60000, help="Per-query limit (MAX_EXECUTION_TIME)")
+    parser.add_argument('--min-speedup', type=float, default=1.2, help="Speedup needed to recommend a candidate")
+    parser.add_argument('--report', default='query-benchmark.md', help="Markdown report path")
+    parser.add_argument('--explain-dir', default='explain', help="Directory for EXPLAIN ANALYZE plans")
+    parser.add_argument('--host', default=MYSQL_HOST)
+    parser.add_argument('--port', type=int, default=MYSQL_PORT)
+    parser.add_argument('--user', default=MYSQL_USER)
+    parser.add_argument('--password', default=MYSQL_PASSWORD)
+    args = parser.parse_args()
+
+    if args.database == 'twitter_analytics':
+        raise SystemExit("Refusing to load synthetic rows into the live database")
+    scales = sorted(parse_count(scale) for scale in args.scales.split(',') if scale.strip())
+    os.makedirs(args.explain_dir, exist_ok=True)
+    queries = dashboard_queries()
+    queries.update(CHART_QUERIES)
+
+    connection = mysql.connector.connect(host=args.host, port=args.port, user=args.user,
+                                         password=args.password, autocommit=True)
+    try:
+        benchmark = QueryBenchmark(connection, args.database, args.span_days, args.repeat,
+                                   args.timeout_ms, args.explain_dir)
+        benchmark.create_schema(args.reset)
+        results = []
+        for rows in scales:
+            benchmark.drop_candidates()
+            load_seconds = benchmark.grow(rows, scales[-1])
+            costs = benchmark.build_candidates()
+            results.append((rows, load_seconds, costs, benchmark.run_scale(rows, queries)))
+            # Written after every scale, so a long run leaves partial results behind
+            with open(args.report, 'w', encoding='utf-8') as f:
+                f.write(report(results, args.min_speedup))
+        print(report(results, args.min_speedup))
+    finally:
+        connection.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Sketch accuracy check
+Compares the sketches against exact counts on synthetic streams, without Kafka or
+MySQL, and exits non-zero if an estimate falls outside its error bound.
+"""
+
+import argparse
+import math
+import random
+import time
+from collections import Counter
+
+from sketches import CountMinSketch, HyperLogLog, SpaceSaving
+
+failures = []
+
+
+def check(label, ok, detail):
+    print(f"{'ok  ' if ok else 'FAIL'} {label:<44} {detail}")
+    if not ok:
+        failures.append(label)
+
+
+def zipf_names(count, names, rng, s=1.1):
+    """Screen names with a Zipf-like popularity, like a few very active posters"""
+    weights = [1 / (rank + 1) ** s for rank in range(names)]
+    return [f"user_{i}" for i in rng.choices(range(names), weights=weights, k=count)]
+
+
+def check_hyperloglog(rng):
+    bound = 3 * 1.04 / math.sqrt(HyperLogLog().m)
+    for distinct in (100, 1000, 10000, 100000, 1000000):
+        hll = HyperLogLog()
+        for user_id in rng.sample(range(10 ** 9), distinct):
+            hll.add(user_id)
+        error = abs(hll.count() - distinct) / distinct
+        check(f"HLL distinct users n={distinct}", error <= bound, f"error {error:.2%} (bound {bound:.2%})")
+
+    # Merging per-worker / per-bucket sketches equals sketching the whole stream
+    users = [rng.randrange(50000) for _ in range(200000)]
+    whole = HyperLogLog()
+    parts = [HyperLogLog() for _ in range(3)]
+    for i, user_id in enumerate(users):
+        whole.add(user_id)
+        parts[i % 3].add(user_id)
+    merged = HyperLogLog.from_bytes(parts[0].to_bytes()).merge(parts[1]).merge(parts[2])
+    check("HLL merge equals single sketch", merged.registers == whole.registers,
+          f"estimate {merged.count():.0f} of {len(set(users))}")
+
+
+def check_heavy_hitters(rng, records):
+    names = zipf_names(records, 20000, rng)
+    exact = Counter(names)
+
+    cms = CountMinSketch()
+    parts = [SpaceSaving() for _ in range(4)]
+    for i, name in enumerate(names):
+        cms.add(name)
+        parts[i % 4].add(name)
+    topk = SpaceSaving.from_bytes(parts[0].to_bytes())
+    for part in parts[1:]:
+        topk.merge(part)
+
+    # Count-Min never undercounts and overshoots by at most e * N / width for all but ~e**-depth of the items
+    bound = math.e * records / cms.width
+    sample = rng.sample(list(exact), 2000)
+    under = sum(cms.estimate(name) < exact[name] for name in sample)
+    over = sum(cms.estimate(name) - exact[name] > bound for name in sample)
+    check("CMS never undercounts", under == 0, f"{under} of {len(sample)} below exact")
+    check("CMS overestimate within e*N/width", over <= len(sample) * 2 * math.exp(-cms.depth),
+          f"{over} of {len(sample)} above {bound:.0f}")
+
+    # Space-Saving after merging 4 partial summaries: true count within [count - error, count]
+    k = 10
+    top = topk.top(k)
+    exact_top = [name for name, _ in exact.most_common(k)]
+    recall = len({name for name, _, _ in top} & set(exact_top)) / k
+    bounded = all(count - error <= exact[name] <= count for name, count, error in top)
+    check(f"Space-Saving top-{k} recall (merged)", recall >= 0.9, f"recall {recall:.0%}")
+    check("Space-Saving counts bracket exact counts", bounded,
+          ", ".join(f"{name} {count}/{exact[name]}" for name, count, _ in top[:3]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check sketch estimates against exact counts")
+    parser.add_argument('--records', type=int, default=200000, help="Records in the heavy-hitter stream")
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    start = time.perf_counter()
+    check_hyperloglog(rng)
+    check_heavy_hitters(rng, args.records)
+    print(f"\n{len(failures)} failed, {time.perf_counter() - start:.1f} s")
+    if failures:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
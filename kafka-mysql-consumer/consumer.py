@@ -1,11 +1,23 @@
-import json
 import logging
 import os
+import socket
 import time
 from datetime import datetime
 from kafka import KafkaConsumer
-import mysql.connector
+from kafka.structs import OffsetAndMetadata
 from mysql.connector import Error
+from mysql.connector.pooling import MySQLConnectionPool
+
+from histogram import format_summary
+from latency import HOPS, LATENCY_QUERY, LatencyRecorder, trace_of
+from metrics import MetricsRegistry, serve
+from profiling import SignalProfiler
+from records import DecodeError, convert_tweet, decode_tweet
+from rollups import apply_deltas
+from sampled_log import SampledLog
+from sketches import SketchAccumulator, flush_sketches, stored_offset
+from users import USER_UPSERT, UserCache
+from windows import WindowAggregator, parse_duration, parse_windows
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -19,24 +31,170 @@ MYSQL_PORT = int(os.getenv('MYSQL_PORT', 3306))
 MYSQL_DATABASE = os.getenv('MYSQL_DATABASE', 'twitter_analytics')
 MYSQL_USER = os.getenv('MYSQL_USER', 'twitter_user')
 MYSQL_PASSWORD = os.getenv('MYSQL_PASSWORD', 'twitter_password')
+# Connections per consumer process; each batch borrows one and hands it back on commit
+MYSQL_POOL_SIZE = int(os.getenv('MYSQL_POOL_SIZE', 2))
+
+# Batching configuration
+BATCH_SIZE = int(os.getenv('CONSUMER_BATCH_SIZE', 500))
+BATCH_LINGER_MS = int(os.getenv('CONSUMER_BATCH_LINGER_MS', 1000))
+STATS_INTERVAL = int(os.getenv('CONSUMER_STATS_INTERVAL', 30))
+# Seconds between per-message log lines (0 logs each one)
+CONSUMER_LOG_INTERVAL = float(os.getenv('CONSUMER_LOG_INTERVAL', 10))
+# Prometheus /metrics endpoint (see pipeline-common/metrics.py); supervisor.py workers listen on
+# CONSUMER_METRICS_PORT + their index. 0 disables it
+CONSUMER_METRICS_PORT = int(os.getenv('CONSUMER_METRICS_PORT', 9600))
+# Fold every batch into the rollup tables the analytics views read (see rollups.py)
+CONSUMER_ROLLUPS = os.getenv('CONSUMER_ROLLUPS', 'true').lower() in ('1', 'true', 'yes')
+# Streaming window stage (see windows.py): comma-separated sizes, size/slide for sliding windows,
+# e.g. "1m,5m,1h,5m/1m,1h/5m"; empty disables it
+CONSUMER_WINDOWS = os.getenv('CONSUMER_WINDOWS', '')
+CONSUMER_WINDOW_LATENESS = os.getenv('CONSUMER_WINDOW_LATENESS', '30s')
+# Approximate unique-user / top-poster sketches (see sketches.py): comma-separated bucket sizes,
+# e.g. "5m,1h"; empty disables them. Sketches are merged into MySQL every CONSUMER_SKETCH_FLUSH_MS
+CONSUMER_SKETCHES = os.getenv('CONSUMER_SKETCHES', '')
+CONSUMER_SKETCH_FLUSH_MS = int(os.getenv('CONSUMER_SKETCH_FLUSH_MS', 10000))
+# Users whose last written attributes are remembered, so unchanged users are not upserted again
+CONSUMER_USER_CACHE_SIZE = int(os.getenv('CONSUMER_USER_CACHE_SIZE', 100000))
+# Per-hop latency histograms of traced records (see latency.py), written to pipeline_latency
+CONSUMER_LATENCY_TRACING = os.getenv('CONSUMER_LATENCY_TRACING', 'true').lower() in ('1', 'true', 'yes')
+CONSUMER_LATENCY_BUCKET = os.getenv('CONSUMER_LATENCY_BUCKET', '1m')
+
+# Rows are keyed by their Kafka coordinates (uq_kafka_source); a replayed record matches the
+# existing row and the no-op update leaves it untouched, so redelivery never duplicates.
+# Rows are built with every field of the original tweets table (records.TweetRecord.as_row);
+# the user attributes go to the users dimension and the rest to tweet_facts (see fact_row)
+INSERT_QUERY = """
+INSERT INTO tweet_facts (
+    user_id, tweet, timestamp, iso_timestamp,
+    kafka_topic, kafka_partition, kafka_offset
+) VALUES (%s, %s, %s, %s, %s, %s, %s)
+ON DUPLICATE KEY UPDATE id = id
+"""
+
+# Records that fail validation are kept aside with the reason instead of being inserted
+REJECT_QUERY = """
+INSERT INTO rejected_tweets (kafka_topic, kafka_partition, kafka_offset, error, payload)
+VALUES (%s, %s, %s, %s, %s)
+ON DUPLICATE KEY UPDATE id = id
+"""
+
+# Offsets of a batch that are already stored, so replayed rows are not rolled up twice
+STORED_OFFSETS_QUERY = """
+SELECT kafka_offset FROM tweet_facts
+WHERE kafka_topic = %s AND kafka_partition = %s AND kafka_offset BETWEEN %s AND %s
+"""
+
+# Closed windows, one row per (window, group, partition); a row already written by an
+# earlier flush is complete and wins over a rebuilt copy after a replay
+WINDOW_QUERY = """
+INSERT INTO tweet_windows (
+    window_start, window_seconds, slide_seconds, mbti_personality, location, verified,
+    kafka_partition, tweet_count, statuses_sum, retweet_sum, favorite_sum
+) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+ON DUPLICATE KEY UPDATE tweet_count = tweet_count
+"""
+
+NO_SOURCE = (None, None, None)
+
+
+def fact_row(row):
+    """INSERT_QUERY parameters of a full row: user_id, tweet, timestamps and Kafka coordinates"""
+    return (row[0], row[2], row[3], row[4], *row[-3:])
+
 
 class KafkaToMySQLConsumer:
-    def __init__(self):
+    def __init__(self, batch_size=BATCH_SIZE, linger_ms=BATCH_LINGER_MS, worker_name=None,
+                 pool_size=MYSQL_POOL_SIZE, rollups=CONSUMER_ROLLUPS, windows=CONSUMER_WINDOWS,
+                 window_lateness=CONSUMER_WINDOW_LATENESS, sketches=CONSUMER_SKETCHES,
+                 sketch_flush_ms=CONSUMER_SKETCH_FLUSH_MS, user_cache_size=CONSUMER_USER_CACHE_SIZE,
+                 latency_tracing=CONSUMER_LATENCY_TRACING, latency_bucket=CONSUMER_LATENCY_BUCKET,
+                 metrics_port=CONSUMER_METRICS_PORT):
         self.consumer = None
-        self.mysql_connection = None
+        self.mysql_pool = None
+        self.batch_size = batch_size
+        self.linger_ms = linger_ms
+        self.worker_name = worker_name or socket.gethostname()
+        self.pool_size = pool_size
+        self.rollups = rollups
+        self.windows = None
+        if windows:
+            self.windows = WindowAggregator(parse_windows(windows), parse_duration(window_lateness))
+        self.sketches = None
+        if sketches:
+            buckets = [parse_duration(bucket) for bucket in sketches.split(',') if bucket.strip()]
+            self.sketches = SketchAccumulator(buckets, sketch_flush_ms / 1000.0)
+        # Per TopicPartition, the first offset not yet folded into tweet_sketches (from sketch_offsets)
+        self.sketch_offsets = {}
+        self.users = UserCache(user_cache_size)
+        self.latency = None
+        if latency_tracing:
+            self.latency = LatencyRecorder(self.worker_name, parse_duration(latency_bucket))
+        self.stats = {
+            'messages_consumed': 0,
+            'rows_inserted': 0,
+            'rows_duplicate': 0,
+            'batches_committed': 0,
+            'batches_failed': 0,
+            'messages_invalid': 0,
+        }
+        # Rows written per TopicPartition, for per-partition throughput
+        self.partition_rows = {}
+        self.last_partition_rows = {}
+        # Lag behind the high watermark per TopicPartition after the last batch
+        self.partition_lag = {}
+        self.started_at = time.time()
+        self.last_stats_at = self.started_at
+        self.inserted_log = SampledLog(logger, CONSUMER_LOG_INTERVAL)
+        self.trace_log = SampledLog(logger, CONSUMER_LOG_INTERVAL, logging.WARNING)
+        self.metrics_port = metrics_port
+        self.metrics = self.setup_metrics()
         self.setup_kafka_consumer()
         self.setup_mysql_connection()
     
+    def setup_metrics(self):
+        """Metrics registry over the consumer counters, read at scrape time"""
+        registry = MetricsRegistry(worker=self.worker_name)
+        counters = [
+            ('messages_consumed', 'consumer_messages_consumed_total', "Kafka records in committed batches"),
+            ('rows_inserted', 'consumer_rows_inserted_total', "Rows inserted into tweet_facts"),
+            ('rows_duplicate', 'consumer_rows_duplicate_total', "Redelivered rows that were already stored"),
+            ('messages_invalid', 'consumer_messages_invalid_total', "Records routed to rejected_tweets"),
+            ('batches_committed', 'consumer_batches_committed_total', "Batches written and committed"),
+            ('batches_failed', 'consumer_batches_failed_total', "Batches rolled back for redelivery"),
+        ]
+        for key, name, help_text in counters:
+            registry.counter(name, help_text, function=lambda key=key: self.stats[key])
+        registry.counter('consumer_user_upserts_total', "Users written to the users dimension",
+                         function=lambda: self.users.stats['upserts'])
+        registry.counter('consumer_user_cache_hits_total', "Users skipped as unchanged",
+                         function=lambda: self.users.stats['hits'])
+        registry.labelled('gauge', 'consumer_partition_lag', "Records behind the partition high watermark",
+                          lambda: [({'partition': f"{tp.topic}-{tp.partition}"}, lag)
+                                   for tp, lag in list(self.partition_lag.items())])
+        self.batch_latency = registry.histogram('consumer_batch_write_seconds',
+                                                "MySQL write and commit time of a batch")
+        if self.windows is not None:
+            registry.gauge('consumer_open_windows', "Window panes held in memory",
+                           function=self.windows.open_windows)
+            registry.counter('consumer_late_records_total', "Records dropped behind the window watermark",
+                             function=lambda: self.windows.stats['records_late'])
+        if self.latency is not None:
+            for hop in HOPS:
+                registry.histogram('consumer_pipeline_latency_seconds', "Per-hop latency of traced records",
+                                   histogram=self.latency.totals[hop], hop=hop)
+        return registry
+    
     def setup_kafka_consumer(self):
         """Set up Kafka consumer"""
         try:
+            # No value_deserializer: values stay raw bytes for records.decode_tweet
             self.consumer = KafkaConsumer(
                 KAFKA_TOPIC,
                 bootstrap_servers=[KAFKA_BOOTSTRAP_SERVERS],
                 auto_offset_reset='earliest',
-                enable_auto_commit=True,
-                group_id='mysql-consumer-group',
-                value_deserializer=lambda x: json.loads(x.decode('utf-8'))
+                enable_auto_commit=False,
+                max_poll_records=self.batch_size,
+                group_id='mysql-consumer-group'
             )
             logger.info(f"Kafka consumer connected to {KAFKA_BOOTSTRAP_SERVERS}")
         except Exception as e:
@@ -44,21 +202,24 @@ class KafkaToMySQLConsumer:
             raise
     
     def setup_mysql_connection(self):
-        """Set up MySQL connection"""
+        """Set up the MySQL connection pool"""
         max_retries = 10
         retry_count = 0
         
         while retry_count < max_retries:
             try:
-                self.mysql_connection = mysql.connector.connect(
+                # Pool names must be unique per process; the pool itself is never shared across processes
+                self.mysql_pool = MySQLConnectionPool(
+                    pool_name=f"consumer-{os.getpid()}",
+                    pool_size=self.pool_size,
                     host=MYSQL_HOST,
                     port=MYSQL_PORT,
                     database=MYSQL_DATABASE,
                     user=MYSQL_USER,
                     password=MYSQL_PASSWORD,
-                    autocommit=True
+                    autocommit=False
                 )
-                logger.info(f"MySQL connection established to {MYSQL_HOST}:{MYSQL_PORT}")
+                logger.info(f"MySQL connection pool ({self.pool_size}) established to {MYSQL_HOST}:{MYSQL_PORT}")
                 break
             except Error as e:
                 retry_count += 1
@@ -69,82 +230,333 @@ class KafkaToMySQLConsumer:
                     logger.error("Max retries reached. Could not connect to MySQL")
                     raise
     
+    def build_row(self, tweet_data, source=NO_SOURCE):
+        """Validate a parsed tweet message and turn it and its (topic, partition, offset) into an INSERT_QUERY row"""
+        return convert_tweet(tweet_data).as_row(source)
+    
     def insert_tweet(self, tweet_data):
-        """Insert tweet data into MySQL"""
+        """Insert a single tweet into MySQL"""
         try:
-            cursor = self.mysql_connection.cursor()
-            
-            # Parse timestamp
-            timestamp = None
-            if 'iso_timestamp' in tweet_data:
-                try:
-                    timestamp = datetime.fromisoformat(tweet_data['iso_timestamp'].replace('Z', '+00:00'))
-                except:
-                    pass
-            
-            if not timestamp and 'timestamp' in tweet_data:
-                try:
-                    timestamp = datetime.strptime(tweet_data['timestamp'], '%Y-%m-%d %H:%M:%S')
-                except:
-                    pass
-            
-            if not timestamp:
-                timestamp = datetime.now()
-            
-            insert_query = """
-            INSERT INTO tweets (
-                user_id, screen_name, tweet, timestamp, iso_timestamp,
-                location, verified, statuses_count, mbti_personality,
-                total_retweet_count, total_favorite_count
-            ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-            """
-            
-            values = (
-                tweet_data.get('user_id'),
-                tweet_data.get('screen_name', ''),
-                tweet_data.get('tweet', ''),
-                timestamp,
-                timestamp,
-                tweet_data.get('location', ''),
-                tweet_data.get('verified', False),
-                tweet_data.get('statuses_count', 0),
-                tweet_data.get('mbti_personality', 'unknown'),
-                tweet_data.get('total_retweet_count', 0),
-                tweet_data.get('total_favorite_count', 0)
-            )
-            
-            cursor.execute(insert_query, values)
-            cursor.close()
-            
-            logger.info(f"Inserted tweet from user {tweet_data.get('screen_name')} (ID: {tweet_data.get('user_id')})")
-            
+            self.insert_batch([self.build_row(tweet_data)])
+            self.inserted_log("Inserted tweet from user %s (ID: %s)", tweet_data.get('screen_name'), tweet_data.get('user_id'))
+        except DecodeError as e:
+            logger.error(f"Invalid tweet message: {e}")
         except Error as e:
             logger.error(f"Error inserting tweet into MySQL: {e}")
-            # Try to reconnect
-            self.setup_mysql_connection()
     
-    def consume_messages(self):
-        """Main loop to consume messages from Kafka and insert into MySQL"""
-        logger.info("Starting Kafka to MySQL consumer...")
+    def insert_batch(self, rows, rejected=(), window_rows=(), sketches=None, latency_rows=()):
+        """Insert rows (plus rejected records, closed windows, drained sketches and latency
+        percentiles) in a single transaction
+
+        Returns the number of new rows; the rest were already stored by an earlier delivery.
+        """
+        # The pool reconnects a borrowed connection that was dropped since its last use
+        connection = self.mysql_pool.get_connection()
+        cursor = connection.cursor()
+        try:
+            # executemany rewrites the INSERT ... ON DUPLICATE KEY UPDATE into one multi-row statement
+            inserted = 0
+            user_rows = []
+            if rows:
+                new_rows = self.unstored_rows(cursor, rows) if self.rollups else rows
+                user_rows = self.users.changes(rows)
+                if user_rows:
+                    cursor.executemany(USER_UPSERT, user_rows)
+                cursor.executemany(INSERT_QUERY, [fact_row(row) for row in rows])
+                inserted = cursor.rowcount
+                if self.rollups and new_rows:
+                    apply_deltas(cursor, new_rows)
+            if rejected:
+                cursor.executemany(REJECT_QUERY, rejected)
+            if window_rows:
+                cursor.executemany(WINDOW_QUERY, window_rows)
+            if sketches is not None:
+                flush_sketches(cursor, *sketches)
+            if latency_rows:
+                cursor.executemany(LATENCY_QUERY, latency_rows)
+            connection.commit()
+            # Only cache what is durable, a rolled back upsert is retried with the batch
+            self.users.remember(user_rows)
+            return inserted
+        except Error:
+            if connection.is_connected():
+                connection.rollback()
+            raise
+        finally:
+            cursor.close()
+            # Returns the connection to the pool
+            connection.close()
+    
+    def unstored_rows(self, cursor, rows):
+        """Rows whose Kafka coordinates are not in tweet_facts yet (one index range probe per partition)"""
+        offsets = {}
+        for row in rows:
+            topic, partition, offset = row[-3:]
+            if offset is not None:
+                offsets.setdefault((topic, partition), []).append(offset)
         
+        stored = set()
+        for (topic, partition), partition_offsets in offsets.items():
+            cursor.execute(STORED_OFFSETS_QUERY, (topic, partition, min(partition_offsets), max(partition_offsets)))
+            stored.update((topic, partition, offset) for (offset,) in cursor.fetchall())
+        
+        if not stored:
+            return rows
+        return [row for row in rows if tuple(row[-3:]) not in stored]
+    
+    def load_sketch_offsets(self, tps):
+        """Fetch the sketch_offsets of partitions seen for the first time since (re)assignment"""
+        connection = self.mysql_pool.get_connection()
+        cursor = connection.cursor()
         try:
-            for message in self.consumer:
+            for tp in tps:
+                self.sketch_offsets[tp] = stored_offset(cursor, tp)
+            connection.rollback()
+        finally:
+            cursor.close()
+            connection.close()
+    
+    def poll_batch(self):
+        """Poll until batch_size records are buffered or linger_ms has elapsed"""
+        records = {}
+        count = 0
+        deadline = time.time() + self.linger_ms / 1000.0
+        
+        while count < self.batch_size:
+            remaining_ms = int((deadline - time.time()) * 1000)
+            if remaining_ms <= 0:
+                break
+            polled = self.consumer.poll(timeout_ms=remaining_ms, max_records=self.batch_size - count)
+            for tp, messages in polled.items():
+                records.setdefault(tp, []).extend(messages)
+                count += len(messages)
+        
+        return records
+    
+    def rewind(self, records):
+        """Seek each partition back to the first offset of a failed batch"""
+        for tp, messages in records.items():
+            self.consumer.seek(tp, messages[0].offset)
+    
+    def rewind_to_committed(self):
+        """Seek every assigned partition back to its committed offset (the window stage rebuilds from there)"""
+        for tp in self.consumer.assignment():
+            offset = self.consumer.committed(tp)
+            if offset is None:
+                self.consumer.seek_to_beginning(tp)
+            else:
+                self.consumer.seek(tp, offset)
+    
+    def replay_from_committed(self):
+        """Drop the in-memory window and sketch state and replay from the committed offsets to rebuild it"""
+        if self.windows is not None:
+            self.windows.reset()
+        if self.sketches is not None:
+            self.sketches.reset()
+            self.sketch_offsets = {}
+        self.rewind_to_committed()
+    
+    def commit_offsets(self):
+        """Commit consumed offsets, held back to the first record of any still open window or unflushed sketch"""
+        if self.windows is None and self.sketches is None:
+            self.consumer.commit()
+            return
+        offsets = {}
+        for tp in self.consumer.assignment():
+            offset = self.consumer.position(tp)
+            if self.windows is not None:
+                offset = self.windows.commit_offset(tp, offset)
+            if self.sketches is not None:
+                offset = self.sketches.commit_offset(tp, offset)
+            offsets[tp] = OffsetAndMetadata(offset, '')
+        self.consumer.commit(offsets)
+    
+    def process_batch(self, records):
+        """Write one polled batch to MySQL and commit its offsets on success"""
+        rows = []
+        rejected = []
+        traces = []
+        if self.windows is not None:
+            self.windows.retain(self.consumer.assignment())
+        if self.sketches is not None:
+            assigned = self.consumer.assignment()
+            self.sketches.retain(assigned)
+            self.sketch_offsets = {tp: offset for tp, offset in self.sketch_offsets.items() if tp in assigned}
+            self.load_sketch_offsets([tp for tp in records if tp not in self.sketch_offsets])
+        for tp, messages in records.items():
+            for message in messages:
+                source = (message.topic, message.partition, message.offset)
+                received = datetime.fromtimestamp(message.timestamp / 1000)
                 try:
-                    tweet_data = message.value
-                    self.insert_tweet(tweet_data)
-                except Exception as e:
-                    logger.error(f"Error processing message: {e}")
+                    row = decode_tweet(message.value).as_row(source, received)
+                except DecodeError as e:
+                    rejected.append((*source, str(e)[:512], message.value))
                     continue
+                rows.append(row)
+                if self.latency is not None:
+                    try:
+                        trace = trace_of(message, row[3])
+                    except Exception as e:
+                        # Tracing is best effort, it never fails the batch
+                        trace = None
+                        self.trace_log("Not tracing %s-%s@%s: %s", *source, e)
+                    if trace is not None:
+                        traces.append(trace)
+                if self.windows is not None:
+                    self.windows.add(tp, message.offset, row)
+                # Records before the stored sketch offset were already merged by an earlier flush
+                if self.sketches is not None and message.offset >= self.sketch_offsets[tp]:
+                    self.sketches.add(tp, message.offset, row)
+        
+        consumed = sum(len(messages) for messages in records.values())
+        window_rows = self.windows.close() if self.windows is not None else []
+        sketches = self.sketches.drain() if self.sketches is not None and self.sketches.due() else None
+        latency_rows = self.latency.closed_rows() if self.latency is not None else []
+        
+        inserted = 0
+        try:
+            if rows or rejected or window_rows or sketches or latency_rows:
+                started = time.perf_counter()
+                inserted = self.insert_batch(rows, rejected, window_rows, sketches, latency_rows)
+                self.batch_latency.record((time.perf_counter() - started) * 1e6)
+        except Error as e:
+            self.stats['batches_failed'] += 1
+            logger.error(f"Error inserting batch of {len(rows)} tweets into MySQL: {e}")
+            # Redeliver the whole batch, offsets stay uncommitted; the next batch gets a fresh connection
+            if self.windows is not None or self.sketches is not None:
+                # The in-memory windows and sketches already contain this batch: rebuild them by replaying
+                self.replay_from_committed()
+            else:
+                self.rewind(records)
+            return
+        
+        if self.latency is not None:
+            # The rows are visible from here on: this is their insert time
+            try:
+                self.latency.observe(traces)
+            except Exception as e:
+                self.trace_log("Dropping the latency samples of a batch: %s", e)
+            self.latency.discard(latency_rows)
+        if sketches is not None:
+            for tp, offset in sketches[1].items():
+                self.sketch_offsets[tp] = max(self.sketch_offsets.get(tp, 0), offset)
+        
+        # Offsets are only committed once the rows are durable in MySQL
+        self.commit_offsets()
+        self.stats['messages_consumed'] += consumed
+        self.stats['rows_inserted'] += inserted
+        self.stats['rows_duplicate'] += len(rows) - inserted
+        self.stats['messages_invalid'] += len(rejected)
+        self.stats['batches_committed'] += 1
+        for tp, messages in records.items():
+            self.partition_rows[tp] = self.partition_rows.get(tp, 0) + len(messages)
+            # highwater() comes from the last fetch response, so this costs no extra request
+            highwater = self.consumer.highwater(tp)
+            if highwater is not None and messages:
+                self.partition_lag[tp] = highwater - messages[-1].offset - 1
+        if rejected:
+            # One line per batch, the records themselves are in rejected_tweets
+            topic, partition, offset, error, _ = rejected[0]
+            logger.warning(f"Routed {len(rejected)} invalid records to rejected_tweets "
+                           f"(first: {topic}-{partition}@{offset}: {error})")
+        logger.debug(f"Committed batch of {len(rows)} tweets ({len(rows) - inserted} already stored)")
+    
+    def get_stats(self):
+        """Return throughput counters since startup"""
+        elapsed = max(time.time() - self.started_at, 1e-9)
+        stats = dict(self.stats)
+        stats['elapsed_seconds'] = round(elapsed, 1)
+        stats['rows_per_second'] = round((self.stats['rows_inserted'] + self.stats['rows_duplicate']) / elapsed, 1)
+        return stats
+    
+    def partition_stats(self):
+        """Per assigned partition: records/s since the previous call and lag behind the high watermark"""
+        now = time.time()
+        elapsed = max(now - self.last_stats_at, 1e-9)
+        partitions = {}
+        assigned = self.consumer.assignment()
+        for tp in sorted(assigned):
+            rows = self.partition_rows.get(tp, 0)
+            # highwater() comes from the last fetch response, so this costs no extra request
+            highwater = self.consumer.highwater(tp)
+            lag = highwater - self.consumer.position(tp) if highwater is not None else None
+            partitions[f"{tp.topic}-{tp.partition}"] = {
+                'rate': round((rows - self.last_partition_rows.get(tp, 0)) / elapsed, 1),
+                'lag': lag,
+            }
+        self.last_partition_rows = dict(self.partition_rows)
+        self.last_stats_at = now
+        # Forget revoked partitions
+        self.partition_lag = {tp: lag for tp, lag in self.partition_lag.items() if tp in assigned}
+        return partitions
+    
+    def log_stats(self):
+        """Log throughput counters"""
+        stats = self.get_stats()
+        logger.info(f"[{self.worker_name}] Consumer stats - Rows: {stats['rows_inserted']}, "
+                   f"Duplicates: {stats['rows_duplicate']}, "
+                   f"Batches: {stats['batches_committed']} ok / {stats['batches_failed']} failed, "
+                   f"Invalid: {stats['messages_invalid']}, "
+                   f"User upserts: {self.users.stats['upserts']} ({self.users.stats['hits']} cached), "
+                   f"Rate: {stats['rows_per_second']} rows/s")
+        if self.windows is not None:
+            logger.info(f"[{self.worker_name}] Window stats - Open: {self.windows.open_windows()}, "
+                       f"Flushed: {self.windows.stats['windows_flushed']}, "
+                       f"Late records dropped: {self.windows.stats['records_late']}")
+        if self.latency is not None:
+            summaries = self.latency.interval_summaries()
+            if summaries['end_to_end']['count']:
+                logger.info(f"[{self.worker_name}] Latency stats - " + ", ".join(
+                    f"{hop}: {format_summary(summaries[hop])}" for hop in HOPS))
+        partitions = self.partition_stats()
+        if partitions:
+            logger.info(f"[{self.worker_name}] Partition stats - " + ", ".join(
+                f"{name}: {p['rate']} msgs/s, lag {p['lag'] if p['lag'] is not None else '?'}"
+                for name, p in partitions.items()))
+    
+    def consume_messages(self, counters=None):
+        """Main loop to consume message batches from Kafka and insert into MySQL
+
+        counters is an optional shared (consumed, inserted) pair the supervisor reads
+        per-worker throughput from; it is refreshed after every batch.
+        """
+        logger.info(f"Starting Kafka to MySQL consumer (batch size {self.batch_size}, "
+                   f"linger {self.linger_ms} ms)...")
+        serve(self.metrics, self.metrics_port)
+        SignalProfiler(f"consumer-{self.worker_name}").install()
+        last_stats = time.time()
+        
+        try:
+            while True:
+                records = self.poll_batch()
+                # Idle polls still run to flush windows whose watermark passed, pending sketches and closed latency minutes
+                if (records or (self.windows is not None and self.windows.open_windows())
+                        or (self.sketches is not None and self.sketches.pending())
+                        or (self.latency is not None and self.latency.pending())):
+                    try:
+                        self.process_batch(records)
+                    except Exception as e:
+                        logger.error(f"Error processing batch: {e}")
+                        if self.windows is not None or self.sketches is not None:
+                            self.replay_from_committed()
+                        else:
+                            self.rewind(records)
+                    if counters is not None:
+                        counters[0] = self.stats['messages_consumed']
+                        counters[1] = self.stats['rows_inserted']
+                
+                if time.time() - last_stats >= STATS_INTERVAL:
+                    self.log_stats()
+                    last_stats = time.time()
                     
         except KeyboardInterrupt:
             logger.info("Stopping consumer...")
         except Exception as e:
             logger.error(f"Error in consumer loop: {e}")
         finally:
+            self.log_stats()
             if self.consumer:
                 self.consumer.close()
-            if self.mysql_connection:
-                self.mysql_connection.close()
 
 if __name__ == "__main__":
     consumer = KafkaToMySQLConsumer()
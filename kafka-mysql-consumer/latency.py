@@ -0,0 +1,108 @@
+"""
+End-to-end latency tracing for the consumer
+Each live record carries four timestamps: the publish time (the message timestamp), the
+bridge receive time (the bridge_received_us Kafka header), the Kafka record timestamp
+(the broker append time when the topic uses LogAppendTime, as in docker-compose-mysql.yml)
+and the commit of the batch that inserted it. Their differences are recorded into
+per-hop histograms per minute of commit time, and every closed minute becomes one
+pipeline_latency row per hop with its percentiles.
+
+Records without the header (backfills produced straight to Kafka, bridge spool replays)
+are not traced: their timestamps do not measure the live path. Publish times are naive
+and compared as UTC, like the pipeline containers' clocks.
+"""
+
+import struct
+import time
+from datetime import datetime, timezone
+
+from histogram import LatencyHistogram
+
+TRACE_HEADER = 'bridge_received_us'
+TRACE_VALUE = struct.Struct('>q')
+
+HOPS = ('publish_to_bridge', 'bridge_to_kafka', 'kafka_to_mysql', 'end_to_end')
+
+EPOCH = datetime(1970, 1, 1)
+
+LATENCY_QUERY = """
+INSERT INTO pipeline_latency (
+    bucket_start, bucket_seconds, worker, hop, samples, p50_ms, p99_ms, p999_ms, max_ms
+) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+ON DUPLICATE KEY UPDATE
+    samples = VALUES(samples),
+    p50_ms = VALUES(p50_ms),
+    p99_ms = VALUES(p99_ms),
+    p999_ms = VALUES(p999_ms),
+    max_ms = VALUES(max_ms)
+"""
+
+
+def trace_of(message, event_time):
+    """(publish, bridge, kafka) microsecond timestamps of a Kafka record, or None when it is not traced"""
+    for key, value in message.headers or ():
+        if key == TRACE_HEADER and len(value) == TRACE_VALUE.size:
+            if event_time.tzinfo is not None:
+                # iso_timestamp with an offset decodes timezone-aware
+                event_time = event_time.astimezone(timezone.utc).replace(tzinfo=None)
+            publish = (event_time - EPOCH).total_seconds() * 1e6
+            return publish, TRACE_VALUE.unpack(value)[0], message.timestamp * 1000
+    return None
+
+
+class LatencyRecorder:
+    def __init__(self, worker_name, bucket_seconds=60):
+        self.worker_name = worker_name
+        self.bucket_seconds = bucket_seconds
+        # bucket start (epoch seconds) -> {hop: LatencyHistogram}
+        self.buckets = {}
+        # Since startup (the metrics endpoint) and as of the last stats line
+        self.totals = {hop: LatencyHistogram() for hop in HOPS}
+        self.reported = {hop: LatencyHistogram() for hop in HOPS}
+
+    def observe(self, traces, committed=None):
+        """Record the traces of a batch committed at committed (epoch seconds)"""
+        if not traces:
+            return
+        committed = time.time() if committed is None else committed
+        bucket = int(committed // self.bucket_seconds * self.bucket_seconds)
+        histograms = self.buckets.get(bucket)
+        if histograms is None:
+            histograms = self.buckets[bucket] = {hop: LatencyHistogram() for hop in HOPS}
+        committed_us = committed * 1e6
+        for publish, bridge, kafka in traces:
+            for hop, value in zip(HOPS, (bridge - publish, kafka - bridge, committed_us - kafka,
+                                         committed_us - publish)):
+                histograms[hop].record(value)
+                self.totals[hop].record(value)
+
+    def pending(self, now=None):
+        """Whether a minute has closed and waits to be written"""
+        now = time.time() if now is None else now
+        return any(bucket + self.bucket_seconds <= now for bucket in self.buckets)
+
+    def closed_rows(self, now=None):
+        """LATENCY_QUERY rows of the closed buckets; they stay until discard() after the commit"""
+        now = time.time() if now is None else now
+        rows = []
+        for bucket, histograms in sorted(self.buckets.items()):
+            if bucket + self.bucket_seconds > now:
+                continue
+            start = datetime.utcfromtimestamp(bucket)
+            for hop, histogram in histograms.items():
+                summary = histogram.summary()
+                rows.append((start, self.bucket_seconds, self.worker_name, hop, summary['count'],
+                             summary['p50'], summary['p99'], summary['p999'], summary['max']))
+        return rows
+
+    def discard(self, rows):
+        for row in rows:
+            self.buckets.pop(int((row[0] - EPOCH).total_seconds()), None)
+
+    def interval_summaries(self):
+        """{hop: summary} since the previous call"""
+        summaries = {}
+        for hop, histogram in self.totals.items():
+            summaries[hop] = histogram.since(self.reported[hop]).summary()
+            self.reported[hop] = histogram.copy()
+        return summaries
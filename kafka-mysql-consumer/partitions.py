@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""
+Partition maintenance for tweet_facts
+tweet_facts is RANGE partitioned on timestamp, one partition per day (or hour), with
+an empty p_future partition catching everything past the last bound. This job keeps
+TWEETS_PARTITIONS_AHEAD partitions ready ahead of now by splitting them off
+p_future. Rows already in p_future (e.g. on the first run) get one partition per
+interval from the oldest of them on. It also drops partitions that ended more than
+TWEETS_RETENTION_DAYS ago, which removes their rows without a DELETE.
+
+    python partitions.py maintain [--dry-run] [--every SECONDS] [--backfill-from TIME]
+    python partitions.py list
+"""
+
+import argparse
+import logging
+import os
+import time
+from datetime import datetime, timedelta
+
+import mysql.connector
+
+logger = logging.getLogger(__name__)
+
+TABLE = 'tweet_facts'
+FUTURE = 'p_future'
+
+# day or hour
+TWEETS_PARTITION_INTERVAL = os.getenv('TWEETS_PARTITION_INTERVAL', 'day')
+TWEETS_PARTITIONS_AHEAD = int(os.getenv('TWEETS_PARTITIONS_AHEAD', 7))
+# 0 keeps every partition
+TWEETS_RETENTION_DAYS = int(os.getenv('TWEETS_RETENTION_DAYS', 0))
+
+INTERVALS = {'day': timedelta(days=1), 'hour': timedelta(hours=1)}
+# Partitions per table allowed by MySQL
+MAX_PARTITIONS = 8192
+
+PARTITIONS_QUERY = """
+SELECT PARTITION_NAME, PARTITION_DESCRIPTION, TABLE_ROWS
+FROM INFORMATION_SCHEMA.PARTITIONS
+WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s
+ORDER BY PARTITION_ORDINAL_POSITION
+"""
+OLDEST_QUERY = f"SELECT MIN(timestamp) FROM {TABLE} PARTITION ({FUTURE})"
+
+
+def floor_time(moment, interval):
+    if interval == 'hour':
+        return moment.replace(minute=0, second=0, microsecond=0)
+    return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def partition_name(start, interval):
+    """Partitions are named after the start of the range they hold"""
+    return start.strftime('p%Y%m%d%H' if interval == 'hour' else 'p%Y%m%d')
+
+
+def list_partitions(cursor):
+    """[(name, upper bound or None for MAXVALUE, approximate rows)] in bound order"""
+    cursor.execute(PARTITIONS_QUERY, (TABLE,))
+    partitions = []
+    for name, description, rows in cursor.fetchall():
+        if name is None:
+            raise RuntimeError(f"{TABLE} is not partitioned (apply config/mysql/migrations/007_partition_tweet_facts.sql)")
+        bound = None if description == 'MAXVALUE' else datetime.fromisoformat(description.strip("'"))
+        partitions.append((name, bound, rows))
+    if not partitions or partitions[-1][1] is not None:
+        raise RuntimeError(f"{TABLE} has no {FUTURE} (MAXVALUE) partition")
+    return partitions
+
+
+def plan(partitions, now, interval=TWEETS_PARTITION_INTERVAL, ahead=TWEETS_PARTITIONS_AHEAD,
+         retention_days=TWEETS_RETENTION_DAYS, backfill_from=None, oldest=None):
+    """ALTER TABLE statements that bring the partitions of tweet_facts up to date at now
+
+    oldest is the earliest timestamp in p_future, if it holds rows. The gap since the last
+    bound (since p_history on the first run) is split into one partition per interval from
+    the oldest row on, or from backfill_from if earlier, e.g. before loading historical
+    rows into p_future; the first new partition also covers the empty part of the gap.
+    """
+    if interval not in INTERVALS:
+        raise ValueError(f"Invalid partition interval: {interval!r} (expected day or hour)")
+    if ahead < 1:
+        raise ValueError("At least one partition must be kept ahead of now")
+    step = INTERVALS[interval]
+    current = floor_time(now, interval)
+    target = current + step * ahead
+    bounds = [bound for _, bound, _ in partitions[:-1]]
+    last_bound = max(bounds) if bounds else None
+
+    split_from = current
+    for moment in (oldest, backfill_from):
+        if moment is not None:
+            split_from = min(split_from, floor_time(moment, interval))
+    start = split_from if last_bound is None else max(split_from, last_bound)
+    new = []
+    while start < target:
+        new.append((partition_name(start, interval), start + step))
+        start += step
+
+    statements = []
+    if new:
+        if len(partitions) + len(new) > MAX_PARTITIONS:
+            raise RuntimeError(f"{len(new)} new partitions would take {TABLE} past MySQL's limit of "
+                               f"{MAX_PARTITIONS} (use daily partitions or a TWEETS_RETENTION_DAYS)")
+        definitions = ", ".join(f"PARTITION {name} VALUES LESS THAN ('{bound:%Y-%m-%d %H:%M:%S}')" for name, bound in new)
+        statements.append(f"ALTER TABLE {TABLE} REORGANIZE PARTITION {FUTURE} INTO "
+                          f"({definitions}, PARTITION {FUTURE} VALUES LESS THAN (MAXVALUE))")
+
+    if retention_days > 0:
+        cutoff = current - timedelta(days=retention_days)
+        expired = [name for name, bound, _ in partitions[:-1] if bound <= cutoff]
+        if expired:
+            statements.append(f"ALTER TABLE {TABLE} DROP PARTITION {', '.join(expired)}")
+    return statements
+
+
+def maintain(connection, dry_run=False, now=None, backfill_from=None):
+    """Create upcoming partitions and drop expired ones; returns the statements run"""
+    cursor = connection.cursor()
+    try:
+        partitions = list_partitions(cursor)
+        cursor.execute(OLDEST_QUERY)
+        oldest = cursor.fetchone()[0]
+        statements = plan(partitions, now or datetime.now(), backfill_from=backfill_from, oldest=oldest)
+        for statement in statements:
+            logger.info(("Would run: " if dry_run else "Running: ") + statement)
+            if not dry_run:
+                cursor.execute(statement)
+        if not statements:
+            logger.info(f"{TABLE} partitions are up to date")
+        return statements
+    finally:
+        cursor.close()
+
+
+def connect():
+    """Connection with the consumer's settings (importing consumer also sets up logging)"""
+    from consumer import MYSQL_DATABASE, MYSQL_HOST, MYSQL_PASSWORD, MYSQL_PORT, MYSQL_USER
+    return mysql.connector.connect(
+        host=MYSQL_HOST,
+        port=MYSQL_PORT,
+        database=MYSQL_DATABASE,
+        user=MYSQL_USER,
+        password=MYSQL_PASSWORD
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintain the time partitions of tweet_facts")
+    parser.add_argument('command', choices=['maintain', 'list'],
+                        help="maintain: pre-create upcoming and drop expired partitions, list: show partitions")
+    parser.add_argument('--dry-run', action='store_true', help="Log the statements without running them")
+    parser.add_argument('--every', type=int, default=0, help="Repeat every N seconds instead of running once")
+    parser.add_argument('--retry', type=int, default=30, help="With --every, seconds before retrying a failed run")
+    parser.add_argument('--backfill-from', type=datetime.fromisoformat, default=None,
+                        help="Split the gap before now into one partition per interval from this time on")
+    args = parser.parse_args()
+
+    if args.command == 'list':
+        connection = connect()
+        try:
+            cursor = connection.cursor()
+            for name, bound, rows in list_partitions(cursor):
+                print(f"{name:<14} < {bound or 'MAXVALUE'!s:<20} ~{rows} rows")
+            cursor.close()
+        finally:
+            connection.close()
+        return
+
+    if TWEETS_PARTITION_INTERVAL == 'hour' and TWEETS_RETENTION_DAYS <= 0:
+        logger.warning(f"Hourly partitions without a TWEETS_RETENTION_DAYS reach MySQL's limit of {MAX_PARTITIONS} "
+                       f"partitions in under a year, maintenance then fails until old partitions are dropped")
+
+    if not args.every:
+        connection = connect()
+        try:
+            maintain(connection, args.dry_run, backfill_from=args.backfill_from)
+        finally:
+            connection.close()
+        return
+
+    # A fresh connection per run: MySQL may still be starting or may have dropped an idle one
+    try:
+        while True:
+            try:
+                connection = connect()
+                try:
+                    maintain(connection, args.dry_run, backfill_from=args.backfill_from)
+                finally:
+                    connection.close()
+                delay = args.every
+            except (mysql.connector.Error, RuntimeError) as e:
+                delay = min(args.every, args.retry)
+                logger.error(f"Partition maintenance failed, retrying in {delay} s: {e}")
+            time.sleep(delay)
+    except KeyboardInterrupt:
+        logger.info("Stopping partition maintenance...")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""
+Typed tweet records for the consumer
+Kafka values are decoded straight into a schema-defined struct in one pass (type
+checks, defaults, datetime parsing), then flattened into INSERT_QUERY row tuples.
+Values are JSON or binary frames (python-publisher/wire.py), told apart by their
+first byte.
+"""
+
+import struct
+from datetime import datetime, timedelta
+from typing import Optional
+
+import msgspec
+
+
+class TweetRecord(msgspec.Struct):
+    """Message schema published by the bridge; unknown fields are ignored"""
+    user_id: int
+    screen_name: Optional[str] = ''
+    tweet: Optional[str] = ''
+    # "YYYY-MM-DD HH:MM:SS", only used when iso_timestamp is missing
+    timestamp: Optional[datetime] = None
+    iso_timestamp: Optional[datetime] = None
+    location: Optional[str] = ''
+    verified: Optional[bool] = False
+    statuses_count: Optional[int] = 0
+    mbti_personality: Optional[str] = 'unknown'
+    total_retweet_count: Optional[int] = 0
+    total_favorite_count: Optional[int] = 0
+
+    def as_row(self, source, received=None):
+        """Row tuple for INSERT_QUERY; source is the (topic, partition, offset) of the record
+
+        Without a timestamp in the message, received (the Kafka record timestamp) is
+        used, so a replayed record gets the same timestamp, which is part of its
+        unique key in the partitioned tweet_facts table.
+        """
+        timestamp = self.iso_timestamp or self.timestamp or received or datetime.now()
+        return (
+            self.user_id,
+            self.screen_name,
+            self.tweet,
+            timestamp,
+            timestamp,
+            self.location,
+            self.verified,
+            self.statuses_count,
+            self.mbti_personality,
+            self.total_retweet_count,
+            self.total_favorite_count,
+            *source
+        )
+
+
+_decoder = msgspec.json.Decoder(TweetRecord)
+
+# Validation failures: malformed JSON or fields of the wrong type
+DecodeError = msgspec.DecodeError
+
+
+# Binary frames: version byte 1, 4-byte big-endian schema id, Avro body
+FRAME_MARKER = b'\x01'
+FRAME_HEADER = struct.Struct('>BI')
+EPOCH = datetime(1970, 1, 1)
+
+# Decoded profile fields by their encoded bytes; a user's frames all end with the same ones
+PROFILE_CACHE_SIZE = 100000
+_profiles = {}
+
+
+def _read_long(payload, pos):
+    """Avro zig-zag varint at pos; returns (value, next pos)"""
+    value = shift = 0
+    while True:
+        byte = payload[pos]
+        pos += 1
+        value |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return (value >> 1) ^ -(value & 1), pos
+        shift += 7
+
+
+def _read_string(payload, pos):
+    length, pos = _read_long(payload, pos)
+    end = pos + length
+    if length < 0 or end > len(payload):
+        raise DecodeError("Binary frame string runs past the end of the frame")
+    return payload[pos:end].decode('utf-8'), end
+
+
+def _decode_profile(profile):
+    """screen_name, location, verified, statuses_count, mbti_personality, retweets, favorites"""
+    screen_name, pos = _read_string(profile, 0)
+    location, pos = _read_string(profile, pos)
+    verified = profile[pos] == 1
+    statuses_count, pos = _read_long(profile, pos + 1)
+    mbti_personality, pos = _read_string(profile, pos)
+    total_retweet_count, pos = _read_long(profile, pos)
+    total_favorite_count, pos = _read_long(profile, pos)
+    if pos != len(profile):
+        raise DecodeError("Trailing bytes after the binary frame profile")
+    return (screen_name, location, verified, statuses_count, mbti_personality,
+            total_retweet_count, total_favorite_count)
+
+
+def _decode_tweet_v1(payload):
+    """Schema 1 (config/schemas/tweet-1.avsc): user_id, timestamp, tweet, then the profile fields"""
+    user_id, pos = _read_long(payload, FRAME_HEADER.size)
+    micros, pos = _read_long(payload, pos)
+    tweet, pos = _read_string(payload, pos)
+    profile = payload[pos:]
+    fields = _profiles.get(profile)
+    if fields is None:
+        fields = _decode_profile(profile)
+        if len(_profiles) >= PROFILE_CACHE_SIZE:
+            _profiles.clear()
+        _profiles[profile] = fields
+    screen_name, location, verified, statuses_count, mbti_personality, retweets, favorites = fields
+    timestamp = EPOCH + timedelta(microseconds=micros)
+    return TweetRecord(user_id, screen_name, tweet, timestamp, timestamp, location, verified,
+                       statuses_count, mbti_personality, retweets, favorites)
+
+
+# Registered schema ids of binary frames
+FRAME_DECODERS = {1: _decode_tweet_v1}
+
+
+def decode_frame(payload):
+    """Decode one binary frame; raises DecodeError"""
+    try:
+        _, schema_id = FRAME_HEADER.unpack_from(payload)
+        decoder = FRAME_DECODERS.get(schema_id)
+        if decoder is None:
+            raise DecodeError(f"Unknown binary frame schema id {schema_id}")
+        return decoder(payload)
+    except (IndexError, struct.error, UnicodeDecodeError, OverflowError) as e:
+        raise DecodeError(f"Malformed binary frame: {e}") from None
+
+
+def decode_tweet(payload):
+    """Decode and validate one raw Kafka value, JSON or binary frame; raises DecodeError"""
+    if payload[:1] == FRAME_MARKER:
+        return decode_frame(payload)
+    return _decoder.decode(payload)
+
+
+def convert_tweet(tweet_data):
+    """Validate an already parsed message dict; raises DecodeError"""
+    return msgspec.convert(tweet_data, TweetRecord)
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""
+Incrementally maintained analytics rollups
+The consumer folds every committed batch into per-minute and per-hour
+MBTI x verified aggregates, per-hour active users and per-user totals, in the same
+transaction as the raw rows. The analytics views read these tables, so a dashboard
+refresh touches O(buckets) rows instead of scanning `tweets`.
+
+    python rollups.py rebuild    # recompute every rollup from the tweets table
+"""
+
+import argparse
+import logging
+
+import mysql.connector
+
+logger = logging.getLogger(__name__)
+
+# Row layout of consumer.INSERT_QUERY
+USER_ID, SCREEN_NAME, TIMESTAMP, LOCATION, VERIFIED, STATUSES, MBTI, RETWEETS, FAVORITES = 0, 1, 3, 5, 6, 7, 8, 9, 10
+
+BUCKET_UPSERT = """
+INSERT INTO {table} (
+    bucket, mbti_personality, verified,
+    tweet_count, statuses_sum, retweet_sum, favorite_sum
+) VALUES (%s, %s, %s, %s, %s, %s, %s)
+ON DUPLICATE KEY UPDATE
+    tweet_count = tweet_count + VALUES(tweet_count),
+    statuses_sum = statuses_sum + VALUES(statuses_sum),
+    retweet_sum = retweet_sum + VALUES(retweet_sum),
+    favorite_sum = favorite_sum + VALUES(favorite_sum)
+"""
+
+HOUR_USERS_UPSERT = """
+INSERT INTO tweet_rollup_hour_users (bucket, user_id) VALUES (%s, %s)
+ON DUPLICATE KEY UPDATE user_id = user_id
+"""
+
+# Profile attributes follow the most recent batch, counters accumulate
+USER_UPSERT = """
+INSERT INTO user_rollup (
+    user_id, screen_name, mbti_personality, location, verified,
+    tweet_count, statuses_sum, retweet_sum, favorite_sum, first_tweet, last_tweet
+) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+ON DUPLICATE KEY UPDATE
+    screen_name = VALUES(screen_name),
+    mbti_personality = VALUES(mbti_personality),
+    location = VALUES(location),
+    verified = VALUES(verified),
+    tweet_count = tweet_count + VALUES(tweet_count),
+    statuses_sum = statuses_sum + VALUES(statuses_sum),
+    retweet_sum = retweet_sum + VALUES(retweet_sum),
+    favorite_sum = favorite_sum + VALUES(favorite_sum),
+    first_tweet = LEAST(first_tweet, VALUES(first_tweet)),
+    last_tweet = GREATEST(last_tweet, VALUES(last_tweet))
+"""
+
+REBUILD_STATEMENTS = [
+    "DELETE FROM tweet_rollup_minute",
+    "DELETE FROM tweet_rollup_hour",
+    "DELETE FROM tweet_rollup_hour_users",
+    "DELETE FROM user_rollup",
+    """
+    INSERT INTO tweet_rollup_minute
+        (bucket, mbti_personality, verified, tweet_count, statuses_sum, retweet_sum, favorite_sum)
+    SELECT DATE_FORMAT(timestamp, '%Y-%m-%d %H:%i:00'), COALESCE(mbti_personality, 'unknown'),
+           COALESCE(verified, FALSE), COUNT(*), COALESCE(SUM(statuses_count), 0),
+           COALESCE(SUM(total_retweet_count), 0), COALESCE(SUM(total_favorite_count), 0)
+    FROM tweets
+    WHERE timestamp IS NOT NULL
+    GROUP BY 1, 2, 3
+    """,
+    """
+    INSERT INTO tweet_rollup_hour
+        (bucket, mbti_personality, verified, tweet_count, statuses_sum, retweet_sum, favorite_sum)
+    SELECT DATE_FORMAT(bucket, '%Y-%m-%d %H:00:00'), mbti_personality, verified,
+           SUM(tweet_count), SUM(statuses_sum), SUM(retweet_sum), SUM(favorite_sum)
+    FROM tweet_rollup_minute
+    GROUP BY 1, 2, 3
+    """,
+    """
+    INSERT INTO tweet_rollup_hour_users (bucket, user_id)
+    SELECT DISTINCT DATE_FORMAT(timestamp, '%Y-%m-%d %H:00:00'), user_id
+    FROM tweets
+    WHERE timestamp IS NOT NULL
+    """,
+    """
+    INSERT INTO user_rollup (
+        user_id, screen_name, mbti_personality, location, verified,
+        tweet_count, statuses_sum, retweet_sum, favorite_sum, first_tweet, last_tweet
+    )
+    SELECT u.user_id, u.screen_name, COALESCE(u.mbti_personality, 'unknown'), u.location,
+           COALESCE(u.verified, FALSE), a.tweet_count, a.statuses_sum, a.retweet_sum,
+           a.favorite_sum, a.first_tweet, a.last_tweet
+    FROM (
+        SELECT user_id, COUNT(*) AS tweet_count,
+               COALESCE(SUM(statuses_count), 0) AS statuses_sum,
+               COALESCE(SUM(total_retweet_count), 0) AS retweet_sum,
+               COALESCE(SUM(total_favorite_count), 0) AS favorite_sum,
+               MIN(timestamp) AS first_tweet, MAX(timestamp) AS last_tweet
+        FROM tweets
+        GROUP BY user_id
+    ) a
+    JOIN users u ON u.user_id = a.user_id
+    """,
+]
+
+
+def compute_deltas(rows):
+    """Aggregate INSERT_QUERY rows into (minute, hour, hour_users, users) upsert parameters
+
+    Every list is sorted by primary key so concurrent consumers lock rollup rows in
+    the same order and cannot deadlock each other.
+    """
+    minutes = {}
+    hours = {}
+    hour_users = set()
+    users = {}
+    for row in rows:
+        timestamp = row[TIMESTAMP].replace(tzinfo=None)
+        minute = timestamp.replace(second=0, microsecond=0)
+        hour = minute.replace(minute=0)
+        mbti = row[MBTI] or 'unknown'
+        verified = bool(row[VERIFIED])
+        statuses = row[STATUSES] or 0
+        retweets = row[RETWEETS] or 0
+        favorites = row[FAVORITES] or 0
+
+        for buckets, bucket in ((minutes, minute), (hours, hour)):
+            totals = buckets.get((bucket, mbti, verified))
+            if totals is None:
+                buckets[(bucket, mbti, verified)] = [1, statuses, retweets, favorites]
+            else:
+                totals[0] += 1
+                totals[1] += statuses
+                totals[2] += retweets
+                totals[3] += favorites
+
+        hour_users.add((hour, row[USER_ID]))
+
+        user = users.get(row[USER_ID])
+        if user is None:
+            users[row[USER_ID]] = [row[SCREEN_NAME], mbti, row[LOCATION], verified,
+                                   1, statuses, retweets, favorites, timestamp, timestamp]
+        else:
+            user[0:4] = row[SCREEN_NAME], mbti, row[LOCATION], verified
+            user[4] += 1
+            user[5] += statuses
+            user[6] += retweets
+            user[7] += favorites
+            user[8] = min(user[8], timestamp)
+            user[9] = max(user[9], timestamp)
+
+    return (
+        [key + tuple(totals) for key, totals in sorted(minutes.items())],
+        [key + tuple(totals) for key, totals in sorted(hours.items())],
+        sorted(hour_users),
+        [(user_id, *values) for user_id, values in sorted(users.items())],
+    )
+
+
+def apply_deltas(cursor, rows):
+    """Fold newly stored rows into the rollup tables inside the caller's transaction"""
+    minutes, hours, hour_users, users = compute_deltas(rows)
+    cursor.executemany(BUCKET_UPSERT.format(table='tweet_rollup_minute'), minutes)
+    cursor.executemany(BUCKET_UPSERT.format(table='tweet_rollup_hour'), hours)
+    cursor.executemany(HOUR_USERS_UPSERT, hour_users)
+    cursor.executemany(USER_UPSERT, users)
+
+
+def rebuild(connection):
+    """Recompute every rollup from the raw tweets table in one transaction
+
+    Stop the consumers first: batches committed while the rebuild runs would be
+    counted by both.
+    """
+    cursor = connection.cursor()
+    try:
+        for statement in REBUILD_STATEMENTS:
+            cursor.execute(statement)
+        connection.commit()
+        logger.info("Rollups rebuilt from the tweets table")
+    except mysql.connector.Error:
+        connection.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Maintain the analytics rollup tables")
+    parser.add_argument('command', choices=['rebuild'], help="rebuild: backfill all rollups from tweets")
+    parser.parse_args()
+
+    # Same connection settings (and logging setup) as the consumer
+    from consumer import MYSQL_DATABASE, MYSQL_HOST, MYSQL_PASSWORD, MYSQL_PORT, MYSQL_USER
+    connection = mysql.connector.connect(
+        host=MYSQL_HOST,
+        port=MYSQL_PORT,
+        database=MYSQL_DATABASE,
+        user=MYSQL_USER,
+        password=MYSQL_PASSWORD,
+        autocommit=False
+    )
+    try:
+        rebuild(connection)
+    finally:
+        connection.close()
+
+
+if __name__ == "__main__":
+    main()
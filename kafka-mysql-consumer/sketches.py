@@ -0,0 +1,388 @@
+#!/usr/bin/env python3
+"""
+Mergeable sketches for approximate analytics
+HyperLogLog estimates distinct users, Space-Saving keeps the top screen names and a
+Count-Min sketch answers per-name frequencies. The consumer keeps one set per time
+bucket and dimension (all tweets, and per MBTI type) and merges them into
+tweet_sketches, so any range of buckets or any number of workers combine by merging.
+
+    python sketches.py users --since "2026-10-17 00:00" --bucket 5m [--mbti intj]
+    python sketches.py top --since "2026-10-17 00:00" --bucket 1h -k 10
+"""
+
+import argparse
+import hashlib
+import json
+import math
+import struct
+import time
+import zlib
+from array import array
+from datetime import datetime
+
+MASK64 = (1 << 64) - 1
+
+# Row layout of consumer.INSERT_QUERY
+USER_ID, SCREEN_NAME, TIMESTAMP, MBTI = 0, 1, 3, 8
+
+
+def hash_int(value):
+    """splitmix64 finalizer: a stable, well-mixed 64-bit hash of an integer"""
+    z = (value + 0x9E3779B97F4A7C15) & MASK64
+    z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & MASK64
+    z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & MASK64
+    return z ^ (z >> 31)
+
+
+def hash_str(value):
+    return int.from_bytes(hashlib.blake2b(value.encode('utf-8'), digest_size=8).digest(), 'little')
+
+
+class HyperLogLog:
+    """Distinct counter with 2**p registers, standard error about 1.04 / sqrt(2**p)"""
+
+    def __init__(self, p=12, registers=None):
+        self.p = p
+        self.m = 1 << p
+        self.registers = registers if registers is not None else bytearray(self.m)
+
+    def add_hash(self, x):
+        index = x >> (64 - self.p)
+        rest = x & ((1 << (64 - self.p)) - 1)
+        rank = (64 - self.p) - rest.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def add(self, value):
+        self.add_hash(hash_int(value) if isinstance(value, int) else hash_str(value))
+
+    def merge(self, other):
+        if other.p != self.p:
+            raise ValueError("Cannot merge HyperLogLogs of different precision")
+        self.registers = bytearray(map(max, self.registers, other.registers))
+        return self
+
+    def count(self):
+        m = self.m
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / sum(2.0 ** -r for r in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            # Small range: linear counting is more accurate
+            return m * math.log(m / zeros)
+        return estimate
+
+    def to_bytes(self):
+        return zlib.compress(bytes([self.p]) + bytes(self.registers))
+
+    @classmethod
+    def from_bytes(cls, data):
+        raw = zlib.decompress(data)
+        return cls(raw[0], bytearray(raw[1:]))
+
+
+class SpaceSaving:
+    """Top-k heavy hitters; a reported count overestimates by at most its error, itself at most N / capacity"""
+
+    def __init__(self, capacity=100, counters=None):
+        self.capacity = capacity
+        # item -> [count, error]
+        self.counters = counters if counters is not None else {}
+
+    def add(self, item, weight=1):
+        counter = self.counters.get(item)
+        if counter is not None:
+            counter[0] += weight
+        elif len(self.counters) < self.capacity:
+            self.counters[item] = [weight, 0]
+        else:
+            # Replace the smallest counter; its count becomes the new item's error bound
+            victim = min(self.counters, key=lambda key: self.counters[key][0])
+            floor = self.counters.pop(victim)[0]
+            self.counters[item] = [floor + weight, floor]
+
+    def min_count(self):
+        if len(self.counters) < self.capacity:
+            return 0
+        return min(counter[0] for counter in self.counters.values())
+
+    def merge(self, other):
+        """Combine two summaries: an item missing from a full summary may have had up to its minimum count"""
+        floor_self = self.min_count()
+        floor_other = other.min_count()
+        merged = {}
+        for item in self.counters.keys() | other.counters.keys():
+            count_a, error_a = self.counters.get(item, (floor_self, floor_self))
+            count_b, error_b = other.counters.get(item, (floor_other, floor_other))
+            merged[item] = [count_a + count_b, error_a + error_b]
+        top = sorted(merged.items(), key=lambda entry: entry[1][0], reverse=True)[:self.capacity]
+        self.counters = dict(top)
+        return self
+
+    def top(self, k):
+        """[(item, count, error)] of the k largest counters"""
+        entries = sorted(self.counters.items(), key=lambda entry: entry[1][0], reverse=True)[:k]
+        return [(item, count, error) for item, (count, error) in entries]
+
+    def to_bytes(self):
+        return zlib.compress(json.dumps([self.capacity, self.counters]).encode('utf-8'))
+
+    @classmethod
+    def from_bytes(cls, data):
+        capacity, counters = json.loads(zlib.decompress(data))
+        return cls(capacity, counters)
+
+
+class CountMinSketch:
+    """Frequency estimates that never undercount; overestimate at most e * N / width with probability 1 - e**-depth"""
+
+    HEADER = struct.Struct('<II')
+
+    def __init__(self, width=1024, depth=4, table=None):
+        self.width = width
+        self.depth = depth
+        self.table = table if table is not None else array('Q', bytes(8 * width * depth))
+
+    def indexes(self, item):
+        # Kirsch-Mitzenmacher: derive the row hashes from two halves of one 64-bit hash
+        x = hash_str(item)
+        h1, h2 = x & 0xFFFFFFFF, x >> 32
+        return [row * self.width + (h1 + row * h2) % self.width for row in range(self.depth)]
+
+    def add(self, item, weight=1):
+        table = self.table
+        for index in self.indexes(item):
+            table[index] += weight
+
+    def estimate(self, item):
+        return min(self.table[index] for index in self.indexes(item))
+
+    def merge(self, other):
+        if (other.width, other.depth) != (self.width, self.depth):
+            raise ValueError("Cannot merge Count-Min sketches of different shape")
+        self.table = array('Q', map(sum, zip(self.table, other.table)))
+        return self
+
+    def to_bytes(self):
+        return zlib.compress(self.HEADER.pack(self.width, self.depth) + self.table.tobytes())
+
+    @classmethod
+    def from_bytes(cls, data):
+        raw = zlib.decompress(data)
+        width, depth = cls.HEADER.unpack_from(raw)
+        table = array('Q')
+        table.frombytes(raw[cls.HEADER.size:])
+        return cls(width, depth, table)
+
+
+class BucketSketch:
+    """Everything kept for one (bucket, dimension) cell"""
+
+    __slots__ = ('tweet_count', 'users', 'names', 'frequencies')
+
+    def __init__(self, users=None, names=None, frequencies=None, tweet_count=0):
+        self.tweet_count = tweet_count
+        self.users = users or HyperLogLog()
+        self.names = names or SpaceSaving()
+        self.frequencies = frequencies or CountMinSketch()
+
+    def add_counts(self, user_ids, name_counts):
+        for user_id in user_ids:
+            self.users.add(user_id)
+        for name, count in name_counts.items():
+            self.names.add(name, count)
+            self.frequencies.add(name, count)
+            self.tweet_count += count
+
+    def merge(self, other):
+        self.tweet_count += other.tweet_count
+        self.users.merge(other.users)
+        self.names.merge(other.names)
+        self.frequencies.merge(other.frequencies)
+        return self
+
+    def to_row(self):
+        return (self.tweet_count, self.users.to_bytes(), self.names.to_bytes(), self.frequencies.to_bytes())
+
+    @classmethod
+    def from_row(cls, tweet_count, users, names, frequencies):
+        return cls(HyperLogLog.from_bytes(users), SpaceSaving.from_bytes(names),
+                   CountMinSketch.from_bytes(frequencies), tweet_count)
+
+
+class SketchAccumulator:
+    """Per-partition sketches of rows not yet merged into tweet_sketches
+
+    Like the window stage, the consumer must not commit Kafka offsets past the first
+    unflushed record (commit_offset). Each flush also stores the next offset per
+    partition in sketch_offsets, so records replayed after a flush are skipped.
+    """
+
+    def __init__(self, bucket_seconds, flush_interval):
+        self.bucket_seconds = bucket_seconds
+        self.flush_interval = flush_interval
+        self.last_flush = time.time()
+        # tp -> {'first': offset, 'next': offset, 'cells': {key: (user ids, Counter of names)}}
+        self.partitions = {}
+
+    def add(self, tp, offset, row):
+        state = self.partitions.get(tp)
+        if state is None:
+            state = self.partitions[tp] = {'first': offset, 'next': offset + 1, 'cells': {}}
+        state['next'] = offset + 1
+
+        event = int(row[TIMESTAMP].replace(tzinfo=None).timestamp())
+        name = row[SCREEN_NAME] or ''
+        for seconds in self.bucket_seconds:
+            bucket = datetime.fromtimestamp(event - event % seconds)
+            for dimension, value in (('all', ''), ('mbti', row[MBTI] or 'unknown')):
+                cell = state['cells'].get((seconds, bucket, dimension, value))
+                if cell is None:
+                    cell = state['cells'][(seconds, bucket, dimension, value)] = (set(), {})
+                cell[0].add(row[USER_ID])
+                cell[1][name] = cell[1].get(name, 0) + 1
+
+    def pending(self):
+        return bool(self.partitions)
+
+    def due(self, now=None):
+        now = time.time() if now is None else now
+        return bool(self.partitions) and now - self.last_flush >= self.flush_interval
+
+    def drain(self):
+        """Return ({cell key: BucketSketch} merged over partitions, {tp: next offset}) and start over"""
+        merged = {}
+        offsets = {}
+        for tp, state in self.partitions.items():
+            offsets[tp] = state['next']
+            for key, (user_ids, name_counts) in state['cells'].items():
+                sketch = merged.get(key)
+                if sketch is None:
+                    sketch = merged[key] = BucketSketch()
+                sketch.add_counts(user_ids, name_counts)
+        self.partitions = {}
+        self.last_flush = time.time()
+        return merged, offsets
+
+    def commit_offset(self, tp, position):
+        state = self.partitions.get(tp)
+        return min(position, state['first']) if state is not None else position
+
+    def retain(self, assigned):
+        for tp in list(self.partitions):
+            if tp not in assigned:
+                del self.partitions[tp]
+
+    def reset(self):
+        self.partitions = {}
+
+
+SELECT_SKETCHES = """
+SELECT bucket_seconds, bucket, dimension, dimension_value, tweet_count, users_hll, names_topk, names_cms
+FROM tweet_sketches
+WHERE bucket_seconds = %s AND bucket = %s AND dimension = %s AND dimension_value = %s
+FOR UPDATE
+"""
+
+UPSERT_SKETCH = """
+INSERT INTO tweet_sketches (
+    bucket_seconds, bucket, dimension, dimension_value, tweet_count, users_hll, names_topk, names_cms
+) VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+ON DUPLICATE KEY UPDATE
+    tweet_count = VALUES(tweet_count),
+    users_hll = VALUES(users_hll),
+    names_topk = VALUES(names_topk),
+    names_cms = VALUES(names_cms)
+"""
+
+UPSERT_OFFSET = """
+INSERT INTO sketch_offsets (kafka_topic, kafka_partition, next_offset) VALUES (%s, %s, %s)
+ON DUPLICATE KEY UPDATE next_offset = GREATEST(next_offset, VALUES(next_offset))
+"""
+
+SELECT_OFFSET = """
+SELECT next_offset FROM sketch_offsets WHERE kafka_topic = %s AND kafka_partition = %s
+"""
+
+
+def flush_sketches(cursor, merged, offsets):
+    """Merge drained sketches into tweet_sketches inside the caller's transaction"""
+    rows = []
+    # Primary key order, so parallel workers lock rows in the same order
+    for key in sorted(merged):
+        sketch = merged[key]
+        cursor.execute(SELECT_SKETCHES, key)
+        stored = cursor.fetchone()
+        if stored is not None:
+            sketch = BucketSketch.from_row(*stored[4:]).merge(sketch)
+        rows.append(key + sketch.to_row())
+    if rows:
+        cursor.executemany(UPSERT_SKETCH, rows)
+    if offsets:
+        cursor.executemany(UPSERT_OFFSET, [(tp.topic, tp.partition, offset) for tp, offset in sorted(offsets.items())])
+
+
+def stored_offset(cursor, tp):
+    """Next offset of tp not yet folded into tweet_sketches (0 if never flushed)"""
+    cursor.execute(SELECT_OFFSET, (tp.topic, tp.partition))
+    row = cursor.fetchone()
+    return row[0] if row else 0
+
+
+def merged_range(cursor, since, until, bucket_seconds, dimension='all', value=''):
+    """Merge every stored sketch of [since, until) into one BucketSketch"""
+    cursor.execute("""
+        SELECT tweet_count, users_hll, names_topk, names_cms FROM tweet_sketches
+        WHERE bucket_seconds = %s AND dimension = %s AND dimension_value = %s
+          AND bucket >= %s AND bucket < %s
+    """, (bucket_seconds, dimension, value, since, until))
+    total = None
+    for row in cursor.fetchall():
+        sketch = BucketSketch.from_row(*row)
+        total = sketch if total is None else total.merge(sketch)
+    return total or BucketSketch()
+
+
+def approx_unique_users(cursor, since, until, bucket_seconds, dimension='all', value=''):
+    return round(merged_range(cursor, since, until, bucket_seconds, dimension, value).users.count())
+
+
+def top_screen_names(cursor, since, until, bucket_seconds, k=10, dimension='all', value=''):
+    """[(screen_name, count, error)] of the k most active posters"""
+    return merged_range(cursor, since, until, bucket_seconds, dimension, value).names.top(k)
+
+
+def main():
+    from consumer import MYSQL_DATABASE, MYSQL_HOST, MYSQL_PASSWORD, MYSQL_PORT, MYSQL_USER
+    from windows import parse_duration
+    import mysql.connector
+
+    parser = argparse.ArgumentParser(description="Query the approximate analytics sketches")
+    parser.add_argument('query', choices=['users', 'top'], help="users: distinct users, top: most active screen names")
+    parser.add_argument('--since', required=True, help="Range start, e.g. '2026-10-17 00:00'")
+    parser.add_argument('--until', default=None, help="Range end (default: now)")
+    parser.add_argument('--bucket', default='5m', help="Stored bucket size to read (see CONSUMER_SKETCHES)")
+    parser.add_argument('--mbti', default=None, help="Restrict to one MBTI type")
+    parser.add_argument('-k', type=int, default=10, help="Number of top names")
+    args = parser.parse_args()
+
+    since = datetime.fromisoformat(args.since)
+    until = datetime.fromisoformat(args.until) if args.until else datetime.now()
+    dimension, value = ('mbti', args.mbti) if args.mbti else ('all', '')
+
+    connection = mysql.connector.connect(host=MYSQL_HOST, port=MYSQL_PORT, database=MYSQL_DATABASE,
+                                         user=MYSQL_USER, password=MYSQL_PASSWORD)
+    try:
+        cursor = connection.cursor()
+        seconds = parse_duration(args.bucket)
+        if args.query == 'users':
+            print(approx_unique_users(cursor, since, until, seconds, dimension, value))
+        else:
+            for name, count, error in top_screen_names(cursor, since, until, seconds, args.k, dimension, value):
+                print(f"{name:<32} {count:>10} (+/- {error})")
+    finally:
+        connection.close()
+
+
+if __name__ == "__main__":
+    main()
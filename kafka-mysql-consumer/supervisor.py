@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""
+Multi-process consumer supervisor
+Runs CONSUMER_PROCESSES KafkaToMySQLConsumer workers in the same consumer group, so
+Kafka spreads the topic partitions across them (workers beyond the partition count
+stay idle). Every CONSUMER_STATS_INTERVAL seconds it logs per-worker and total
+throughput; each worker logs its own per-partition throughput and lag.
+Worker i serves its /metrics on CONSUMER_METRICS_PORT + i, and the profiling signals
+(SIGUSR1/SIGUSR2, see pipeline-common/profiling.py) are forwarded to every worker.
+Supervision itself (restarts, stats, shutdown) is pipeline-common/workers.py.
+"""
+
+import argparse
+import os
+import socket
+
+import consumer
+from consumer import KafkaToMySQLConsumer
+from workers import ProcessSupervisor
+
+CONSUMER_PROCESSES = int(os.getenv('CONSUMER_PROCESSES', os.cpu_count() or 1))
+# Seconds to wait for a worker to finish its batch and leave the group before it is killed
+CONSUMER_SHUTDOWN_TIMEOUT = int(os.getenv('CONSUMER_SHUTDOWN_TIMEOUT', 60))
+
+
+def run_worker(index, counters):
+    """Child process entry point: one Kafka consumer with its own MySQL connection pool"""
+    metrics_port = consumer.CONSUMER_METRICS_PORT + index if consumer.CONSUMER_METRICS_PORT else 0
+    worker = KafkaToMySQLConsumer(worker_name=f"{socket.gethostname()}-{index}", metrics_port=metrics_port)
+    # SIGINT is a clean shutdown: finish the batch, leave the group
+    worker.consume_messages(counters=counters)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run several Kafka to MySQL consumers in one consumer group")
+    parser.add_argument('--processes', type=int, default=CONSUMER_PROCESSES,
+                        help="Consumer worker processes (useful up to the topic partition count)")
+    args = parser.parse_args()
+
+    ProcessSupervisor(args.processes, run_worker, name='consumer', title='Supervisor',
+                      counters=('consumed', 'inserted'), unit='rows/s', stats_interval=consumer.STATS_INTERVAL,
+                      shutdown_timeout=CONSUMER_SHUTDOWN_TIMEOUT).run()
+
+
+if __name__ == "__main__":
+    main()
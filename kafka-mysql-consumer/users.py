@@ -0,0 +1,70 @@
+"""
+User dimension maintenance for the consumer
+Every message repeats its user's profile fields. tweet_facts only keeps the user_id,
+and the users table holds one row per user. An LRU cache remembers the attributes
+last written for each user, so a batch upserts only the users that are new to this
+process or whose attributes changed since.
+"""
+
+from collections import OrderedDict
+
+# Row layout of consumer.INSERT_QUERY rows (records.TweetRecord.as_row)
+USER_ID, SCREEN_NAME, LOCATION, VERIFIED, STATUSES, MBTI, RETWEETS, FAVORITES = 0, 1, 5, 6, 7, 8, 9, 10
+
+USER_UPSERT = """
+INSERT INTO users (
+    user_id, screen_name, location, verified, statuses_count,
+    mbti_personality, total_retweet_count, total_favorite_count
+) VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+ON DUPLICATE KEY UPDATE
+    screen_name = VALUES(screen_name),
+    location = VALUES(location),
+    verified = VALUES(verified),
+    statuses_count = VALUES(statuses_count),
+    mbti_personality = VALUES(mbti_personality),
+    total_retweet_count = VALUES(total_retweet_count),
+    total_favorite_count = VALUES(total_favorite_count)
+"""
+
+
+def user_row(row):
+    """USER_UPSERT parameters of an INSERT_QUERY row"""
+    return (row[USER_ID], row[SCREEN_NAME], row[LOCATION], row[VERIFIED], row[STATUSES],
+            row[MBTI], row[RETWEETS], row[FAVORITES])
+
+
+class UserCache:
+    def __init__(self, capacity):
+        self.capacity = capacity
+        # user_id -> USER_UPSERT parameters last written, least recently used first
+        self.users = OrderedDict()
+        self.stats = {'hits': 0, 'upserts': 0}
+
+    def changes(self, rows):
+        """USER_UPSERT rows for the users of a batch that are unknown or changed, sorted by user_id
+
+        The last row of a user in the batch wins. Sorting makes parallel workers lock
+        users rows in the same order.
+        """
+        latest = {}
+        for row in rows:
+            latest[row[USER_ID]] = row
+        changed = []
+        for user_id, row in latest.items():
+            values = user_row(row)
+            if self.users.get(user_id) == values:
+                self.users.move_to_end(user_id)
+                self.stats['hits'] += 1
+            else:
+                changed.append(values)
+        changed.sort(key=lambda values: values[0])
+        return changed
+
+    def remember(self, user_rows):
+        """Record USER_UPSERT rows once their transaction has committed"""
+        for values in user_rows:
+            self.users[values[0]] = values
+            self.users.move_to_end(values[0])
+        while len(self.users) > self.capacity:
+            self.users.popitem(last=False)
+        self.stats['upserts'] += len(user_rows)
@@ -0,0 +1,182 @@
+"""
+In-process windowed aggregation for the consumer
+Keeps tumbling and sliding event-time windows keyed by (mbti_personality, location,
+verified) per Kafka partition, and hands back closed windows for a bulk write to
+tweet_windows. Records are added to panes (the gcd of all window sizes and slides),
+so each record costs one update however many windows overlap it; a window is summed
+from its panes when it closes.
+
+A window closes once the partition's watermark (the latest event time seen minus
+the allowed lateness, advanced by wall-clock time while the partition is idle)
+passes its end. A record that arrives after one of its windows closed still counts
+toward its open windows; the closed ones miss it and it is counted as late.
+
+Open windows only live in memory, so the consumer must not commit Kafka offsets past
+the first record of any pane that an open window still needs (commit_offset). After
+a crash or rebalance the records are replayed and the windows rebuilt. Each
+(window, group, partition) row is written once and ignored afterwards, so a rebuilt,
+partial copy of an already flushed window never overwrites the complete one.
+"""
+
+import math
+import re
+import time
+from datetime import datetime
+from functools import reduce
+
+# Row layout of consumer.INSERT_QUERY
+TIMESTAMP, LOCATION, VERIFIED, STATUSES, MBTI, RETWEETS, FAVORITES = 3, 5, 6, 7, 8, 9, 10
+
+UNITS = {'s': 1, 'm': 60, 'h': 3600}
+DURATION = re.compile(r'^(\d+)([smh])$')
+
+
+def parse_duration(text):
+    match = DURATION.match(text.strip())
+    if not match:
+        raise ValueError(f"Invalid window duration: {text!r} (expected e.g. 30s, 5m, 1h)")
+    return int(match.group(1)) * UNITS[match.group(2)]
+
+
+def parse_windows(spec):
+    """Parse "1m,5m,1h,5m/1m" into [(size_seconds, slide_seconds)]; size/slide is a sliding window"""
+    windows = []
+    for item in filter(None, (part.strip() for part in spec.split(','))):
+        size, _, slide = item.partition('/')
+        size = parse_duration(size)
+        slide = parse_duration(slide) if slide else size
+        if slide > size or size % slide:
+            raise ValueError(f"Window {item!r}: the slide must divide the size")
+        windows.append((size, slide))
+    return windows
+
+
+class PartitionWindows:
+    """Panes and event-time progress of one Kafka partition"""
+
+    __slots__ = ('panes', 'closed_until', 'max_event', 'last_seen')
+
+    def __init__(self, windows):
+        # pane start -> [first offset, {(mbti, location, verified): [count, statuses, retweets, favorites]}]
+        self.panes = {}
+        # Per window spec, the watermark up to which windows have been handed out
+        self.closed_until = {spec: -math.inf for spec in windows}
+        self.max_event = None
+        self.last_seen = 0.0
+
+    def watermark(self, lateness, now):
+        if self.max_event is None:
+            return None
+        return self.max_event + max(now - self.last_seen, 0.0) - lateness
+
+
+class WindowAggregator:
+    def __init__(self, windows, allowed_lateness):
+        self.windows = windows
+        self.lateness = allowed_lateness
+        self.pane = reduce(math.gcd, [value for spec in windows for value in spec])
+        self.max_size = max(size for size, _ in windows)
+        self.partitions = {}
+        self.stats = {'records_late': 0, 'windows_flushed': 0}
+
+    def add(self, tp, offset, row, now=None):
+        """Fold one INSERT_QUERY row (from partition tp at offset) into its pane"""
+        now = time.time() if now is None else now
+        state = self.partitions.get(tp)
+        if state is None:
+            state = self.partitions[tp] = PartitionWindows(self.windows)
+
+        event = int(row[TIMESTAMP].replace(tzinfo=None).timestamp())
+        pane_start = event - event % self.pane
+
+        # Late if the earliest-ending window containing the event was already closed
+        for size, slide in self.windows:
+            if event - event % slide + slide <= state.closed_until[(size, slide)]:
+                self.stats['records_late'] += 1
+                break
+
+        if pane_start + self.max_size > min(state.closed_until.values()):
+            pane = state.panes.get(pane_start)
+            if pane is None:
+                pane = state.panes[pane_start] = [offset, {}]
+            group = (row[MBTI] or 'unknown', row[LOCATION] or '', bool(row[VERIFIED]))
+            totals = pane[1].get(group)
+            if totals is None:
+                pane[1][group] = [1, row[STATUSES] or 0, row[RETWEETS] or 0, row[FAVORITES] or 0]
+            else:
+                totals[0] += 1
+                totals[1] += row[STATUSES] or 0
+                totals[2] += row[RETWEETS] or 0
+                totals[3] += row[FAVORITES] or 0
+
+        if state.max_event is None or event >= state.max_event:
+            state.max_event = event
+        state.last_seen = now
+
+    def close(self, now=None):
+        """Hand out every window past its partition's watermark as tweet_windows rows"""
+        now = time.time() if now is None else now
+        rows = []
+        for tp, state in self.partitions.items():
+            watermark = state.watermark(self.lateness, now)
+            if watermark is None:
+                continue
+
+            for size, slide in self.windows:
+                closed_until = state.closed_until[(size, slide)]
+                # Windows with data that ended since the last call
+                starts = set()
+                for pane_start in state.panes:
+                    start = pane_start - pane_start % slide
+                    while start > pane_start - size:
+                        if closed_until < start + size <= watermark:
+                            starts.add(start)
+                        start -= slide
+                state.closed_until[(size, slide)] = max(closed_until, watermark)
+
+                for start in starts:
+                    groups = {}
+                    for pane_start in range(start, start + size, self.pane):
+                        pane = state.panes.get(pane_start)
+                        if pane is None:
+                            continue
+                        for group, totals in pane[1].items():
+                            merged = groups.get(group)
+                            if merged is None:
+                                groups[group] = totals[:]
+                            else:
+                                for i in range(4):
+                                    merged[i] += totals[i]
+                    window_start = datetime.fromtimestamp(start)
+                    for (mbti, location, verified), totals in groups.items():
+                        rows.append((window_start, size, slide, mbti, location, verified, tp.partition, *totals))
+                self.stats['windows_flushed'] += len(starts)
+
+            # A pane is no longer needed once every window containing it is closed
+            for pane_start in [p for p in state.panes if p + self.max_size <= watermark]:
+                del state.panes[pane_start]
+
+        # Primary key order, so parallel workers lock rows in the same order
+        rows.sort(key=lambda row: (row[1], row[2], row[0], row[3], row[4], row[5], row[6]))
+        return rows
+
+    def commit_offset(self, tp, position):
+        """Highest offset of tp that is safe to commit: nothing before it is still needed by an open window"""
+        state = self.partitions.get(tp)
+        if state is None or not state.panes:
+            return position
+        return min(position, min(pane[0] for pane in state.panes.values()))
+
+    def retain(self, assigned):
+        """Drop the state of partitions this consumer no longer owns"""
+        for tp in list(self.partitions):
+            if tp not in assigned:
+                del self.partitions[tp]
+
+    def reset(self):
+        """Forget every open window, e.g. before replaying from the committed offsets"""
+        self.partitions = {}
+
+    def open_windows(self):
+        """Panes still held in memory"""
+        return sum(len(state.panes) for state in self.partitions.values())
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+Bridge micro-benchmarks
+Measures per-message CPU of the MQTT -> Kafka hand-off against an in-process producer
+"""
+
+import argparse
+import json
+import random
+import shutil
+import tempfile
+import threading
+import time
+import types
+from datetime import datetime
+
+import bridge as bridge_module
+from bridge import MQTTKafkaBridge
+from kafka.errors import KafkaTimeoutError
+
+MBTI_TYPES = ['intj', 'intp', 'entj', 'entp', 'infj', 'infp', 'enfj', 'enfp',
+              'istj', 'isfj', 'estj', 'esfj', 'istp', 'isfp', 'estp', 'esfp']
+
+
+class RecordMetadata:
+    topic = 'twitter-tweets'
+    partition = 0
+    offset = 0
+
+
+class ImmediateFuture:
+    """Future that is already acknowledged"""
+
+    def add_callback(self, callback, *args):
+        callback(*args, RecordMetadata)
+        return self
+
+    def add_errback(self, errback, *args):
+        return self
+
+    def succeeded(self):
+        return True
+
+
+class FailedFuture:
+    """Future whose delivery already failed"""
+
+    def __init__(self, exc):
+        self.exc = exc
+
+    def add_callback(self, callback, *args):
+        return self
+
+    def add_errback(self, errback, *args):
+        errback(*args, self.exc)
+        return self
+
+    def succeeded(self):
+        return False
+
+
+class NullProducer:
+    """Stands in for KafkaProducer: runs the serializers and acknowledges immediately"""
+
+    def __init__(self, value_serializer, key_serializer):
+        self.value_serializer = value_serializer
+        self.key_serializer = key_serializer
+        self.bytes_sent = 0
+
+    def send(self, topic, key=None, value=None, headers=None):
+        key_bytes = self.key_serializer(key)
+        value_bytes = self.value_serializer(value)
+        self.bytes_sent += len(value_bytes) + (len(key_bytes) if key_bytes else 0)
+        return ImmediateFuture()
+
+    def flush(self, timeout=None):
+        pass
+
+    def close(self):
+        pass
+
+
+class FlakyProducer(NullProducer):
+    """NullProducer that fails every send while `down` is set and records what it delivered"""
+
+    def __init__(self, value_serializer, key_serializer):
+        super().__init__(value_serializer, key_serializer)
+        self.down = threading.Event()
+        self.delivered = []
+
+    def send(self, topic, key=None, value=None, headers=None):
+        if self.down.is_set():
+            return FailedFuture(KafkaTimeoutError("broker unavailable"))
+        future = super().send(topic, key=key, value=value)
+        self.delivered.append(self.value_serializer(value))
+        return future
+
+
+def synthetic_payloads(count, seed=42):
+    """Payloads shaped like the publisher's messages"""
+    rng = random.Random(seed)
+    payloads = []
+    for i in range(count):
+        now = datetime.now()
+        payloads.append(json.dumps({
+            'user_id': 10_000_000 + rng.randrange(8328),
+            'screen_name': f"user_{i % 8328}",
+            'tweet': ' '.join(rng.choice(['data', 'stream', 'kafka', 'mqtt', 'personality', 'tweet'])
+                              for _ in range(rng.randint(5, 40))) + '.',
+            'timestamp': now.strftime("%Y-%m-%d %H:%M:%S"),
+            'iso_timestamp': now.isoformat(),
+            'location': rng.choice(['New York, NY', 'London', 'Berlin', '']),
+            'verified': rng.random() < 0.1,
+            'statuses_count': rng.randint(0, 50000),
+            'mbti_personality': rng.choice(MBTI_TYPES),
+            'total_retweet_count': rng.randint(0, 5000),
+            'total_favorite_count': rng.randint(0, 5000)
+        }).encode('utf-8'))
+    return payloads
+
+
+def make_bridge(**kwargs):
+    producer = NullProducer(MQTTKafkaBridge.serialize_value, MQTTKafkaBridge.serialize_key)
+    kwargs.setdefault('spool_dir', '')
+    return MQTTKafkaBridge(workers=0, producer=producer, **kwargs)
+
+
+def run(label, bridge, payloads):
+    """Time the MQTT callback over every payload"""
+    messages = [types.SimpleNamespace(payload=payload) for payload in payloads]
+    start = time.perf_counter()
+    cpu_start = time.process_time()
+    for msg in messages:
+        bridge.on_mqtt_message(None, None, msg)
+    elapsed = time.perf_counter() - start
+    cpu = time.process_time() - cpu_start
+
+    rate = len(messages) / elapsed
+    print(f"{label:<24} {rate:>12,.0f} msgs/s   {cpu / len(messages) * 1e6:>8.2f} us CPU/msg")
+    return cpu
+
+
+def run_outage(payloads):
+    """Take the producer down for the middle third of the stream and check that
+    every message reaches it exactly once and in order after it recovers"""
+    spool_dir = tempfile.mkdtemp(prefix='bridge-spool-')
+    bridge_module.BRIDGE_SPOOL_RETRY_MS = 50
+    bridge_module.BRIDGE_SPOOL_REPLAY_RATE = 1_000_000
+    try:
+        producer = FlakyProducer(MQTTKafkaBridge.serialize_value, MQTTKafkaBridge.serialize_key)
+        bridge = MQTTKafkaBridge(workers=0, producer=producer, spool_dir=spool_dir)
+        bridge.start_replay()
+
+        third = len(payloads) // 3
+        start = time.perf_counter()
+        for i, payload in enumerate(payloads):
+            if i == third:
+                producer.down.set()
+            elif i == 2 * third:
+                producer.down.clear()
+            bridge.on_mqtt_message(None, None, types.SimpleNamespace(payload=payload))
+
+        while bridge.spool.pending:
+            time.sleep(0.01)
+        elapsed = time.perf_counter() - start
+        bridge.stop_replay()
+
+        stats = bridge.get_stats()
+        in_order = producer.delivered == payloads
+        print(f"outage of {third} messages: spooled {stats['spooled']}, replayed {stats['replayed']}, "
+              f"delivered {len(producer.delivered)}/{len(payloads)} "
+              f"{'in order' if in_order else 'OUT OF ORDER'} in {elapsed:.2f}s")
+        return in_order
+    finally:
+        shutil.rmtree(spool_dir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bridge per-message CPU benchmark")
+    parser.add_argument('--messages', type=int, default=100000, help="Messages per scenario")
+    args = parser.parse_args()
+
+    payloads = synthetic_payloads(args.messages)
+    print(f"{args.messages} messages, {sum(map(len, payloads)) / len(payloads):.0f} bytes average\n")
+
+    parse_cpu = run("decode + json round-trip", make_bridge(passthrough=False), payloads)
+    passthrough_cpu = run("pass-through", make_bridge(passthrough=True), payloads)
+    print(f"\nCPU per message reduced by {1 - passthrough_cpu / parse_cpu:.0%}\n")
+
+    if not run_outage(payloads):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,21 @@
 import json
 import logging
 import os
+import socket
+import struct
+import threading
 import time
 import paho.mqtt.client as mqtt
 from kafka import KafkaProducer
 from kafka.errors import KafkaError
 
+from histogram import LatencyHistogram, format_summary
+from metrics import MetricsRegistry, serve
+from profiling import SignalProfiler
+from sampled_log import SampledLog
+from spool import Spool
+from work_queue import BoundedWorkQueue
+
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
@@ -14,15 +24,229 @@ logger = logging.getLogger(__name__)
 MQTT_BROKER = os.getenv('MQTT_BROKER', 'mosquitto')
 MQTT_PORT = int(os.getenv('MQTT_PORT', 1883))
 MQTT_TOPIC = os.getenv('MQTT_TOPIC', 'twitter/tweets')
+# Shared subscription group: instances subscribed as $share/<group>/<topic> over MQTT v5 split
+# the stream between them instead of each receiving every message; empty keeps a plain subscription
+BRIDGE_SHARED_GROUP = os.getenv('BRIDGE_SHARED_GROUP', '')
 KAFKA_BOOTSTRAP_SERVERS = os.getenv('KAFKA_BOOTSTRAP_SERVERS', 'kafka:29092')
 KAFKA_TOPIC = os.getenv('KAFKA_TOPIC', 'twitter-tweets')
 
+# Producer tuning
+KAFKA_LINGER_MS = int(os.getenv('KAFKA_LINGER_MS', 5))
+KAFKA_BATCH_SIZE = int(os.getenv('KAFKA_BATCH_SIZE', 65536))
+KAFKA_COMPRESSION_TYPE = os.getenv('KAFKA_COMPRESSION_TYPE') or None
+# How long send() may block waiting for metadata while Kafka is unreachable
+KAFKA_MAX_BLOCK_MS = int(os.getenv('KAFKA_MAX_BLOCK_MS', 5000))
+
+# Send mode: 'async' uses delivery callbacks, 'sync' waits for every ack (legacy behaviour)
+BRIDGE_SEND_MODE = os.getenv('BRIDGE_SEND_MODE', 'async')
+BRIDGE_MAX_IN_FLIGHT = int(os.getenv('BRIDGE_MAX_IN_FLIGHT', 10000))
+# Overflow policy when BRIDGE_MAX_IN_FLIGHT sends are unacknowledged:
+#   'drop' - discard the new message immediately and count it
+#   'wait' - wait up to BRIDGE_BACKPRESSURE_TIMEOUT_MS for a free slot, then drop
+#   'spool' - append the message to the disk spool (requires BRIDGE_SPOOL_DIR)
+BRIDGE_OVERFLOW_POLICY = os.getenv('BRIDGE_OVERFLOW_POLICY', 'wait')
+BRIDGE_BACKPRESSURE_TIMEOUT_MS = int(os.getenv('BRIDGE_BACKPRESSURE_TIMEOUT_MS', 50))
+STATS_INTERVAL = int(os.getenv('BRIDGE_STATS_INTERVAL', 30))
+# Seconds between per-message log lines (sent messages, invalid input, send errors); 0 logs each one
+BRIDGE_LOG_INTERVAL = float(os.getenv('BRIDGE_LOG_INTERVAL', 10))
+# Prometheus /metrics endpoint (see pipeline-common/metrics.py); launcher.py workers listen on
+# BRIDGE_METRICS_PORT + their index. 0 disables it
+BRIDGE_METRICS_PORT = int(os.getenv('BRIDGE_METRICS_PORT', 9500))
+
+# Worker pool: with BRIDGE_WORKERS > 0 the MQTT callback only enqueues the raw payload and
+# worker threads parse and produce it; 0 keeps all work on the MQTT network thread
+BRIDGE_WORKERS = int(os.getenv('BRIDGE_WORKERS', 4))
+BRIDGE_QUEUE_SIZE = int(os.getenv('BRIDGE_QUEUE_SIZE', 100000))
+# Full-queue policy: 'block' (wait BRIDGE_QUEUE_BLOCK_MS, then drop), 'drop-oldest' or 'spill'
+BRIDGE_QUEUE_POLICY = os.getenv('BRIDGE_QUEUE_POLICY', 'spill')
+BRIDGE_QUEUE_BLOCK_MS = int(os.getenv('BRIDGE_QUEUE_BLOCK_MS', 1000))
+# Spill segments are <BRIDGE_SPILL_PATH>.<seq>, relative to the working directory unless absolute
+# (compose puts them on the spool volume so a recreated container replays them)
+BRIDGE_SPILL_PATH = os.getenv('BRIDGE_SPILL_PATH', 'spill/queue.spill')
+BRIDGE_SPILL_SEGMENT_MB = int(os.getenv('BRIDGE_SPILL_SEGMENT_MB', 64))
+BRIDGE_WORKER_BATCH = int(os.getenv('BRIDGE_WORKER_BATCH', 500))
+
+# Pass-through: forward MQTT payload bytes to Kafka unchanged and only scan them for user_id
+BRIDGE_PASSTHROUGH = os.getenv('BRIDGE_PASSTHROUGH', 'true').lower() in ('1', 'true', 'yes')
+
+# Write-ahead spool for Kafka outages, relative to the working directory unless absolute
+# (compose puts it on a volume); an empty BRIDGE_SPOOL_DIR disables it and failed sends are only logged
+BRIDGE_SPOOL_DIR = os.getenv('BRIDGE_SPOOL_DIR', 'spool')
+BRIDGE_SPOOL_SEGMENT_MB = int(os.getenv('BRIDGE_SPOOL_SEGMENT_MB', 64))
+BRIDGE_SPOOL_REPLAY_RATE = int(os.getenv('BRIDGE_SPOOL_REPLAY_RATE', 5000))
+BRIDGE_SPOOL_REPLAY_BATCH = int(os.getenv('BRIDGE_SPOOL_REPLAY_BATCH', 500))
+BRIDGE_SPOOL_RETRY_MS = int(os.getenv('BRIDGE_SPOOL_RETRY_MS', 5000))
+# Seconds between msyncs of the active spool segment: spooled records survive a host crash
+# once synced. 0 syncs every append, a negative value leaves write-back to the OS
+BRIDGE_SPOOL_SYNC_INTERVAL = float(os.getenv('BRIDGE_SPOOL_SYNC_INTERVAL', 1.0))
+
+# Latency tracing: every record carries the time the bridge received its MQTT message as a
+# Kafka header, so the consumer can split end-to-end latency into hops
+BRIDGE_TRACE_HEADERS = os.getenv('BRIDGE_TRACE_HEADERS', 'true').lower() in ('1', 'true', 'yes')
+TRACE_HEADER = 'bridge_received_us'
+TRACE_VALUE = struct.Struct('>q')
+
+USER_ID_FIELD = b'"user_id":'
+DIGITS = b'0123456789'
+
+# Binary frames (python-publisher/wire.py): version byte 1, 4-byte big-endian schema id,
+# then an Avro body whose first field is the user_id long. JSON starts with '{' instead.
+FRAME_MARKER = b'\x01'
+FRAME_HEADER = struct.Struct('>BI')
+# Registered schema ids whose body starts with user_id
+FRAME_SCHEMA_IDS = {1}
+
+def extract_user_id(payload):
+    """Scan raw JSON bytes for a top-level-looking integer user_id without parsing them
+    
+    Returns the id as a string, or None when the payload does not look like a publisher
+    message and needs a full parse.
+    """
+    if not payload.startswith(b'{'):
+        return None
+    start = payload.find(USER_ID_FIELD)
+    if start < 0:
+        return None
+    start += len(USER_ID_FIELD)
+    while start < len(payload) and payload[start] == 32:
+        start += 1
+    end = start
+    while end < len(payload) and payload[end] in DIGITS:
+        end += 1
+    if end == start or end >= len(payload) or payload[end] not in b',} \r\n\t':
+        return None
+    return payload[start:end].decode('ascii')
+
+
+def frame_user_id(payload):
+    """Read the user_id of a binary frame as a string
+
+    Returns None for an unknown schema id or a truncated frame.
+    """
+    if len(payload) <= FRAME_HEADER.size:
+        return None
+    _, schema_id = FRAME_HEADER.unpack_from(payload)
+    if schema_id not in FRAME_SCHEMA_IDS:
+        return None
+    value = shift = 0
+    for byte in payload[FRAME_HEADER.size:FRAME_HEADER.size + 10]:
+        value |= (byte & 0x7f) << shift
+        shift += 7
+        if byte < 0x80:
+            return str((value >> 1) ^ -(value & 1))
+    return None
+
+
 class MQTTKafkaBridge:
-    def __init__(self):
-        self.mqtt_client = mqtt.Client()
+    def __init__(self, send_mode=BRIDGE_SEND_MODE, max_in_flight=BRIDGE_MAX_IN_FLIGHT,
+                 overflow_policy=BRIDGE_OVERFLOW_POLICY, workers=BRIDGE_WORKERS,
+                 queue_size=BRIDGE_QUEUE_SIZE, queue_policy=BRIDGE_QUEUE_POLICY,
+                 passthrough=BRIDGE_PASSTHROUGH, spool_dir=BRIDGE_SPOOL_DIR, shared_group=BRIDGE_SHARED_GROUP,
+                 worker_name=None, spill_path=BRIDGE_SPILL_PATH, producer=None, trace_headers=BRIDGE_TRACE_HEADERS,
+                 metrics_port=BRIDGE_METRICS_PORT):
+        if send_mode not in ('async', 'sync'):
+            raise ValueError(f"Unknown send mode: {send_mode}")
+        if overflow_policy not in ('drop', 'wait', 'spool'):
+            raise ValueError(f"Unknown overflow policy: {overflow_policy}")
+        if overflow_policy == 'spool' and not spool_dir:
+            raise ValueError("The spool overflow policy needs a spool directory")
+        
+        self.worker_name = worker_name or socket.gethostname()
+        self.shared_group = shared_group
+        if shared_group:
+            self.mqtt_topic = f"$share/{shared_group}/{MQTT_TOPIC}"
+            self.mqtt_client = mqtt.Client(client_id=f"{self.worker_name}-{os.getpid()}", protocol=mqtt.MQTTv5)
+        else:
+            self.mqtt_topic = MQTT_TOPIC
+            self.mqtt_client = mqtt.Client()
         self.kafka_producer = None
+        self.send_mode = send_mode
+        self.passthrough = passthrough
+        self.trace_headers = trace_headers
+        self.max_in_flight = max_in_flight
+        self.overflow_policy = overflow_policy
+        self.in_flight = threading.BoundedSemaphore(max_in_flight)
+        self.stats_lock = threading.Lock()
+        self.stats = {
+            'received': 0,
+            'sent': 0,
+            'failed': 0,
+            'dropped': 0,
+            'invalid': 0,
+            'in_flight': 0,
+            'full_parses': 0,
+            'spooled': 0,
+            'replayed': 0,
+        }
+        # MQTT receive to Kafka ack, in microseconds, since startup (under stats_lock)
+        self.ack_latency = LatencyHistogram()
+        self.reported_latency = LatencyHistogram()
+        self.interval_start = time.time()
+        self.interval_received = 0
+        self.interval_sent = 0
+        self.workers = workers
+        self.worker_threads = []
+        self.running = threading.Event()
+        self.work_queue = None
+        if workers > 0:
+            self.work_queue = BoundedWorkQueue(queue_size, queue_policy, spill_path=spill_path,
+                                               block_timeout=BRIDGE_QUEUE_BLOCK_MS / 1000.0,
+                                               spill_segment_size=BRIDGE_SPILL_SEGMENT_MB * 1024 * 1024)
+            if self.work_queue.spill is not None and self.work_queue.spill.pending:
+                logger.info(f"Replaying {self.work_queue.spill.pending} payloads spilled before the restart "
+                            f"from {spill_path}")
+        self.spool = None
+        self.outage = threading.Event()
+        self.replay_thread = None
+        if spool_dir:
+            self.spool = Spool(spool_dir, segment_size=BRIDGE_SPOOL_SEGMENT_MB * 1024 * 1024,
+                               sync_interval=BRIDGE_SPOOL_SYNC_INTERVAL)
+        self.sent_log = SampledLog(logger, BRIDGE_LOG_INTERVAL)
+        self.invalid_log = SampledLog(logger, BRIDGE_LOG_INTERVAL, logging.ERROR)
+        self.error_log = SampledLog(logger, BRIDGE_LOG_INTERVAL, logging.ERROR)
+        self.drop_log = SampledLog(logger, BRIDGE_LOG_INTERVAL, logging.WARNING)
+        self.metrics_port = metrics_port
+        self.metrics = self.setup_metrics()
         self.setup_mqtt()
-        self.setup_kafka()
+        if producer is not None:
+            # Injected producer (benchmarks, fault-injection tests)
+            self.kafka_producer = producer
+        else:
+            self.setup_kafka()
+    
+    def setup_metrics(self):
+        """Metrics registry over the bridge counters, read at scrape time"""
+        registry = MetricsRegistry(worker=self.worker_name)
+        counters = [
+            ('received', 'bridge_messages_received_total', "MQTT messages accepted for Kafka"),
+            ('sent', 'bridge_messages_sent_total', "Messages acknowledged by Kafka"),
+            ('failed', 'bridge_send_failures_total', "Failed Kafka sends"),
+            ('dropped', 'bridge_messages_dropped_total', "Messages dropped at the in-flight limit"),
+            ('invalid', 'bridge_messages_invalid_total', "Undecodable payloads and unknown frames"),
+            ('full_parses', 'bridge_full_parses_total', "Payloads that needed a full JSON parse"),
+            ('spooled', 'bridge_messages_spooled_total', "Messages written to the outage spool"),
+            ('replayed', 'bridge_messages_replayed_total', "Spooled messages replayed to Kafka"),
+        ]
+        for key, name, help_text in counters:
+            registry.counter(name, help_text, function=lambda key=key: self.stats[key])
+        registry.gauge('bridge_in_flight', "Kafka sends awaiting an ack", function=lambda: self.stats['in_flight'])
+        registry.gauge('bridge_mqtt_connected', "1 while connected to the MQTT broker",
+                       function=lambda: int(self.mqtt_client.is_connected()))
+        registry.histogram('bridge_ack_latency_seconds', "MQTT receive to Kafka ack",
+                           histogram=self.ack_latency, lock=self.stats_lock)
+        if self.work_queue is not None:
+            queue = self.work_queue
+            registry.gauge('bridge_queue_depth', "Payloads in the work queue", function=lambda: len(queue.items))
+            registry.gauge('bridge_queue_spill_depth', "Payloads spilled to disk by the work queue",
+                           function=lambda: queue.spill.pending if queue.spill is not None else 0)
+            registry.counter('bridge_queue_dropped_total', "Payloads dropped by the work queue policy",
+                             function=lambda: queue.stats['dropped'])
+        if self.spool is not None:
+            registry.gauge('bridge_spool_pending', "Spooled messages not yet replayed",
+                           function=lambda: self.spool.pending)
+            registry.gauge('bridge_kafka_outage', "1 while new messages go to the spool",
+                           function=lambda: int(self.outage.is_set()))
+        return registry
     
     def setup_mqtt(self):
         """Set up MQTT client"""
@@ -30,66 +254,382 @@ class MQTTKafkaBridge:
         self.mqtt_client.on_message = self.on_mqtt_message
         self.mqtt_client.on_disconnect = self.on_mqtt_disconnect
     
+    @staticmethod
+    def serialize_value(value):
+        """Kafka value serializer: raw bytes pass through, parsed messages are re-encoded"""
+        if isinstance(value, bytes):
+            return value
+        return json.dumps(value).encode('utf-8')
+    
+    @staticmethod
+    def serialize_key(key):
+        """Kafka key serializer"""
+        return str(key).encode('utf-8') if key else None
+    
     def setup_kafka(self):
         """Set up Kafka producer"""
         try:
             self.kafka_producer = KafkaProducer(
                 bootstrap_servers=[KAFKA_BOOTSTRAP_SERVERS],
-                value_serializer=lambda x: json.dumps(x).encode('utf-8'),
-                key_serializer=lambda x: str(x).encode('utf-8') if x else None,
+                value_serializer=self.serialize_value,
+                key_serializer=self.serialize_key,
                 retries=5,
                 retry_backoff_ms=100,
-                request_timeout_ms=30000
+                request_timeout_ms=30000,
+                linger_ms=KAFKA_LINGER_MS,
+                batch_size=KAFKA_BATCH_SIZE,
+                compression_type=KAFKA_COMPRESSION_TYPE,
+                max_block_ms=KAFKA_MAX_BLOCK_MS
             )
-            logger.info(f"Kafka producer connected to {KAFKA_BOOTSTRAP_SERVERS}")
+            logger.info(f"Kafka producer connected to {KAFKA_BOOTSTRAP_SERVERS} "
+                       f"(linger {KAFKA_LINGER_MS} ms, batch {KAFKA_BATCH_SIZE} bytes, "
+                       f"compression {KAFKA_COMPRESSION_TYPE})")
         except Exception as e:
             logger.error(f"Error setting up Kafka producer: {e}")
             raise
     
-    def on_mqtt_connect(self, client, userdata, flags, rc):
-        """Callback for MQTT connection"""
+    def on_mqtt_connect(self, client, userdata, flags, rc, properties=None):
+        """Callback for MQTT connection (MQTT v5 also passes properties)"""
         if rc == 0:
-            logger.info(f"Connected to MQTT broker at {MQTT_BROKER}:{MQTT_PORT}")
-            client.subscribe(MQTT_TOPIC)
-            logger.info(f"Subscribed to MQTT topic: {MQTT_TOPIC}")
+            logger.info(f"[{self.worker_name}] Connected to MQTT broker at {MQTT_BROKER}:{MQTT_PORT}")
+            client.subscribe(self.mqtt_topic)
+            logger.info(f"[{self.worker_name}] Subscribed to MQTT topic: {self.mqtt_topic}")
         else:
             logger.error(f"Failed to connect to MQTT broker. Return code: {rc}")
     
-    def on_mqtt_disconnect(self, client, userdata, rc):
+    def on_mqtt_disconnect(self, client, userdata, rc, properties=None):
         """Callback for MQTT disconnection"""
         logger.warning(f"Disconnected from MQTT broker. Return code: {rc}")
     
+    def incr(self, name, amount=1):
+        """Increment a stats counter"""
+        with self.stats_lock:
+            self.stats[name] += amount
+    
+    def acquire_slot(self):
+        """Reserve an in-flight slot according to the overflow policy"""
+        if self.overflow_policy == 'spool':
+            return self.in_flight.acquire(blocking=False)
+        if threading.current_thread() in self.worker_threads:
+            # Workers may block: the backlog then builds up in the work queue instead
+            return self.in_flight.acquire()
+        if self.overflow_policy == 'wait':
+            return self.in_flight.acquire(timeout=BRIDGE_BACKPRESSURE_TIMEOUT_MS / 1000.0)
+        return self.in_flight.acquire(blocking=False)
+    
+    def on_send_success(self, received, record_metadata):
+        """Delivery callback for acknowledged Kafka sends; received is the MQTT receive time"""
+        self.in_flight.release()
+        acked = time.time()
+        with self.stats_lock:
+            self.stats['sent'] += 1
+            self.stats['in_flight'] -= 1
+            self.ack_latency.record((acked - received) * 1e6)
+        self.sent_log("Message sent to Kafka - Topic: %s, Partition: %s, Offset: %s",
+                      record_metadata.topic, record_metadata.partition, record_metadata.offset)
+    
+    def on_send_error(self, key, value, exc):
+        """Delivery errback for failed Kafka sends"""
+        self.in_flight.release()
+        with self.stats_lock:
+            self.stats['failed'] += 1
+            self.stats['in_flight'] -= 1
+        if self.spoolable(exc):
+            self.enter_outage(exc)
+            self.spool_record(key, value)
+        else:
+            self.error_log("Error sending message to Kafka: %s", exc)
+    
+    def spoolable(self, exc):
+        """Whether a failed send should go to the spool: only errors a retry can fix
+
+        A record Kafka rejects (too large, invalid topic, ...) would fail every replay
+        and keep the bridge in outage mode, so it is counted as failed and dropped.
+        """
+        return self.spool is not None and getattr(exc, 'retriable', False)
+    
+    def enter_outage(self, exc):
+        """Route new records to the spool until the replayer reaches Kafka again"""
+        if not self.outage.is_set():
+            self.outage.set()
+            logger.error(f"Kafka unavailable, spooling messages to {self.spool.directory}: {exc}")
+    
+    def spool_record(self, key, value):
+        """Append a record to the disk spool for later replay"""
+        self.spool.append(self.serialize_key(key) or b'', self.serialize_value(value))
+        self.incr('spooled')
+    
+    def trace(self, received):
+        """Kafka headers of a record whose MQTT message arrived at received (epoch seconds)"""
+        if not self.trace_headers:
+            return None
+        return [(TRACE_HEADER, TRACE_VALUE.pack(int(received * 1e6)))]
+    
+    def send_async(self, key, value, received):
+        """Send without waiting for the broker ack"""
+        if self.spool is not None and (self.outage.is_set() or self.spool.pending):
+            # Keep order behind what is already spooled
+            self.spool_record(key, value)
+            return
+        
+        if not self.acquire_slot():
+            if self.overflow_policy == 'spool':
+                self.spool_record(key, value)
+                return
+            self.incr('dropped')
+            self.drop_log("In-flight limit of %s reached, dropping message from user %s", self.max_in_flight, key)
+            return
+        
+        self.incr('in_flight')
+        try:
+            future = self.kafka_producer.send(KAFKA_TOPIC, key=key, value=value, headers=self.trace(received))
+        except KafkaError as e:
+            self.in_flight.release()
+            self.incr('in_flight', -1)
+            if not self.spoolable(e):
+                raise
+            # Typically a metadata timeout while the cluster is unreachable
+            self.enter_outage(e)
+            self.spool_record(key, value)
+            return
+        except Exception:
+            self.in_flight.release()
+            self.incr('in_flight', -1)
+            raise
+        future.add_callback(self.on_send_success, received)
+        future.add_errback(self.on_send_error, key, value)
+    
+    def send_sync(self, key, value, received):
+        """Send and block until the broker acks the message"""
+        future = self.kafka_producer.send(KAFKA_TOPIC, key=key, value=value, headers=self.trace(received))
+        
+        # Wait for the message to be sent
+        record_metadata = future.get(timeout=10)
+        acked = time.time()
+        with self.stats_lock:
+            self.stats['sent'] += 1
+            self.ack_latency.record((acked - received) * 1e6)
+        
+        self.sent_log("Message sent to Kafka - Topic: %s, Partition: %s, Offset: %s, User ID: %s",
+                      record_metadata.topic, record_metadata.partition, record_metadata.offset, key)
+    
+    def process_payload(self, payload, received=None):
+        """Parse one raw MQTT payload and hand it to the Kafka producer
+
+        received is when the MQTT message arrived (epoch seconds), before any queueing.
+        """
+        if received is None:
+            received = time.time()
+        try:
+            if payload[:1] == FRAME_MARKER:
+                # Binary frames are always forwarded as is; only their key is decoded
+                key = frame_user_id(payload)
+                if key is None:
+                    self.incr('invalid')
+                    self.invalid_log("Dropping binary frame with an unknown schema id or a truncated body")
+                    return
+                value = payload
+            else:
+                key = extract_user_id(payload) if self.passthrough else None
+                
+                if key is not None:
+                    # Forward the original bytes, no decode / re-encode
+                    value = payload
+                else:
+                    # Parse the JSON message
+                    message_str = payload.decode('utf-8')
+                    message_data = json.loads(message_str)
+                    self.incr('full_parses')
+                    
+                    # Use user_id as the key for partitioning
+                    key = str(message_data.get('user_id', ''))
+                    value = payload if self.passthrough else message_data
+            self.incr('received')
+            
+            # Send to Kafka
+            if self.send_mode == 'async':
+                self.send_async(key, value, received)
+            elif self.spool is not None and (self.outage.is_set() or self.spool.pending):
+                self.spool_record(key, value)
+            else:
+                self.send_sync(key, value, received)
+            
+        except (json.JSONDecodeError, UnicodeDecodeError) as e:
+            self.incr('invalid')
+            self.invalid_log("Error decoding JSON message: %s", e)
+        except KafkaError as e:
+            self.incr('failed')
+            if self.spoolable(e):
+                self.enter_outage(e)
+                self.spool_record(key, value)
+            else:
+                self.error_log("Error sending message to Kafka: %s", e)
+        except Exception as e:
+            self.error_log("Unexpected error processing message: %s", e)
+    
     def on_mqtt_message(self, client, userdata, msg):
         """Callback for MQTT message received"""
-        try:
-            # Parse the JSON message
-            message_str = msg.payload.decode('utf-8')
-            message_data = json.loads(message_str)
+        if self.work_queue is None:
+            self.process_payload(msg.payload)
+        else:
+            # Overflow is handled and counted by the queue policy
+            self.work_queue.put(msg.payload)
+    
+    def worker_loop(self):
+        """Drain the work queue in batches into the Kafka producer"""
+        while self.running.is_set() or self.work_queue.has_items():
+            for received, payload in self.work_queue.get_batch(BRIDGE_WORKER_BATCH, timeout=0.5,
+                                                               with_times=True):
+                self.process_payload(payload, received)
+    
+    def start_workers(self):
+        """Start the worker threads that feed the producer"""
+        self.running.set()
+        for i in range(self.workers):
+            thread = threading.Thread(target=self.worker_loop, name=f"bridge-worker-{i}", daemon=True)
+            self.worker_threads.append(thread)
+        for thread in self.worker_threads:
+            thread.start()
+        logger.info(f"Started {self.workers} bridge workers")
+    
+    def stop_workers(self):
+        """Let the workers drain what is queued, then stop them"""
+        self.running.clear()
+        for thread in self.worker_threads:
+            thread.join(timeout=30)
+        if self.work_queue is not None:
+            self.work_queue.close()
+    
+    def replay_loop(self):
+        """Replay spooled records in order at BRIDGE_SPOOL_REPLAY_RATE, committing each acked batch"""
+        while self.running.is_set() or self.spool.pending:
+            self.spool.sync()
+            if not self.spool.pending:
+                time.sleep(0.1)
+                continue
             
-            # Use user_id as the key for partitioning
-            key = str(message_data.get('user_id', ''))
+            started = time.time()
+            records = self.spool.read_batch(BRIDGE_SPOOL_REPLAY_BATCH)
+            if not records:
+                time.sleep(0.1)
+                continue
             
-            # Send to Kafka
-            future = self.kafka_producer.send(KAFKA_TOPIC, key=key, value=message_data)
+            # Records Kafka rejects for good are dropped, or the replay (and the outage) never ends
+            rejected = 0
+            try:
+                futures = []
+                for key, value in records:
+                    try:
+                        futures.append(self.kafka_producer.send(KAFKA_TOPIC, key=key.decode('utf-8') or None,
+                                                                value=value))
+                    except KafkaError as e:
+                        if getattr(e, 'retriable', False):
+                            raise
+                        rejected += 1
+                        self.error_log("Dropping spooled message rejected by Kafka: %s", e)
+                self.kafka_producer.flush(timeout=30)
+                delivered = True
+                for future in futures:
+                    if future.succeeded():
+                        continue
+                    if getattr(future.exception, 'retriable', False):
+                        delivered = False
+                        break
+                    rejected += 1
+                    self.error_log("Dropping spooled message rejected by Kafka: %s", future.exception)
+            except KafkaError as e:
+                logger.warning(f"Spool replay failed: {e}")
+                delivered = False
             
-            # Wait for the message to be sent
-            record_metadata = future.get(timeout=10)
+            if not delivered:
+                self.spool.rewind()
+                if not self.running.is_set():
+                    break
+                time.sleep(BRIDGE_SPOOL_RETRY_MS / 1000.0)
+                continue
             
-            logger.info(f"Message sent to Kafka - Topic: {record_metadata.topic}, "
-                       f"Partition: {record_metadata.partition}, "
-                       f"Offset: {record_metadata.offset}, "
-                       f"User ID: {message_data.get('user_id')}")
+            self.spool.commit(len(records))
+            self.incr('replayed', len(records) - rejected)
+            if rejected:
+                self.incr('failed', rejected)
+            if self.outage.is_set():
+                self.outage.clear()
+                logger.info("Kafka reachable again, replaying spooled messages")
             
-        except json.JSONDecodeError as e:
-            logger.error(f"Error decoding JSON message: {e}")
-        except KafkaError as e:
-            logger.error(f"Error sending message to Kafka: {e}")
-        except Exception as e:
-            logger.error(f"Unexpected error processing message: {e}")
+            # Pace the replay so it does not starve live traffic or flood the brokers
+            pause = len(records) / BRIDGE_SPOOL_REPLAY_RATE - (time.time() - started)
+            if pause > 0:
+                time.sleep(pause)
+    
+    def start_replay(self):
+        """Start the spool replayer"""
+        self.running.set()
+        self.replay_thread = threading.Thread(target=self.replay_loop, name="bridge-spool-replay", daemon=True)
+        self.replay_thread.start()
+        if self.spool.pending:
+            logger.info(f"Replaying {self.spool.pending} spooled messages from a previous run")
+    
+    def stop_replay(self):
+        """Stop the replayer; whatever is still spooled stays on disk for the next start"""
+        self.running.clear()
+        if self.replay_thread is not None:
+            self.replay_thread.join(timeout=60)
+        self.spool.close()
+    
+    def get_stats(self):
+        """Return a snapshot of the bridge counters"""
+        with self.stats_lock:
+            return dict(self.stats)
     
-    def start_bridge(self):
-        """Start the MQTT-Kafka bridge"""
-        logger.info("Starting MQTT-Kafka bridge...")
+    def interval_rates(self):
+        """Received and sent messages per second since the previous call"""
+        stats = self.get_stats()
+        now = time.time()
+        elapsed = max(now - self.interval_start, 1e-9)
+        received_rate = (stats['received'] - self.interval_received) / elapsed
+        sent_rate = (stats['sent'] - self.interval_sent) / elapsed
+        self.interval_start = now
+        self.interval_received = stats['received']
+        self.interval_sent = stats['sent']
+        return received_rate, sent_rate
+    
+    def log_stats(self):
+        """Log the bridge counters, receive-to-ack latency and work queue gauges"""
+        stats = self.get_stats()
+        received_rate, sent_rate = self.interval_rates()
+        with self.stats_lock:
+            current = self.ack_latency.copy()
+        latency = current.since(self.reported_latency).summary()
+        self.reported_latency = current
+        logger.info(f"[{self.worker_name}] Bridge stats - Received: {stats['received']}, Sent: {stats['sent']}, "
+                   f"Failed: {stats['failed']}, Dropped: {stats['dropped']}, Invalid: {stats['invalid']}, "
+                   f"In flight: {stats['in_flight']}, "
+                   f"Rate in/out: {received_rate:.0f}/{sent_rate:.0f} msgs/s")
+        if latency['count']:
+            logger.info(f"[{self.worker_name}] Receive to Kafka ack latency - {format_summary(latency)}")
+        if self.spool is not None:
+            logger.info(f"Spool stats - Spooled: {stats['spooled']}, Replayed: {stats['replayed']}, "
+                       f"Pending: {self.spool.pending}, Outage: {self.outage.is_set()}")
+        if self.work_queue is not None:
+            gauges = self.work_queue.gauges()
+            logger.info(f"Queue stats - Depth: {gauges['depth']}, Spilled: {gauges['spill_depth']}, "
+                       f"Wait avg/max: {gauges['wait_avg_ms']}/{gauges['wait_max_ms']} ms, "
+                       f"Dropped: {gauges['dropped']}")
+    
+    def start_bridge(self, counters=None):
+        """Start the MQTT-Kafka bridge
+
+        counters is an optional shared (received, sent) pair the launcher reads per-worker
+        throughput from; it is refreshed every second.
+        """
+        logger.info(f"Starting MQTT-Kafka bridge {self.worker_name} ({self.send_mode} mode)...")
+        serve(self.metrics, self.metrics_port)
+        SignalProfiler(f"bridge-{self.worker_name}").install()
+        
+        if self.work_queue is not None:
+            self.start_workers()
+        if self.spool is not None:
+            self.start_replay()
         
         # Connect to MQTT broker
         try:
@@ -97,8 +637,16 @@ class MQTTKafkaBridge:
             self.mqtt_client.loop_start()
             
             # Keep the bridge running
+            last_stats = time.time()
             while True:
                 time.sleep(1)
+                if counters is not None:
+                    stats = self.get_stats()
+                    counters[0] = stats['received']
+                    counters[1] = stats['sent']
+                if time.time() - last_stats >= STATS_INTERVAL:
+                    self.log_stats()
+                    last_stats = time.time()
                 
         except KeyboardInterrupt:
             logger.info("Stopping MQTT-Kafka bridge...")
@@ -107,8 +655,14 @@ class MQTTKafkaBridge:
         finally:
             self.mqtt_client.loop_stop()
             self.mqtt_client.disconnect()
+            self.stop_workers()
+            if self.spool is not None:
+                self.stop_replay()
             if self.kafka_producer:
+                # Deliver whatever is still buffered before shutting down
+                self.kafka_producer.flush()
                 self.kafka_producer.close()
+            self.log_stats()
 
 if __name__ == "__main__":
     bridge = MQTTKafkaBridge()
@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""
+Multi-process bridge launcher
+Runs BRIDGE_PROCESSES bridge workers in one container. They join the same MQTT v5
+shared subscription group, so the broker splits the topic between them, and the
+launcher logs per-worker and total throughput every BRIDGE_STATS_INTERVAL seconds.
+Worker i serves its /metrics on BRIDGE_METRICS_PORT + i, and the profiling signals
+(SIGUSR1/SIGUSR2, see pipeline-common/profiling.py) are forwarded to every worker.
+Supervision itself (restarts, stats, shutdown) is pipeline-common/workers.py.
+"""
+
+import argparse
+import os
+import socket
+
+import bridge
+from bridge import MQTTKafkaBridge
+from workers import ProcessSupervisor
+
+BRIDGE_PROCESSES = int(os.getenv('BRIDGE_PROCESSES', os.cpu_count() or 1))
+# Seconds to wait for a worker to flush and exit before it is killed
+BRIDGE_SHUTDOWN_TIMEOUT = int(os.getenv('BRIDGE_SHUTDOWN_TIMEOUT', 60))
+
+
+def run_worker(index, group, counters):
+    """Child process entry point: one full bridge (MQTT client, queue, producer, spool)"""
+    name = f"{socket.gethostname()}-{index}"
+    # Spool and spill files are single-process, give every worker its own
+    spool_dir = os.path.join(bridge.BRIDGE_SPOOL_DIR, str(index)) if bridge.BRIDGE_SPOOL_DIR else ''
+    spill_path = f"{bridge.BRIDGE_SPILL_PATH}.{index}"
+    metrics_port = bridge.BRIDGE_METRICS_PORT + index if bridge.BRIDGE_METRICS_PORT else 0
+    worker = MQTTKafkaBridge(shared_group=group, worker_name=name, spool_dir=spool_dir, spill_path=spill_path,
+                             metrics_port=metrics_port)
+    # SIGINT is a clean shutdown: flush Kafka, close the spool
+    worker.start_bridge(counters=counters)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run several bridge workers on a shared MQTT subscription")
+    parser.add_argument('--processes', type=int, default=BRIDGE_PROCESSES, help="Bridge worker processes")
+    parser.add_argument('--group', default=bridge.BRIDGE_SHARED_GROUP or 'mqtt-kafka-bridge',
+                        help="MQTT v5 shared subscription group")
+    args = parser.parse_args()
+
+    ProcessSupervisor(args.processes, run_worker, args=(args.group,), name='bridge', title='Launcher',
+                      counters=('in', 'out'), unit='msgs/s', stats_interval=bridge.STATS_INTERVAL,
+                      shutdown_timeout=BRIDGE_SHUTDOWN_TIMEOUT).run()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,232 @@
+"""
+Segmented write-ahead spool for records the Kafka producer could not take
+Records are appended to fixed-size, memory-mapped segment files on local disk,
+read back in order for replay and a segment is deleted once all of its records
+have been acknowledged.
+
+Durability: an appended record is in the page cache at once, so it survives the
+bridge process dying, but reaches the disk only when the segment is synced (msync).
+That happens on the first append() or sync() call sync_interval seconds after the
+previous sync (0 syncs every append, a negative interval leaves write-back to the OS),
+and when a segment fills up or the spool is closed. A host crash or power loss can lose the records appended
+since the last sync.
+"""
+
+import logging
+import mmap
+import os
+import re
+import struct
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Record header: marker, key length, value length
+RECORD_HEADER = struct.Struct('<IHI')
+RECORD_MARKER = 0x5EC0DE01
+SEGMENT_PATTERN = re.compile(r'^segment-(\d{12})\.spool$')
+
+
+class Segment:
+    """One memory-mapped, preallocated spool file"""
+
+    def __init__(self, path, seq, size, create):
+        self.path = path
+        self.seq = seq
+        if create:
+            with open(path, 'wb') as file:
+                file.truncate(size)
+        self.file = open(path, 'r+b')
+        self.map = mmap.mmap(self.file.fileno(), 0)
+        self.size = len(self.map)
+        self.end = 0
+        self.records = 0
+        self.sealed = False
+
+    def recover(self):
+        """Find the end of the valid records of a segment left by a previous run"""
+        position = 0
+        while position + RECORD_HEADER.size <= self.size:
+            marker, key_len, value_len = RECORD_HEADER.unpack_from(self.map, position)
+            record_end = position + RECORD_HEADER.size + key_len + value_len
+            if marker != RECORD_MARKER or record_end > self.size:
+                break
+            position = record_end
+            self.records += 1
+        self.end = position
+
+    def fits(self, length):
+        return self.end + length <= self.size
+
+    def append(self, key, value):
+        position = self.end
+        RECORD_HEADER.pack_into(self.map, position, RECORD_MARKER, len(key), len(value))
+        position += RECORD_HEADER.size
+        self.map[position:position + len(key)] = key
+        position += len(key)
+        self.map[position:position + len(value)] = value
+        self.end = position + len(value)
+        self.records += 1
+
+    def read(self, position):
+        """Return (key, value, next_position) of the record at position"""
+        _, key_len, value_len = RECORD_HEADER.unpack_from(self.map, position)
+        position += RECORD_HEADER.size
+        key = self.map[position:position + key_len]
+        position += key_len
+        value = self.map[position:position + value_len]
+        return key, value, position + value_len
+
+    def seal(self):
+        self.map.flush()
+        self.sealed = True
+
+    def close(self):
+        self.map.close()
+        self.file.close()
+
+    def delete(self):
+        self.close()
+        os.remove(self.path)
+
+
+class Spool:
+    """Ordered, disk-backed queue of (key, value) byte records
+
+    append() may be called from any thread. A single replayer reads with
+    read_batch(), then either commit()s the batch once Kafka acknowledged it
+    or rewind()s to read it again. Segments behind the committed position are
+    deleted. Records of a previous run are recovered and replayed (at least once).
+    sync() is also meant to be called periodically (the replayer does), so that the
+    last records appended before traffic stops are synced too.
+    """
+
+    def __init__(self, directory, segment_size=64 * 1024 * 1024, sync_interval=1.0):
+        self.directory = directory
+        self.segment_size = segment_size
+        self.sync_interval = sync_interval
+        self.last_sync = time.monotonic()
+        self.unsynced = False
+        self.lock = threading.Lock()
+        self.segments = []
+        self.pending = 0
+        os.makedirs(directory, exist_ok=True)
+
+        for name in sorted(os.listdir(directory)):
+            match = SEGMENT_PATTERN.match(name)
+            if match:
+                path = os.path.join(directory, name)
+                if os.path.getsize(path) == 0:
+                    os.remove(path)
+                    continue
+                segment = Segment(path, int(match.group(1)), 0, create=False)
+                segment.recover()
+                segment.sealed = True
+                self.segments.append(segment)
+                self.pending += segment.records
+        if self.pending:
+            logger.info(f"Recovered {self.pending} spooled records in {len(self.segments)} segments")
+
+        # Cursors are (segment seq, byte position)
+        self.committed = (self.segments[0].seq, 0) if self.segments else None
+        self.cursor = self.committed
+        self.next_seq = self.segments[-1].seq + 1 if self.segments else 0
+
+    def new_segment(self, min_size):
+        seq = self.next_seq
+        self.next_seq += 1
+        path = os.path.join(self.directory, f"segment-{seq:012d}.spool")
+        segment = Segment(path, seq, max(self.segment_size, min_size), create=True)
+        self.segments.append(segment)
+        if self.cursor is None:
+            self.committed = self.cursor = (seq, 0)
+        return segment
+
+    def append(self, key, value):
+        """Append one record; key and value are bytes"""
+        length = RECORD_HEADER.size + len(key) + len(value)
+        with self.lock:
+            segment = self.segments[-1] if self.segments else None
+            if segment is None or segment.sealed or not segment.fits(length):
+                if segment is not None and not segment.sealed:
+                    segment.seal()
+                segment = self.new_segment(length)
+            segment.append(key, value)
+            self.pending += 1
+            self.unsynced = True
+            self.sync_due()
+
+    def sync_due(self):
+        """Sync the active segment if sync_interval has passed since the last sync; holds the lock"""
+        if not self.unsynced or self.sync_interval < 0:
+            return
+        now = time.monotonic()
+        if now - self.last_sync < self.sync_interval:
+            return
+        segment = self.segments[-1] if self.segments else None
+        if segment is not None and not segment.sealed:
+            segment.map.flush()
+        self.last_sync = now
+        self.unsynced = False
+
+    def sync(self):
+        """Sync records appended more than sync_interval ago"""
+        with self.lock:
+            self.sync_due()
+
+    def segment(self, seq):
+        for segment in self.segments:
+            if segment.seq == seq:
+                return segment
+        return None
+
+    def read_batch(self, max_records):
+        """Read up to max_records (key, value) records from the cursor"""
+        records = []
+        with self.lock:
+            while len(records) < max_records and self.cursor is not None:
+                seq, position = self.cursor
+                segment = self.segment(seq)
+                if position < segment.end:
+                    key, value, position = segment.read(position)
+                    records.append((key, value))
+                    self.cursor = (seq, position)
+                elif segment.sealed and self.segment(seq + 1) is not None:
+                    self.cursor = (seq + 1, 0)
+                else:
+                    break
+        return records
+
+    def commit(self, count):
+        """Acknowledge everything read so far and delete fully replayed segments"""
+        with self.lock:
+            self.committed = self.cursor
+            self.pending -= count
+            if self.pending == 0:
+                # Fully drained: drop every segment, including the active one
+                for segment in self.segments:
+                    segment.delete()
+                self.segments = []
+                self.committed = self.cursor = None
+                return
+            seq, position = self.committed
+            while self.segments:
+                head = self.segments[0]
+                if head.seq < seq or (head.seq == seq and head.sealed and position >= head.end):
+                    self.segments.pop(0)
+                    head.delete()
+                else:
+                    break
+
+    def rewind(self):
+        """Forget what was read since the last commit so it is replayed"""
+        with self.lock:
+            self.cursor = self.committed
+
+    def close(self):
+        with self.lock:
+            for segment in self.segments:
+                segment.map.flush()
+                segment.close()
+            self.segments = []
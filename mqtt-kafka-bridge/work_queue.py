@@ -0,0 +1,235 @@
+"""
+Bounded hand-off queue between the MQTT network thread and the bridge workers
+"""
+
+import collections
+import os
+import re
+import struct
+import threading
+import time
+
+POLICIES = ('block', 'drop-oldest', 'spill')
+
+# Spill record: enqueue time (float64), payload length (uint32), payload
+SPILL_RECORD = struct.Struct('<dI')
+
+
+class SpillFile:
+    """Append-only overflow file of rotating segments, read back in order
+
+    Records go to <path>.<seq> segment files of about segment_size bytes and a segment is
+    deleted once it has been read to its end, so the disk use follows the backlog even when
+    the queue never fully drains. Segments left by a stopped or crashed bridge are replayed
+    before anything appended after them; the one being read when it stopped is replayed
+    from its start, so its already dequeued records are delivered again, and a record cut
+    short by a crash is discarded.
+    """
+
+    def __init__(self, path, segment_size=64 * 1024 * 1024):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.segment_size = segment_size
+        self.pending = 0
+        # Sequence numbers of the segments not yet read to their end, oldest first
+        self.segments = collections.deque()
+        pattern = re.compile(re.escape(os.path.basename(path)) + r'\.(\d{6})$')
+        for name in sorted(os.listdir(directory or '.')):
+            match = pattern.match(name)
+            if match:
+                seq = int(match.group(1))
+                records = self.recover(self.segment_path(seq))
+                if records:
+                    self.segments.append(seq)
+                    self.pending += records
+                else:
+                    os.remove(self.segment_path(seq))
+        self.next_seq = self.segments[-1] + 1 if self.segments else 0
+        self.writer = None
+        self.writing = None
+        self.written = 0
+        self.reader = None
+        self.reading = None
+
+    def segment_path(self, seq):
+        return f"{self.path}.{seq:06d}"
+
+    @staticmethod
+    def recover(path):
+        """Count the complete records of a segment and cut off a torn last one"""
+        records = end = 0
+        with open(path, 'r+b') as f:
+            while True:
+                header = f.read(SPILL_RECORD.size)
+                if len(header) < SPILL_RECORD.size:
+                    break
+                _, length = SPILL_RECORD.unpack(header)
+                if len(f.read(length)) < length:
+                    break
+                end = f.tell()
+                records += 1
+            f.truncate(end)
+        return records
+
+    def roll(self):
+        """Start a new segment for appends"""
+        if self.writer is not None:
+            self.writer.close()
+        self.writing = self.next_seq
+        self.next_seq += 1
+        self.writer = open(self.segment_path(self.writing), 'wb')
+        self.written = 0
+        self.segments.append(self.writing)
+
+    def append(self, enqueued_at, payload):
+        if self.writer is None or self.written >= self.segment_size:
+            self.roll()
+        self.writer.write(SPILL_RECORD.pack(enqueued_at, len(payload)))
+        self.writer.write(payload)
+        self.written += SPILL_RECORD.size + len(payload)
+        self.pending += 1
+
+    def pop(self):
+        while True:
+            if self.reader is None:
+                self.reading = self.segments[0]
+                self.reader = open(self.segment_path(self.reading), 'rb')
+            if self.reading == self.writing:
+                self.writer.flush()
+            header = self.reader.read(SPILL_RECORD.size)
+            if header:
+                break
+            # Read to its end, and records are pending, so a newer segment exists
+            self.reader.close()
+            self.reader = None
+            os.remove(self.segment_path(self.segments.popleft()))
+        enqueued_at, length = SPILL_RECORD.unpack(header)
+        payload = self.reader.read(length)
+        self.pending -= 1
+        if self.pending == 0:
+            # Fully drained: reclaim the disk space
+            self.close()
+            for seq in self.segments:
+                os.remove(self.segment_path(seq))
+            self.segments.clear()
+        return enqueued_at, payload
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+        if self.reader is not None:
+            self.reader.close()
+        self.writer = self.reader = self.writing = self.reading = None
+
+
+class BoundedWorkQueue:
+    """FIFO of raw payloads with an explicit policy for when it is full
+
+    block       - the producer waits up to block_timeout for room, then the item is dropped
+    drop-oldest - the oldest queued item is discarded to make room
+    spill       - the item is appended to a spill file on disk and fed back in order
+    """
+
+    def __init__(self, maxsize, policy='drop-oldest', spill_path=None, block_timeout=1.0,
+                 spill_segment_size=64 * 1024 * 1024):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown queue overflow policy: {policy}")
+        if policy == 'spill' and not spill_path:
+            raise ValueError("The spill policy needs a spill_path")
+        self.maxsize = maxsize
+        self.policy = policy
+        self.block_timeout = block_timeout
+        self.items = collections.deque()
+        self.spill = SpillFile(spill_path, spill_segment_size) if policy == 'spill' else None
+        self.lock = threading.Lock()
+        self.not_empty = threading.Condition(self.lock)
+        self.not_full = threading.Condition(self.lock)
+        self.stats = {'enqueued': 0, 'dequeued': 0, 'dropped': 0, 'spilled': 0}
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.last_dequeued = 0
+
+    def put(self, payload):
+        """Enqueue a payload; returns False if it was dropped"""
+        now = time.time()
+        with self.lock:
+            if self.spill is not None and self.spill.pending:
+                # Keep FIFO order: while anything is spilled, new items queue behind it on disk
+                self.spill.append(now, payload)
+                self.stats['spilled'] += 1
+                self.stats['enqueued'] += 1
+                self.not_empty.notify()
+                return True
+
+            if len(self.items) >= self.maxsize:
+                if self.policy == 'block':
+                    if not self.not_full.wait_for(lambda: len(self.items) < self.maxsize,
+                                                  timeout=self.block_timeout):
+                        self.stats['dropped'] += 1
+                        return False
+                elif self.policy == 'drop-oldest':
+                    self.items.popleft()
+                    self.stats['dropped'] += 1
+                else:
+                    self.spill.append(now, payload)
+                    self.stats['spilled'] += 1
+                    self.stats['enqueued'] += 1
+                    self.not_empty.notify()
+                    return True
+
+            self.items.append((now, payload))
+            self.stats['enqueued'] += 1
+            self.not_empty.notify()
+            return True
+
+    def get_batch(self, max_items, timeout, with_times=False):
+        """Dequeue up to max_items payloads, waiting up to timeout for the first one
+
+        with_times returns (enqueue time, payload) pairs instead of payloads.
+        """
+        with self.lock:
+            if not self.not_empty.wait_for(self.has_items, timeout=timeout):
+                return []
+
+            batch = []
+            now = time.time()
+            while len(batch) < max_items:
+                if self.items:
+                    enqueued_at, payload = self.items.popleft()
+                elif self.spill is not None and self.spill.pending:
+                    enqueued_at, payload = self.spill.pop()
+                else:
+                    break
+                waited = now - enqueued_at
+                self.wait_total += waited
+                self.wait_max = max(self.wait_max, waited)
+                batch.append((enqueued_at, payload) if with_times else payload)
+
+            self.stats['dequeued'] += len(batch)
+            self.not_full.notify_all()
+            return batch
+
+    def has_items(self):
+        return bool(self.items) or (self.spill is not None and self.spill.pending > 0)
+
+    def gauges(self, reset=True):
+        """Queue depth, spilled depth and enqueue-to-dequeue wait since the last call"""
+        with self.lock:
+            dequeued = self.stats['dequeued']
+            gauges = dict(self.stats)
+            gauges['depth'] = len(self.items)
+            gauges['spill_depth'] = self.spill.pending if self.spill is not None else 0
+            gauges['wait_max_ms'] = round(self.wait_max * 1000, 1)
+            gauges['wait_avg_ms'] = round(
+                self.wait_total * 1000 / max(dequeued - self.last_dequeued, 1), 1)
+            if reset:
+                self.wait_total = 0.0
+                self.wait_max = 0.0
+                self.last_dequeued = dequeued
+            return gauges
+
+    def close(self):
+        if self.spill is not None:
+            self.spill.close()
@@ -0,0 +1,132 @@
+"""
+HDR-style latency histograms shared by the pipeline services
+Values are integers (microseconds) counted in log-linear buckets: exact below
+2 ** sub_bucket_bits, then 2 ** (sub_bucket_bits - 1) buckets per power of two.
+Every percentile is therefore within 1 / 2 ** (sub_bucket_bits - 1) (~1.6% by
+default) of the true value at any magnitude, like an HdrHistogram with two
+significant digits. Recording is a bit_length and a list increment, and histograms
+of the same precision merge by adding counts. A histogram can also be left cumulative
+(for the metrics endpoint) and logged per interval with since() on an earlier copy().
+
+Histograms are not locked; callers recording from several threads hold their own lock.
+"""
+
+import math
+
+PERCENTILES = (50, 99, 99.9)
+
+
+class LatencyHistogram:
+    def __init__(self, sub_bucket_bits=7):
+        self.sub_bucket_bits = sub_bucket_bits
+        self.sub_bucket_count = 1 << sub_bucket_bits
+        self.half_count = self.sub_bucket_count >> 1
+        self.counts = [0] * self.sub_bucket_count
+        self.total = 0
+        self.sum = 0
+        self.max = 0
+
+    def index(self, value):
+        if value < self.sub_bucket_count:
+            return value
+        shift = value.bit_length() - self.sub_bucket_bits
+        return self.sub_bucket_count + (shift - 1) * self.half_count + (value >> shift) - self.half_count
+
+    def highest_equivalent(self, index):
+        """Largest value counted in bucket index"""
+        if index < self.sub_bucket_count:
+            return index
+        shift, offset = divmod(index - self.sub_bucket_count, self.half_count)
+        return ((offset + self.half_count + 1) << (shift + 1)) - 1
+
+    def record(self, value, count=1):
+        """Count value (clamped to 0, e.g. small clock differences between hosts)"""
+        value = max(int(value), 0)
+        index = self.index(value)
+        if index >= len(self.counts):
+            self.counts.extend([0] * (index + 1 - len(self.counts)))
+        self.counts[index] += count
+        self.total += count
+        self.sum += value * count
+        if value > self.max:
+            self.max = value
+
+    def merge(self, other):
+        if other.sub_bucket_bits != self.sub_bucket_bits:
+            raise ValueError("Histograms of different precision cannot be merged")
+        if len(other.counts) > len(self.counts):
+            self.counts.extend([0] * (len(other.counts) - len(self.counts)))
+        for index, count in enumerate(other.counts):
+            self.counts[index] += count
+        self.total += other.total
+        self.sum += other.sum
+        self.max = max(self.max, other.max)
+
+    def copy(self):
+        histogram = LatencyHistogram(self.sub_bucket_bits)
+        histogram.merge(self)
+        return histogram
+
+    def since(self, earlier):
+        """Histogram of the values recorded after earlier, a copy() of this histogram
+
+        Its max is the top of the highest bucket counted since, capped at the overall max.
+        """
+        histogram = LatencyHistogram(self.sub_bucket_bits)
+        histogram.counts = [count - (earlier.counts[index] if index < len(earlier.counts) else 0)
+                            for index, count in enumerate(self.counts)]
+        histogram.total = self.total - earlier.total
+        histogram.sum = self.sum - earlier.sum
+        for index in range(len(histogram.counts) - 1, -1, -1):
+            if histogram.counts[index]:
+                histogram.max = min(self.highest_equivalent(index), self.max)
+                break
+        return histogram
+
+    def cumulative_counts(self, bounds):
+        """Number of values at or below each of the ascending bounds (by bucket top, like percentile())"""
+        cumulative = []
+        seen = 0
+        position = 0
+        for index, count in enumerate(self.counts):
+            top = self.highest_equivalent(index)
+            while position < len(bounds) and top > bounds[position]:
+                cumulative.append(seen)
+                position += 1
+            if position == len(bounds):
+                break
+            seen += count
+        cumulative.extend([seen] * (len(bounds) - position))
+        return cumulative
+
+    def percentile(self, percentile):
+        """Value at or below which percentile % of the recorded values fall (0 when empty)"""
+        if not self.total:
+            return 0
+        target = max(math.ceil(percentile / 100 * self.total), 1)
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= target:
+                return min(self.highest_equivalent(index), self.max)
+        return self.max
+
+    def summary(self, scale=1000.0):
+        """{'count', 'p50', 'p99', 'p999', 'max'}, values divided by scale (us -> ms by default)"""
+        summary = {'count': self.total}
+        for percentile in PERCENTILES:
+            summary['p' + f"{percentile:g}".replace('.', '')] = self.percentile(percentile) / scale
+        summary['max'] = self.max / scale
+        return summary
+
+    def reset(self):
+        self.counts = [0] * self.sub_bucket_count
+        self.total = 0
+        self.sum = 0
+        self.max = 0
+
+
+def format_summary(summary):
+    """One-line rendering of LatencyHistogram.summary() for the stats logs"""
+    return (f"p50 {summary['p50']:.1f} / p99 {summary['p99']:.1f} / p999 {summary['p999']:.1f} / "
+            f"max {summary['max']:.1f} ms ({summary['count']} samples)")
@@ -0,0 +1,199 @@
+"""
+Prometheus metrics for the pipeline services
+A MetricsRegistry holds counters, gauges and histograms and renders them in the Prometheus
+text format (0.0.4); serve() exposes it on a local HTTP /metrics endpoint from a daemon
+thread. The services already count most things (stats dicts, queue depths), so most metrics
+are functions read at scrape time and the hot paths pay nothing for them. Counter and Gauge
+objects are for values that have no other home.
+
+Histograms are histogram.LatencyHistogram instances recorded in microseconds and exported
+in seconds, with fixed le buckets derived from their log-linear counts. They stay cumulative,
+as Prometheus expects; stats logs take per-interval views with LatencyHistogram.since().
+"""
+
+import logging
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from histogram import LatencyHistogram
+
+logger = logging.getLogger(__name__)
+
+# Address the /metrics endpoints listen on (all interfaces of the container by default)
+METRICS_ADDR = os.getenv('METRICS_ADDR', '0.0.0.0')
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+# le bounds of the exported latency histograms, in seconds
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class Counter:
+    def __init__(self):
+        self.value = 0
+        self.lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self.lock:
+            self.value += amount
+
+    def get(self):
+        return self.value
+
+
+class Gauge:
+    def __init__(self):
+        self.value = 0
+
+    def set(self, value):
+        self.value = value
+
+    def get(self):
+        return self.value
+
+
+def escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{escape_label(value)}"' for key, value in labels.items()) + '}'
+
+
+def format_value(value):
+    if not isinstance(value, float):
+        return str(int(value))
+    if value != value:
+        return 'NaN'
+    if value in (float('inf'), float('-inf')):
+        return '+Inf' if value > 0 else '-Inf'
+    return repr(value)
+
+
+class MetricsRegistry:
+    def __init__(self, **labels):
+        # Constant labels on every sample, e.g. worker
+        self.labels = labels
+        # name -> (type, help, [(labels, source)]); labels None marks a source yielding (labels, value) pairs
+        self.families = {}
+        self.lock = threading.Lock()
+        started = time.time()
+        self.gauge('process_start_time_seconds', "Start time of the process since the Unix epoch",
+                   function=lambda: started)
+        self.counter('process_cpu_seconds_total', "User and system CPU time spent",
+                     function=lambda: sum(os.times()[:2]))
+
+    def add(self, kind, name, help_text, labels, source):
+        with self.lock:
+            family = self.families.get(name)
+            if family is None:
+                family = self.families[name] = (kind, help_text, [])
+            elif family[0] != kind:
+                raise ValueError(f"Metric {name} is already registered as a {family[0]}")
+            family[2].append((labels, source))
+
+    def counter(self, name, help_text, function=None, **labels):
+        """A Counter, or a counter read from function() at scrape time (returns None then)"""
+        metric = Counter() if function is None else None
+        self.add('counter', name, help_text, labels, function or metric.get)
+        return metric
+
+    def gauge(self, name, help_text, function=None, **labels):
+        """A Gauge, or a gauge read from function() at scrape time (returns None then)"""
+        metric = Gauge() if function is None else None
+        self.add('gauge', name, help_text, labels, function or metric.get)
+        return metric
+
+    def labelled(self, kind, name, help_text, function):
+        """A counter or gauge family whose function() yields (labels, value) pairs at scrape time"""
+        self.add(kind, name, help_text, None, function)
+
+    def histogram(self, name, help_text, histogram=None, lock=None, scale=1e6, buckets=LATENCY_BUCKETS, **labels):
+        """Export histogram (a new LatencyHistogram by default), read under lock if given
+
+        Values are divided by scale (microseconds -> seconds by default); returns the histogram.
+        """
+        histogram = histogram if histogram is not None else LatencyHistogram()
+        self.add('histogram', name, help_text, labels, (histogram, lock, scale, buckets))
+        return histogram
+
+    def samples(self, name, kind, labels, source):
+        if kind == 'histogram':
+            histogram, lock, scale, buckets = source
+            if lock is not None:
+                with lock:
+                    histogram = histogram.copy()
+            else:
+                histogram = histogram.copy()
+            labels = {**self.labels, **labels}
+            cumulative = histogram.cumulative_counts([bound * scale for bound in buckets])
+            for bound, count in zip(buckets, cumulative):
+                yield f"{name}_bucket{format_labels({**labels, 'le': format_value(float(bound))})} {count}"
+            yield f"{name}_bucket{format_labels({**labels, 'le': '+Inf'})} {histogram.total}"
+            yield f"{name}_sum{format_labels(labels)} {format_value(histogram.sum / scale)}"
+            yield f"{name}_count{format_labels(labels)} {histogram.total}"
+        elif labels is None:
+            for sample_labels, value in source():
+                if value is not None:
+                    yield f"{name}{format_labels({**self.labels, **sample_labels})} {format_value(value)}"
+        else:
+            value = source()
+            if value is not None:
+                yield f"{name}{format_labels({**self.labels, **labels})} {format_value(value)}"
+
+    def render(self):
+        """The registry in the Prometheus text format"""
+        with self.lock:
+            families = [(name, kind, help_text, list(children))
+                        for name, (kind, help_text, children) in self.families.items()]
+        lines = []
+        for name, kind, help_text, children in families:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, source in children:
+                try:
+                    lines.extend(self.samples(name, kind, labels, source))
+                except Exception as e:
+                    # One broken source must not take the whole endpoint down
+                    logger.debug(f"Skipping metric {name}: {e}")
+        return '\n'.join(lines) + '\n'
+
+
+def serve(registry, port, addr=METRICS_ADDR):
+    """Serve registry on http://addr:port/metrics from a daemon thread
+
+    Returns the server, or None when port is 0 or cannot be bound (the service runs on
+    without an endpoint).
+    """
+    if not port:
+        return None
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?', 1)[0] != '/metrics':
+                self.send_error(404)
+                return
+            body = registry.render().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', CONTENT_TYPE)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            # Scrapes are not worth a log line each
+            pass
+
+    try:
+        server = ThreadingHTTPServer((addr, port), MetricsHandler)
+    except OSError as e:
+        logger.warning(f"Metrics endpoint disabled, cannot listen on {addr}:{port}: {e}")
+        return None
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='metrics-http', daemon=True).start()
+    logger.info(f"Serving metrics on http://{addr}:{port}/metrics")
+    return server
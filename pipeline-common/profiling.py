@@ -0,0 +1,104 @@
+"""
+On-demand profiles of a running service
+SignalProfiler.install() registers two handlers; nothing runs until a signal arrives:
+  SIGUSR1 - sample the stacks of every thread for PROFILE_SECONDS and write them in the
+            collapsed format py-spy record --format raw produces (one "thread;frame;...
+            count" line per stack), for flamegraph.pl, speedscope or inferno
+  SIGUSR2 - start cProfile on the main thread; the next SIGUSR2 stops it and writes a
+            pstats file (python -m pstats, snakeviz)
+Files are written to PROFILE_DIR as <name>-<pid>-<time>.collapsed / .prof; an empty
+PROFILE_DIR leaves the signals alone. py-spy can also attach from outside when the container
+has the SYS_PTRACE capability; the service threads are named, so its output reads the same.
+"""
+
+import cProfile
+import logging
+import os
+import signal
+import sys
+import threading
+import time
+from collections import Counter
+
+logger = logging.getLogger(__name__)
+
+PROFILE_DIR = os.getenv('PROFILE_DIR', '/tmp/profiles')
+PROFILE_SECONDS = float(os.getenv('PROFILE_SECONDS', 30))
+PROFILE_SAMPLE_MS = float(os.getenv('PROFILE_SAMPLE_MS', 5))
+
+
+def sample_stacks(seconds, interval):
+    """{collapsed stack: samples} of every thread but the calling one"""
+    stacks = Counter()
+    own = threading.get_ident()
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident == own:
+                continue
+            frames = []
+            while frame is not None:
+                code = frame.f_code
+                frames.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            frames.append(names.get(ident, str(ident)))
+            stacks[';'.join(reversed(frames))] += 1
+        time.sleep(interval)
+    return stacks
+
+
+class SignalProfiler:
+    def __init__(self, name, directory=PROFILE_DIR, seconds=PROFILE_SECONDS, sample_ms=PROFILE_SAMPLE_MS):
+        self.name = name
+        self.directory = directory
+        self.seconds = seconds
+        self.sample_ms = sample_ms
+        self.sampler = None
+        self.profile = None
+
+    def install(self):
+        """Register the handlers; must run on the main thread. Returns self, or None when disabled"""
+        if not self.directory:
+            return None
+        signal.signal(signal.SIGUSR1, self.on_sample)
+        signal.signal(signal.SIGUSR2, self.on_toggle)
+        return self
+
+    def path(self, suffix):
+        os.makedirs(self.directory, exist_ok=True)
+        return os.path.join(self.directory, f"{self.name}-{os.getpid()}-{time.strftime('%Y%m%d-%H%M%S')}{suffix}")
+
+    def on_sample(self, signum=None, frame=None):
+        if self.sampler is not None and self.sampler.is_alive():
+            logger.warning("Stack sampling already running, ignoring the signal")
+            return
+        self.sampler = threading.Thread(target=self.write_samples, name='profile-sampler', daemon=True)
+        self.sampler.start()
+
+    def write_samples(self):
+        logger.info(f"Sampling thread stacks for {self.seconds:g}s every {self.sample_ms:g} ms")
+        try:
+            stacks = sample_stacks(self.seconds, self.sample_ms / 1000.0)
+            path = self.path('.collapsed')
+            with open(path, 'w') as f:
+                for stack, count in stacks.most_common():
+                    f.write(f"{stack} {count}\n")
+            logger.info(f"Wrote {sum(stacks.values())} stack samples to {path}")
+        except Exception as e:
+            logger.error(f"Stack sampling failed: {e}")
+
+    def on_toggle(self, signum=None, frame=None):
+        if self.profile is None:
+            self.profile = cProfile.Profile()
+            self.profile.enable()
+            logger.info("cProfile started on the main thread, send SIGUSR2 again to stop it")
+            return
+        self.profile.disable()
+        profile, self.profile = self.profile, None
+        try:
+            path = self.path('.prof')
+            profile.dump_stats(path)
+            logger.info(f"Wrote cProfile stats to {path}")
+        except OSError as e:
+            logger.error(f"Could not write cProfile stats: {e}")
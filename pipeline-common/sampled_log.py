@@ -0,0 +1,40 @@
+"""
+Rate-limited logging for per-message events
+A SampledLog writes at most one record per interval seconds and notes how many it skipped
+since the previous one. A skipped call costs a clock read: the message is %-formatted by
+logging only when a record is emitted, so callers pass arguments instead of f-strings.
+An interval of 0 logs every call, like a plain logger.
+"""
+
+import logging
+import threading
+import time
+
+
+class SampledLog:
+    def __init__(self, logger, interval=10.0, level=logging.INFO):
+        self.logger = logger
+        self.interval = interval
+        self.level = level
+        self.next_at = 0.0
+        # Approximate under contention: the unlocked increments may race with the reset
+        self.skipped = 0
+        self.lock = threading.Lock()
+
+    def __call__(self, msg, *args):
+        if not self.logger.isEnabledFor(self.level):
+            return
+        if self.interval > 0:
+            now = time.monotonic()
+            if now < self.next_at:
+                self.skipped += 1
+                return
+            with self.lock:
+                if now < self.next_at:
+                    self.skipped += 1
+                    return
+                self.next_at = now + self.interval
+                skipped, self.skipped = self.skipped, 0
+            if skipped:
+                msg = f"{msg} (+{skipped} similar skipped)"
+        self.logger.log(self.level, msg, *args)
@@ -0,0 +1,124 @@
+"""
+Worker process supervision shared by the multi-process services
+ProcessSupervisor forks one process per worker and gives each a shared pair of
+counters it refreshes (e.g. received/sent). It restarts workers that exit, logs
+per-worker and total rates every stats_interval seconds, and forwards the
+profiling signals (SIGUSR1/SIGUSR2, see profiling.py) to every worker. On SIGTERM
+or SIGINT it sends SIGINT to the workers, which they treat as a clean shutdown,
+and kills those still running after shutdown_timeout.
+"""
+
+import logging
+import multiprocessing
+import os
+import signal
+import time
+
+logger = logging.getLogger(__name__)
+
+
+def reset_signals():
+    """Drop the supervisor's handlers, which workers restarted after startup inherit"""
+    signal.signal(signal.SIGINT, signal.default_int_handler)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    # Until the worker installs its profiler, if enabled
+    signal.signal(signal.SIGUSR1, signal.SIG_IGN)
+    signal.signal(signal.SIGUSR2, signal.SIG_IGN)
+
+
+def run_worker(target, index, args, counters):
+    """Child process entry point: target(index, *args, counters) with default signal handling"""
+    reset_signals()
+    target(index, *args, counters)
+
+
+class ProcessSupervisor:
+    """Starts, watches and stops the worker processes
+
+    name labels the workers in the logs ("bridge" -> "bridge-0", "Bridge worker 0"),
+    title the stats lines, and counters names the two counters, e.g. ('in', 'out').
+    """
+
+    def __init__(self, processes, target, args=(), name='worker', title='Supervisor',
+                 counters=('in', 'out'), unit='msgs/s', stats_interval=30, shutdown_timeout=60):
+        self.processes = processes
+        self.target = target
+        self.args = args
+        self.name = name
+        self.title = title
+        self.counter_names = counters
+        self.unit = unit
+        self.stats_interval = stats_interval
+        self.shutdown_timeout = shutdown_timeout
+        self.ctx = multiprocessing.get_context('fork')
+        self.workers = [None] * processes
+        self.counters = [self.ctx.Array('q', 2, lock=False) for _ in range(processes)]
+        self.stopping = False
+
+    def start_worker(self, index):
+        process = self.ctx.Process(target=run_worker,
+                                   args=(self.target, index, self.args, self.counters[index]),
+                                   name=f"{self.name}-{index}")
+        process.start()
+        self.workers[index] = process
+        logger.info(f"Started {self.name} worker {index} (pid {process.pid})")
+
+    def stop(self, signum=None, frame=None):
+        self.stopping = True
+
+    def forward(self, signum, frame=None):
+        for process in self.workers:
+            if process is not None and process.is_alive():
+                os.kill(process.pid, signum)
+
+    def report(self, last, elapsed):
+        """Log per-worker rates since the previous report; returns the new baseline"""
+        current = [(c[0], c[1]) for c in self.counters]
+        total_first = total_second = 0.0
+        lines = []
+        for index, ((first, second), (last_first, last_second)) in enumerate(zip(current, last)):
+            rate_first = (first - last_first) / elapsed
+            rate_second = (second - last_second) / elapsed
+            total_first += rate_first
+            total_second += rate_second
+            lines.append(f"w{index} {rate_first:.0f}/{rate_second:.0f}")
+        logger.info(f"{self.title} stats - {self.processes} workers, total {'/'.join(self.counter_names)}: "
+                    f"{total_first:.0f}/{total_second:.0f} {self.unit} ({', '.join(lines)})")
+        return current
+
+    def run(self):
+        for index in range(self.processes):
+            self.start_worker(index)
+        # Installed after forking so the workers keep the default handlers
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        # Profiling signals sent to the container (PID 1) go to every worker
+        signal.signal(signal.SIGUSR1, self.forward)
+        signal.signal(signal.SIGUSR2, self.forward)
+
+        last = [(0, 0)] * self.processes
+        last_report = time.time()
+        while not self.stopping:
+            time.sleep(1)
+            for index, process in enumerate(self.workers):
+                if not process.is_alive() and not self.stopping:
+                    logger.error(f"{self.name.capitalize()} worker {index} exited with code "
+                                 f"{process.exitcode}, restarting")
+                    self.counters[index][0] = self.counters[index][1] = 0
+                    last[index] = (0, 0)
+                    self.start_worker(index)
+            now = time.time()
+            if now - last_report >= self.stats_interval:
+                last = self.report(last, now - last_report)
+                last_report = now
+
+        logger.info(f"Stopping {self.name} workers...")
+        for process in self.workers:
+            if process.is_alive():
+                # Workers treat SIGINT (KeyboardInterrupt) as a clean shutdown
+                os.kill(process.pid, signal.SIGINT)
+        for process in self.workers:
+            process.join(self.shutdown_timeout)
+            if process.is_alive():
+                logger.warning(f"{self.name.capitalize()} worker {process.name} did not stop in time, killing it")
+                process.kill()
@@ -0,0 +1,322 @@
+#!/usr/bin/env python3
+"""
+Bulk backfill of historical tweets
+Builds the same enriched messages as the publisher from the corpus (tweets1.json,
+users1.json, mbti_labels.csv), with timestamps spread evenly over [--since, --until),
+and writes them without going through MQTT and the bridge. Two sinks:
+
+  mysql  users are upserted once, then every worker writes TSV chunks and loads them
+         with LOAD DATA LOCAL INFILE (the server needs local_infile=ON). Rows get
+         coordinates (--source-name, 0, record index) and the unique key includes the
+         timestamp, so it needs a fixed --until: re-running the same backfill (same
+         range, records and seed) then skips the rows already loaded. Rollups are not maintained by LOAD DATA: run
+         `python rollups.py rebuild` in the consumer afterwards.
+  kafka  messages are produced to the twitter-tweets topic in large compressed batches,
+         keyed by user_id like the bridge, with the event time as record timestamp.
+         The consumer ingests them as usual.
+
+    python backfill.py mysql --records 5000000 --since 2026-09-01 --until 2026-10-01 --workers 8
+    python backfill.py kafka --since 2026-09-01 --until 2026-10-01 --compression gzip
+"""
+
+import argparse
+import logging
+import multiprocessing as mp
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from corpus import TweetCorpus
+from publisher import CORPUS_SNAPSHOT, DATA_DIR, SAMPLE_SEED, WIRE_FORMAT, ZIPF_EXPONENT
+from sampler import DISTRIBUTIONS, TweetSampler
+from wire import WIRE_FORMATS, timestamp_micros
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+KAFKA_BOOTSTRAP_SERVERS = os.getenv('KAFKA_BOOTSTRAP_SERVERS', 'localhost:9092')
+KAFKA_TOPIC = os.getenv('KAFKA_TOPIC', 'twitter-tweets')
+MYSQL_HOST = os.getenv('MYSQL_HOST', 'localhost')
+MYSQL_PORT = int(os.getenv('MYSQL_PORT', 3306))
+MYSQL_DATABASE = os.getenv('MYSQL_DATABASE', 'twitter_analytics')
+MYSQL_USER = os.getenv('MYSQL_USER', 'twitter_user')
+MYSQL_PASSWORD = os.getenv('MYSQL_PASSWORD', 'twitter_password')
+
+# Per-worker slots in the shared counter array
+RECORDS, BYTES = 0, 1
+COUNTERS_PER_WORKER = 2
+
+USER_UPSERT = """
+INSERT INTO users (
+    user_id, screen_name, location, verified, statuses_count,
+    mbti_personality, total_retweet_count, total_favorite_count
+) VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+ON DUPLICATE KEY UPDATE
+    screen_name = VALUES(screen_name),
+    location = VALUES(location),
+    verified = VALUES(verified),
+    statuses_count = VALUES(statuses_count),
+    mbti_personality = VALUES(mbti_personality),
+    total_retweet_count = VALUES(total_retweet_count),
+    total_favorite_count = VALUES(total_favorite_count)
+"""
+
+# IGNORE: rows of an earlier run of the same backfill hit uq_kafka_source and are skipped
+LOAD_QUERY = """
+LOAD DATA LOCAL INFILE %s IGNORE INTO TABLE tweet_facts
+CHARACTER SET utf8mb4
+FIELDS TERMINATED BY '\\t' ESCAPED BY '\\\\'
+LINES TERMINATED BY '\\n'
+(user_id, tweet, timestamp, iso_timestamp, kafka_topic, kafka_partition, kafka_offset)
+"""
+
+TSV_ESCAPES = str.maketrans({'\\': '\\\\', '\t': '\\t', '\n': '\\n', '\r': '\\r'})
+
+
+class Backfill:
+    """The record plan shared by all workers: which (user, tweet) pair and timestamp record i gets"""
+
+    def __init__(self, corpus, records, since, until, distribution, seed, zipf_exponent):
+        self.corpus = corpus
+        self.records = records or corpus.tweet_total
+        self.since = since
+        self.step = (until - since) / self.records
+        self.distribution = distribution
+        self.seed = seed
+        self.zipf_exponent = zipf_exponent
+        self.user_starts = np.asarray(corpus.user_starts, dtype=np.int64)
+        # One sampler, so every chunk shares the same zipf ranking; chunks only get their own draws
+        self.sampler = None
+        if distribution != 'all':
+            self.sampler = TweetSampler(corpus, distribution, seed=seed, zipf_exponent=zipf_exponent)
+
+    def pairs(self, start, stop):
+        """(user_idx, tweet_idx) arrays of records [start, stop)
+
+        With distribution 'all' record i is tweet i of the corpus (cycling when there are
+        more records than tweets). Otherwise pairs are sampled from the distribution of
+        --seed, with draws seeded per range, so a re-run with the same seed rebuilds the
+        same records.
+        """
+        if self.distribution == 'all':
+            tweets = np.arange(start, stop, dtype=np.int64) % self.corpus.tweet_total
+            users = np.searchsorted(self.user_starts, tweets, side='right') - 1
+            return users, tweets - self.user_starts[users]
+        seed = None if self.seed is None else self.seed + start
+        return self.sampler.draw(stop - start, rng=np.random.default_rng(seed))
+
+    def timestamp(self, index):
+        return self.since + self.step * index
+
+
+def tsv_chunk(backfill, start, stop, source_name):
+    """TSV rows of records [start, stop) in LOAD_QUERY column order"""
+    corpus = backfill.corpus
+    lines = []
+    users, tweets = backfill.pairs(start, stop)
+    for index, user_idx, tweet_idx in zip(range(start, stop), users.tolist(), tweets.tolist()):
+        moment = backfill.timestamp(index)
+        text = corpus.tweet_text(user_idx, tweet_idx).translate(TSV_ESCAPES)
+        lines.append(f"{corpus.users[user_idx].user_id}\t{text}\t{moment:%Y-%m-%d %H:%M:%S}\t{moment.isoformat(' ')}"
+                     f"\t{source_name}\t0\t{index}\n")
+    return ''.join(lines).encode('utf-8')
+
+
+def mysql_worker(worker_id, backfill, ranges, args, counters):
+    import mysql.connector
+
+    base = worker_id * COUNTERS_PER_WORKER
+    connection = mysql.connector.connect(host=args.mysql_host, port=args.mysql_port, database=args.mysql_database,
+                                         user=args.mysql_user, password=args.mysql_password,
+                                         allow_local_infile=True, autocommit=True)
+    cursor = connection.cursor()
+    fd, path = tempfile.mkstemp(prefix=f'backfill-{worker_id}-', suffix='.tsv', dir=args.tmp_dir)
+    os.close(fd)
+    try:
+        for start, stop in ranges:
+            data = tsv_chunk(backfill, start, stop, args.source_name)
+            with open(path, 'wb') as f:
+                f.write(data)
+            cursor.execute(LOAD_QUERY, (path,))
+            counters[base + RECORDS] += stop - start
+            counters[base + BYTES] += len(data)
+    finally:
+        os.unlink(path)
+        cursor.close()
+        connection.close()
+
+
+def kafka_worker(worker_id, backfill, ranges, args, counters):
+    from kafka import KafkaProducer
+
+    base = worker_id * COUNTERS_PER_WORKER
+    producer = KafkaProducer(
+        bootstrap_servers=[args.kafka_bootstrap],
+        compression_type=None if args.compression == 'none' else args.compression,
+        batch_size=args.batch_bytes,
+        linger_ms=args.linger_ms,
+        acks=1,
+        max_request_size=max(args.batch_bytes * 2, 1048576)
+    )
+    corpus = backfill.corpus
+    # Delivery failures, counted by the producer's I/O thread; [count, first error]
+    failures = [0, None]
+
+    def on_error(exc):
+        failures[0] += 1
+        if failures[1] is None:
+            failures[1] = exc
+
+    try:
+        for start, stop in ranges:
+            users, tweets = backfill.pairs(start, stop)
+            size = 0
+            for index, user_idx, tweet_idx in zip(range(start, stop), users.tolist(), tweets.tolist()):
+                moment = backfill.timestamp(index)
+                if args.wire_format == 'avro':
+                    value = corpus.render_frame(user_idx, tweet_idx, timestamp_micros(moment))
+                else:
+                    value = corpus.render_message(user_idx, tweet_idx,
+                                                  moment.strftime("%Y-%m-%d %H:%M:%S").encode('ascii'),
+                                                  moment.isoformat().encode('ascii'))
+                future = producer.send(args.topic, key=str(corpus.users[user_idx].user_id).encode('utf-8'),
+                                       value=value, timestamp_ms=int(moment.timestamp() * 1000))
+                future.add_errback(on_error)
+                size += len(value)
+            counters[base + RECORDS] += stop - start
+            counters[base + BYTES] += size
+        producer.flush()
+    finally:
+        producer.close()
+    if failures[0]:
+        # Only delivered records count; the non-zero exit code fails the backfill
+        counters[base + RECORDS] -= failures[0]
+        logger.error(f"Worker {worker_id}: {failures[0]:,} records were not delivered, first error: {failures[1]}")
+        raise SystemExit(1)
+
+
+def upsert_users(corpus, args):
+    import mysql.connector
+
+    connection = mysql.connector.connect(host=args.mysql_host, port=args.mysql_port, database=args.mysql_database,
+                                         user=args.mysql_user, password=args.mysql_password)
+    try:
+        cursor = connection.cursor()
+        rows = [(user.user_id, user.screen_name, user.location, user.verified, user.statuses_count,
+                 user.mbti_personality, user.total_retweet_count, user.total_favorite_count)
+                for user in sorted(corpus.users, key=lambda user: user.user_id)]
+        for i in range(0, len(rows), 5000):
+            cursor.executemany(USER_UPSERT, rows[i:i + 5000])
+        connection.commit()
+        cursor.close()
+        logger.info(f"Upserted {len(rows)} users")
+    finally:
+        connection.close()
+
+
+def totals(counters, workers):
+    records = sum(counters[w * COUNTERS_PER_WORKER + RECORDS] for w in range(workers))
+    size = sum(counters[w * COUNTERS_PER_WORKER + BYTES] for w in range(workers))
+    return records, size
+
+
+def report(counters, workers, total, started, processes, interval):
+    """Log progress and throughput every interval until the workers exit"""
+    last_records, last_time = 0, started
+    while any(p.is_alive() for p in processes):
+        time.sleep(interval)
+        now = time.perf_counter()
+        records, size = totals(counters, workers)
+        rate = (records - last_records) / (now - last_time)
+        remaining = (total - records) / rate if rate > 0 else float('inf')
+        logger.info(f"Backfill progress - {records:,} / {total:,} records ({records / total:.0%}), "
+                    f"{rate:,.0f} records/s, {size / 1e6:,.0f} MB, ETA {remaining:,.0f} s")
+        last_records, last_time = records, now
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk backfill of historical tweets into MySQL or Kafka")
+    parser.add_argument('sink', choices=['mysql', 'kafka'], help="Load tweet_facts directly or produce to Kafka")
+    parser.add_argument('--records', type=int, default=0, help="Records to write (0 = every corpus tweet once)")
+    parser.add_argument('--since', default=None, help="Timestamp of the first record (default: --days before --until)")
+    parser.add_argument('--until', default=None, help="End of the timestamp range (default: now, required with --since and by the mysql sink)")
+    parser.add_argument('--days', type=float, default=30, help="Range length when --since is not given")
+    parser.add_argument('--distribution', choices=('all',) + DISTRIBUTIONS, default='all',
+                        help="'all' walks the corpus in order, otherwise (user, tweet) pairs are sampled")
+    parser.add_argument('--seed', type=int, default=SAMPLE_SEED if SAMPLE_SEED is not None else 0,
+                        help="Sampling seed; keep it to re-run the same backfill")
+    parser.add_argument('--zipf-exponent', type=float, default=ZIPF_EXPONENT, help="Skew of the zipf distribution")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="Worker processes")
+    parser.add_argument('--chunk', type=int, default=100000, help="Records per TSV file / progress update")
+    parser.add_argument('--report-interval', type=float, default=5, help="Seconds between progress lines")
+    parser.add_argument('--source-name', default='backfill',
+                        help="kafka_topic value of loaded rows; the same name and range make re-runs idempotent")
+    parser.add_argument('--tmp-dir', default=None, help="Directory for TSV chunks (default: system temp)")
+    parser.add_argument('--mysql-host', default=MYSQL_HOST)
+    parser.add_argument('--mysql-port', type=int, default=MYSQL_PORT)
+    parser.add_argument('--mysql-database', default=MYSQL_DATABASE)
+    parser.add_argument('--mysql-user', default=MYSQL_USER)
+    parser.add_argument('--mysql-password', default=MYSQL_PASSWORD)
+    parser.add_argument('--kafka-bootstrap', default=KAFKA_BOOTSTRAP_SERVERS)
+    parser.add_argument('--topic', default=KAFKA_TOPIC)
+    parser.add_argument('--compression', choices=('gzip', 'snappy', 'lz4', 'zstd', 'none'), default='gzip',
+                        help="Producer batch compression (snappy/lz4/zstd need their Python packages)")
+    parser.add_argument('--wire-format', choices=WIRE_FORMATS, default=WIRE_FORMAT, help="Payload encoding of the kafka sink")
+    parser.add_argument('--batch-bytes', type=int, default=1048576, help="Producer batch size per partition")
+    parser.add_argument('--linger-ms', type=int, default=100, help="Producer linger to fill batches")
+    args = parser.parse_args()
+
+    # A range ending at "now" moves between runs, and with it every record's timestamp
+    if not args.until and (args.since or args.sink == 'mysql'):
+        raise SystemExit("--until is required with --since and by the mysql sink, so that re-runs "
+                         "produce the same timestamps")
+    until = datetime.fromisoformat(args.until) if args.until else datetime.now()
+    since = datetime.fromisoformat(args.since) if args.since else until - timedelta(days=args.days)
+    if since >= until:
+        raise SystemExit("--since must be before --until")
+
+    snapshot = CORPUS_SNAPSHOT if CORPUS_SNAPSHOT is not None else os.path.join(DATA_DIR, 'corpus.snapshot')
+    corpus = TweetCorpus.open_or_build(DATA_DIR, snapshot)
+    backfill = Backfill(corpus, args.records, since, until, args.distribution, args.seed, args.zipf_exponent)
+    total = backfill.records
+    if args.sink == 'mysql':
+        upsert_users(corpus, args)
+
+    # Chunks are dealt round-robin, so every worker covers the whole time range
+    chunks = [(start, min(start + args.chunk, total)) for start in range(0, total, args.chunk)]
+    workers = max(1, min(args.workers, len(chunks)))
+    target = mysql_worker if args.sink == 'mysql' else kafka_worker
+
+    ctx = mp.get_context('fork')
+    counters = ctx.Array('q', workers * COUNTERS_PER_WORKER, lock=False)
+    logger.info(f"Backfilling {total:,} records from {since} to {until} into {args.sink} with {workers} workers")
+    processes = [ctx.Process(target=target, args=(w, backfill, chunks[w::workers], args, counters))
+                 for w in range(workers)]
+    started = time.perf_counter()
+    for process in processes:
+        process.start()
+
+    try:
+        report(counters, workers, total, started, processes, args.report_interval)
+    except KeyboardInterrupt:
+        logger.info("Stopping backfill...")
+    finally:
+        for process in processes:
+            process.join()
+        elapsed = time.perf_counter() - started
+        records, size = totals(counters, workers)
+        failed = [w for w, process in enumerate(processes) if process.exitcode != 0]
+        logger.info(f"Backfill finished - {records:,} records, {size / 1e6:,.1f} MB in {elapsed:,.1f} s "
+                    f"({records / elapsed:,.0f} records/s, {size / 1e6 / elapsed:,.1f} MB/s)"
+                    + (f", workers {failed} failed" if failed else ""))
+        if args.sink == 'mysql' and records:
+            logger.info("Run `python rollups.py rebuild` in kafka-mysql-consumer to fold the rows into the rollups")
+    if failed:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+"""
+Publisher micro-benchmarks
+Measures corpus memory and message construction throughput without touching the MQTT broker
+"""
+
+import argparse
+import csv
+import gc
+import json
+import os
+import random
+import shutil
+import tempfile
+import time
+import tracemalloc
+from collections import Counter
+from datetime import datetime
+
+import numpy as np
+
+from corpus import TweetCorpus, compile_corpus
+from publisher import TwitterDataPublisher
+from sampler import DISTRIBUTIONS, TweetSampler
+
+MBTI_TYPES = ['intj', 'intp', 'entj', 'entp', 'infj', 'infp', 'enfj', 'enfp',
+              'istj', 'isfj', 'estj', 'esfj', 'istp', 'isfp', 'estp', 'esfp']
+
+
+def write_synthetic_corpus(data_dir, users, tweets_per_user, seed=42):
+    """Write tweets1.json, users1.json and mbti_labels.csv with synthetic content"""
+    rng = random.Random(seed)
+    tweets_data = []
+    users_data = []
+    mbti_rows = []
+
+    for i in range(users):
+        user_id = 10_000_000 + i
+        screen_name = f"user_{i}"
+        tweets_data.append({
+            'id': user_id,
+            'screen_name': screen_name,
+            'tweets': [
+                f"Synthetic tweet {j} from {screen_name} with \"quotes\" and a\nnewline"
+                for j in range(rng.randint(1, tweets_per_user * 2))
+            ]
+        })
+        users_data.append({
+            'id': user_id,
+            'screen_name': screen_name,
+            'location': rng.choice(['New York, NY', 'London', 'Berlin', '']),
+            'verified': rng.random() < 0.1,
+            'statuses_count': rng.randint(0, 50000),
+            'total_retweet_count': rng.randint(0, 5000),
+            'total_favorite_count': rng.randint(0, 5000)
+        })
+        mbti_rows.append(f"{user_id},{rng.choice(MBTI_TYPES)}")
+
+    with open(os.path.join(data_dir, 'tweets1.json'), 'w', encoding='utf-8') as file:
+        json.dump(tweets_data, file)
+    with open(os.path.join(data_dir, 'users1.json'), 'w', encoding='utf-8') as file:
+        json.dump(users_data, file)
+    with open(os.path.join(data_dir, 'mbti_labels.csv'), 'w', encoding='utf-8') as file:
+        file.write("id,mbti_personality\n")
+        file.write("\n".join(mbti_rows) + "\n")
+
+
+class LegacyCorpus:
+    """The original json.load-based data structures, kept as a baseline"""
+
+    def __init__(self, data_dir):
+        with open(os.path.join(data_dir, 'tweets1.json'), 'r', encoding='utf-8') as file:
+            self.tweets_data = json.load(file)
+        with open(os.path.join(data_dir, 'users1.json'), 'r', encoding='utf-8') as file:
+            self.users_data = json.load(file)
+        with open(os.path.join(data_dir, 'mbti_labels.csv'), 'r', encoding='utf-8', newline='') as file:
+            self.mbti_lookup = {int(row['id']): row['mbti_personality'] for row in csv.DictReader(file)}
+        self.user_info_lookup = {user['screen_name']: user for user in self.users_data}
+
+
+def legacy_create_tweet_message(legacy, user_data, tweet_text, now=None):
+    """Message construction as it was before the profile index (linear user scan)"""
+    if now is None:
+        now = datetime.now()
+
+    cleaned_text = tweet_text.encode('utf-8', 'ignore').decode('utf-8')
+    cleaned_text = cleaned_text.replace('\n', ' ').replace('"', '').replace('\\', '')
+    if not cleaned_text.endswith('.'):
+        cleaned_text += '.'
+
+    user_tweets = None
+    for user in legacy.tweets_data:
+        if user.get('id') == user_data['id']:
+            user_tweets = user
+            break
+
+    user_info = None
+    if user_tweets:
+        screen_name = user_tweets.get('screen_name', '')
+        info = legacy.user_info_lookup.get(screen_name, {})
+        user_info = {
+            'location': info.get('location', ''),
+            'verified': info.get('verified', False),
+            'statuses_count': info.get('statuses_count', 0),
+            'total_retweet_count': info.get('total_retweet_count', 0),
+            'total_favorite_count': info.get('total_favorite_count', 0),
+            'mbti_personality': legacy.mbti_lookup.get(user_data['id'], 'unknown')
+        }
+
+    return {
+        'user_id': user_data['id'],
+        'screen_name': user_data.get('screen_name', ''),
+        'tweet': cleaned_text,
+        'timestamp': now.strftime("%Y-%m-%d %H:%M:%S"),
+        'iso_timestamp': now.isoformat(),
+        'location': user_info.get('location', '') if user_info else '',
+        'verified': user_info.get('verified', False) if user_info else False,
+        'statuses_count': user_info.get('statuses_count', 0) if user_info else 0,
+        'mbti_personality': user_info.get('mbti_personality', 'unknown') if user_info else 'unknown',
+        'total_retweet_count': user_info.get('total_retweet_count', 0) if user_info else 0,
+        'total_favorite_count': user_info.get('total_favorite_count', 0) if user_info else 0
+    }
+
+
+def sample_indices(corpus, count, seed=7):
+    """Draw (user_idx, tweet_idx) pairs the way the publish loop does"""
+    rng = random.Random(seed)
+    indices = []
+    while len(indices) < count:
+        user_idx = rng.randrange(len(corpus))
+        tweet_count = corpus.tweet_count(user_idx)
+        if tweet_count:
+            indices.append((user_idx, rng.randrange(tweet_count)))
+    return indices
+
+
+def check_payloads(publisher, legacy, indices):
+    """Make sure every encoding path emits exactly what the original publisher did"""
+    now = datetime.now()
+    for user_idx, tweet_idx in indices[:1000]:
+        user_data = legacy.tweets_data[user_idx]
+        expected = json.dumps(legacy_create_tweet_message(
+            legacy, user_data, user_data['tweets'][tweet_idx], now)).encode('utf-8')
+        for actual in (publisher.render_message(user_idx, tweet_idx, now),
+                       json.dumps(publisher.create_tweet_message(user_idx, tweet_idx, now)).encode('utf-8')):
+            if actual != expected:
+                raise AssertionError(f"Payload mismatch for user {user_data['id']}:\n{actual}\n{expected}")
+
+
+def measure_memory(label, load):
+    """Report the heap retained by load()"""
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = load()
+    elapsed = time.perf_counter() - start
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<28} {current / 1e6:>9.1f} MB retained {peak / 1e6:>9.1f} MB peak {elapsed:>7.2f} s")
+    return result
+
+
+def run(label, encode, indices):
+    """Time encode(user_idx, tweet_idx) -> payload over all index pairs"""
+    start = time.perf_counter()
+    cpu_start = time.process_time()
+    for user_idx, tweet_idx in indices:
+        encode(user_idx, tweet_idx)
+    elapsed = time.perf_counter() - start
+    cpu = time.process_time() - cpu_start
+
+    rate = len(indices) / elapsed
+    print(f"{label:<28} {rate:>12,.0f} msgs/s   {cpu / len(indices) * 1e6:>8.2f} us CPU/msg")
+    return rate
+
+
+def measure_startup(data_dir):
+    """Compare time to a usable corpus from the source files and from a mapped snapshot"""
+    snapshot = os.path.join(tempfile.mkdtemp(prefix='publisher-snapshot-'), 'corpus.snapshot')
+    try:
+        start = time.perf_counter()
+        compile_corpus(data_dir, snapshot)
+        compiled = time.perf_counter() - start
+
+        start = time.perf_counter()
+        corpus = TweetCorpus.open_or_build(data_dir, snapshot)
+        corpus.encoded_text(0, 0)
+        mapped = time.perf_counter() - start
+
+        print(f"\n{'parse + compile snapshot':<28} {compiled * 1000:>9.1f} ms")
+        print(f"{'map validated snapshot':<28} {mapped * 1000:>9.1f} ms")
+    finally:
+        shutil.rmtree(os.path.dirname(snapshot), ignore_errors=True)
+
+
+def measure_sampling(corpus, draws):
+    """Compare two numpy calls per draw with block-vectorized sampling"""
+    print()
+    start = time.perf_counter()
+    for _ in range(draws):
+        user_idx = np.random.randint(len(corpus))
+        np.random.randint(max(corpus.tweet_count(user_idx), 1))
+    per_draw = (time.perf_counter() - start) / draws
+    print(f"{'np.random per draw':<28} {1 / per_draw:>12,.0f} draws/s")
+
+    for distribution in DISTRIBUTIONS:
+        sampler = TweetSampler(corpus, distribution, seed=1)
+        start = time.perf_counter()
+        users = [next(sampler)[0] for _ in range(draws)]
+        per_draw = (time.perf_counter() - start) / draws
+        top_share = max(Counter(users).values()) / draws
+        print(f"{'sampler: ' + distribution:<28} {1 / per_draw:>12,.0f} draws/s   "
+              f"busiest user {top_share:.2%} of draws")
+
+
+def corpus_size(data_dir):
+    return sum(os.path.getsize(os.path.join(data_dir, name))
+               for name in ('tweets1.json', 'users1.json', 'mbti_labels.csv'))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Publisher message construction benchmark")
+    parser.add_argument('--data-dir', help="Corpus directory (default: generate a synthetic one)")
+    parser.add_argument('--users', type=int, default=8328, help="Synthetic users to generate")
+    parser.add_argument('--tweets-per-user', type=int, default=20, help="Average synthetic tweets per user")
+    parser.add_argument('--messages', type=int, default=20000, help="Messages to build per scenario")
+    args = parser.parse_args()
+
+    tmp_dir = None
+    data_dir = args.data_dir
+    if not data_dir:
+        tmp_dir = tempfile.mkdtemp(prefix='publisher-bench-')
+        write_synthetic_corpus(tmp_dir, args.users, args.tweets_per_user)
+        data_dir = tmp_dir
+
+    try:
+        print(f"Source files: {corpus_size(data_dir) / 1e6:.1f} MB\n")
+        legacy = measure_memory("json.load structures", lambda: LegacyCorpus(data_dir))
+        corpus = measure_memory("compact corpus", lambda: TweetCorpus.load(data_dir))
+        measure_startup(data_dir)
+
+        publisher = TwitterDataPublisher(data_dir=data_dir)
+        indices = sample_indices(corpus, args.messages)
+        check_payloads(publisher, legacy, indices)
+        print(f"\nCorpus: {len(corpus)} users, {args.messages} messages per scenario\n")
+
+        def tweet_at(user_idx, tweet_idx):
+            user_data = legacy.tweets_data[user_idx]
+            return user_data, user_data['tweets'][tweet_idx]
+
+        baseline = run("linear user scan",
+                       lambda u, t: json.dumps(legacy_create_tweet_message(legacy, *tweet_at(u, t))).encode('utf-8'),
+                       indices)
+        indexed = run("profile index + json.dumps",
+                      lambda u, t: json.dumps(publisher.create_tweet_message(u, t)).encode('utf-8'),
+                      indices)
+        templated = run("pre-encoded templates", publisher.render_message, indices)
+        print(f"\nProfile index vs linear scan: {indexed / baseline:.1f}x")
+        print(f"Templates vs linear scan:     {templated / baseline:.1f}x")
+        measure_sampling(corpus, args.messages)
+    finally:
+        if tmp_dir:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
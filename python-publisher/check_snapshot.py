@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Corpus snapshot check
+Loads a corpus from its source files, writes a snapshot, maps it back and checks that
+the mapped corpus renders the same JSON payloads, binary frames and tweet texts as the
+freshly loaded one for a sample of (user, tweet) pairs, and that open_or_build rebuilds
+truncated copies of the snapshot instead of failing. Uses a synthetic corpus unless
+--data-dir is given; exits non-zero on any difference.
+
+    python check_snapshot.py [--data-dir DIR] [--samples N]
+"""
+
+import argparse
+import os
+import shutil
+import tempfile
+import time
+from datetime import datetime
+
+from benchmark_publisher import sample_indices, write_synthetic_corpus
+from corpus import TweetCorpus, source_fingerprints
+from wire import timestamp_micros
+
+failures = []
+
+
+def check(label, ok, detail):
+    print(f"{'ok  ' if ok else 'FAIL'} {label:<44} {detail}")
+    if not ok:
+        failures.append(label)
+
+
+def compare(label, indices, render_loaded, render_mapped):
+    mismatches = [pair for pair in indices if render_loaded(*pair) != render_mapped(*pair)]
+    check(label, not mismatches,
+          f"{len(indices) - len(mismatches)}/{len(indices)} identical"
+          + (f" (first difference: user {mismatches[0][0]}, tweet {mismatches[0][1]})" if mismatches else ""))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check that a mapped corpus snapshot matches the source files")
+    parser.add_argument('--data-dir', help="Corpus directory (default: generate a synthetic one)")
+    parser.add_argument('--samples', type=int, default=20000, help="(user, tweet) pairs to compare")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    tmp_dir = tempfile.mkdtemp(prefix='snapshot-check-')
+    try:
+        data_dir = args.data_dir
+        if not data_dir:
+            write_synthetic_corpus(tmp_dir, 2000, 10)
+            data_dir = tmp_dir
+        loaded = TweetCorpus.load(data_dir)
+        snapshot = os.path.join(tmp_dir, 'corpus.snapshot')
+        loaded.write_snapshot(snapshot, source_fingerprints(data_dir))
+        mapped = TweetCorpus.open_snapshot(snapshot)
+
+        check("users and tweet counts", (len(mapped), mapped.tweet_total) == (len(loaded), loaded.tweet_total),
+              f"{len(mapped)} users, {mapped.tweet_total} tweets")
+        indices = sample_indices(loaded, args.samples)
+        timestamp, iso = b'2026-01-01 12:00:00', b'2026-01-01T12:00:00'
+        micros = timestamp_micros(datetime(2026, 1, 1, 12))
+        compare("render_message", indices,
+                lambda u, t: loaded.render_message(u, t, timestamp, iso),
+                lambda u, t: mapped.render_message(u, t, timestamp, iso))
+        compare("render_frame", indices,
+                lambda u, t: loaded.render_frame(u, t, micros),
+                lambda u, t: mapped.render_frame(u, t, micros))
+        compare("tweet_text", indices, loaded.tweet_text, mapped.tweet_text)
+
+        size = os.path.getsize(snapshot)
+        broken = []
+        for length in (0, 4, 20, size // 2, size - 1):
+            truncated = os.path.join(tmp_dir, f'truncated-{length}.snapshot')
+            with open(snapshot, 'rb') as source, open(truncated, 'wb') as target:
+                target.write(source.read(length))
+            try:
+                rebuilt = TweetCorpus.open_or_build(data_dir, truncated)
+                if rebuilt.tweet_total != loaded.tweet_total:
+                    broken.append(f"{length}: {rebuilt.tweet_total} tweets")
+            except Exception as e:
+                broken.append(f"{length}: {type(e).__name__}: {e}")
+        check("truncated snapshots are rebuilt", not broken, '; '.join(broken) or "5 lengths")
+    finally:
+        shutil.rmtree(tmp_dir)
+
+    print(f"\n{len(failures)} failed, {time.perf_counter() - start:.1f} s")
+    if failures:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
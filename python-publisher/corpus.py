@@ -0,0 +1,447 @@
+"""
+Compact in-memory tweet corpus
+Streams tweets1.json / users1.json / mbti_labels.csv into contiguous buffers so
+memory follows the raw text size rather than Python object overhead.
+"""
+
+import argparse
+import csv
+import hashlib
+import json
+import logging
+import mmap
+import os
+import struct
+import sys
+from array import array
+
+import wire
+
+logger = logging.getLogger(__name__)
+
+READ_CHUNK_SIZE = 1 << 20
+SOURCE_FILES = ('tweets1.json', 'users1.json', 'mbti_labels.csv')
+
+# Snapshot layout: magic, uint64 metadata length, JSON metadata, then 8-byte aligned sections
+SNAPSHOT_MAGIC = b'TWCORP01'
+SNAPSHOT_HEADER = struct.Struct('<8sQ')
+SNAPSHOT_SECTIONS = ('user_starts', 'offsets', 'text', 'envelope_offsets', 'envelopes')
+# What reading a damaged or truncated snapshot can raise; the snapshot is then rebuilt
+SNAPSHOT_ERRORS = (ValueError, TypeError, KeyError, OSError, struct.error)
+
+
+class UserRecord:
+    """Denormalized profile of one user"""
+    __slots__ = ('user_id', 'screen_name', 'location', 'verified', 'statuses_count',
+                 'total_retweet_count', 'total_favorite_count', 'mbti_personality')
+
+    def __init__(self, user_id, screen_name, location='', verified=False, statuses_count=0,
+                 total_retweet_count=0, total_favorite_count=0, mbti_personality='unknown'):
+        self.user_id = user_id
+        self.screen_name = screen_name
+        self.location = location
+        self.verified = verified
+        self.statuses_count = statuses_count
+        self.total_retweet_count = total_retweet_count
+        self.total_favorite_count = total_favorite_count
+        self.mbti_personality = mbti_personality
+
+    def as_dict(self):
+        return {
+            'user_id': self.user_id,
+            'screen_name': self.screen_name,
+            'location': self.location,
+            'verified': self.verified,
+            'statuses_count': self.statuses_count,
+            'total_retweet_count': self.total_retweet_count,
+            'total_favorite_count': self.total_favorite_count,
+            'mbti_personality': self.mbti_personality
+        }
+
+
+def clean_tweet_text(tweet_text):
+    """Normalize tweet text for publishing"""
+    cleaned_text = tweet_text.encode('utf-8', 'ignore').decode('utf-8')
+    cleaned_text = cleaned_text.replace('\n', ' ').replace('"', '').replace('\\', '')
+    if not cleaned_text.endswith('.'):
+        cleaned_text += '.'
+    return cleaned_text
+
+
+def iter_json_array(path, chunk_size=READ_CHUNK_SIZE):
+    """Yield the elements of a top-level JSON array one at a time without loading the whole file"""
+    decoder = json.JSONDecoder()
+    with open(path, 'r', encoding='utf-8') as file:
+        buffer = file.read(chunk_size)
+        pos = 0
+        eof = not buffer
+
+        def skip(chars):
+            nonlocal pos
+            while pos < len(buffer) and buffer[pos] in chars:
+                pos += 1
+
+        skip(' \t\r\n')
+        if pos >= len(buffer) or buffer[pos] != '[':
+            raise ValueError(f"{path} does not contain a JSON array")
+        pos += 1
+
+        while True:
+            skip(' \t\r\n,')
+            if pos < len(buffer) and buffer[pos] == ']':
+                return
+            try:
+                element, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                # Element straddles the chunk boundary, read more and retry
+                chunk = file.read(chunk_size)
+                eof = not chunk
+                buffer = buffer[pos:] + chunk
+                pos = 0
+                continue
+            pos = end
+            yield element
+            if pos > chunk_size:
+                buffer = buffer[pos:]
+                pos = 0
+
+
+def parse_id(text):
+    """Exact integer id; only ids written as floats (e.g. 1.0e18) go through a double"""
+    try:
+        return int(text)
+    except ValueError:
+        return int(float(text))
+
+
+def load_mbti_labels(path):
+    """Read mbti_labels.csv into an id -> personality mapping"""
+    labels = {}
+    with open(path, 'r', encoding='utf-8', newline='') as file:
+        for row in csv.DictReader(file):
+            try:
+                labels[parse_id(row['id'])] = sys.intern(row['mbti_personality'])
+            except (KeyError, TypeError, ValueError):
+                continue
+    return labels
+
+
+class TweetCorpus:
+    """All tweets packed into one buffer, with array-backed indexes
+
+    Tweet j's text lives at text[offsets[j]:offsets[j + 1]], already cleaned and
+    JSON string-escaped (ASCII), so it can be spliced into a payload as is. User
+    i owns tweets user_starts[i] to user_starts[i + 1] - 1. user_heads[i] and
+    user_tails[i] are the pre-encoded JSON around the tweet text and timestamps.
+    """
+
+    def __init__(self, users, user_starts, offsets, text, user_heads=None, user_tails=None):
+        self.users = users
+        self.user_starts = user_starts
+        self.offsets = offsets
+        self.text = text
+        self.user_index = {user.user_id: idx for idx, user in enumerate(users)}
+        self.frame_heads = None
+        self.frame_tails = None
+        if user_heads is not None:
+            self.user_heads = user_heads
+            self.user_tails = user_tails
+            return
+        
+        self.user_heads = []
+        self.user_tails = []
+        for user in users:
+            self.user_heads.append(
+                f'{{"user_id": {json.dumps(user.user_id)}, "screen_name": {json.dumps(user.screen_name)}, '
+                f'"tweet": "'.encode('ascii'))
+            self.user_tails.append(
+                f', "location": {json.dumps(user.location)}, "verified": {json.dumps(user.verified)}, '
+                f'"statuses_count": {json.dumps(user.statuses_count)}, '
+                f'"mbti_personality": {json.dumps(user.mbti_personality)}, '
+                f'"total_retweet_count": {json.dumps(user.total_retweet_count)}, '
+                f'"total_favorite_count": {json.dumps(user.total_favorite_count)}}}'.encode('ascii'))
+
+    @classmethod
+    def load(cls, data_dir):
+        """Stream the source files of data_dir into a compact corpus"""
+        mbti_lookup = load_mbti_labels(os.path.join(data_dir, 'mbti_labels.csv'))
+        logger.info(f"Loaded {len(mbti_lookup)} MBTI personality labels")
+
+        strings = {}
+        user_info_lookup = {}
+        for user in iter_json_array(os.path.join(data_dir, 'users1.json')):
+            location = user.get('location', '')
+            user_info_lookup[user.get('screen_name')] = (
+                strings.setdefault(location, location),
+                user.get('verified', False),
+                user.get('statuses_count', 0),
+                user.get('total_retweet_count', 0),
+                user.get('total_favorite_count', 0)
+            )
+        logger.info(f"Loaded {len(user_info_lookup)} user profiles")
+
+        users = []
+        user_starts = array('Q', [0])
+        offsets = array('Q', [0])
+        text = bytearray()
+        for user in iter_json_array(os.path.join(data_dir, 'tweets1.json')):
+            user_id = user.get('id')
+            screen_name = user.get('screen_name', '')
+            info = user_info_lookup.get(screen_name, ('', False, 0, 0, 0))
+            users.append(UserRecord(user_id, screen_name, *info,
+                                    mbti_personality=mbti_lookup.get(user_id, 'unknown')))
+
+            for tweet_text in user.get('tweets') or []:
+                text += json.dumps(clean_tweet_text(tweet_text))[1:-1].encode('ascii')
+                offsets.append(len(text))
+            user_starts.append(len(offsets) - 1)
+
+        logger.info(f"Loaded {len(users)} users with {len(offsets) - 1} tweets "
+                    f"({len(text) / 1e6:.1f} MB of text)")
+        # Freeze the buffer, dropping bytearray's growth headroom
+        return cls(users, user_starts, offsets, bytes(text))
+
+    def __len__(self):
+        return len(self.users)
+
+    @property
+    def tweet_total(self):
+        return len(self.offsets) - 1
+
+    def tweet_count(self, user_idx):
+        return self.user_starts[user_idx + 1] - self.user_starts[user_idx]
+
+    def encoded_text(self, user_idx, tweet_idx):
+        """JSON-escaped bytes of one tweet (a copy when the text is a mapped snapshot section)"""
+        j = self.user_starts[user_idx] + tweet_idx
+        return bytes(self.text[self.offsets[j]:self.offsets[j + 1]])
+
+    def tweet_text(self, user_idx, tweet_idx):
+        """Cleaned text of one tweet"""
+        return json.loads(b'"' + self.encoded_text(user_idx, tweet_idx) + b'"')
+
+    def utf8_text(self, user_idx, tweet_idx):
+        """UTF-8 bytes of one tweet; escape-free text is plain ASCII and used as is"""
+        encoded = self.encoded_text(user_idx, tweet_idx)
+        if b'\\' not in encoded:
+            return encoded
+        return self.tweet_text(user_idx, tweet_idx).encode('utf-8', 'replace')
+
+    def render_message(self, user_idx, tweet_idx, timestamp_text, iso_text):
+        """JSON payload bytes of one tweet with pre-formatted ASCII timestamps"""
+        j = self.user_starts[user_idx] + tweet_idx
+        return b''.join((
+            self.user_heads[user_idx],
+            self.text[self.offsets[j]:self.offsets[j + 1]],
+            b'", "timestamp": "', timestamp_text,
+            b'", "iso_timestamp": "', iso_text, b'"',
+            self.user_tails[user_idx]
+        ))
+
+    def render_frame(self, user_idx, tweet_idx, micros):
+        """Binary frame bytes (see wire.py) of one tweet published at micros"""
+        if self.frame_heads is None:
+            # Built on first use, JSON-only publishers never pay for them
+            self.frame_heads = [wire.frame_head(user) for user in self.users]
+            self.frame_tails = [wire.frame_tail(user) for user in self.users]
+        text = self.utf8_text(user_idx, tweet_idx)
+        return b''.join((
+            self.frame_heads[user_idx],
+            wire.encode_long(micros),
+            wire.encode_long(len(text)), text,
+            self.frame_tails[user_idx]
+        ))
+
+    def get_profile(self, user_id):
+        idx = self.user_index.get(user_id)
+        return self.users[idx] if idx is not None else None
+
+    def write_snapshot(self, path, sources):
+        """Write the corpus to a binary snapshot that open_snapshot can mmap"""
+        mbti_codes = sorted({user.mbti_personality for user in self.users})
+        code_of = {mbti: code for code, mbti in enumerate(mbti_codes)}
+
+        envelope_offsets = array('Q', [0])
+        envelopes = bytearray()
+        for head, tail in zip(self.user_heads, self.user_tails):
+            envelopes += head
+            envelope_offsets.append(len(envelopes))
+            envelopes += tail
+            envelope_offsets.append(len(envelopes))
+
+        payloads = {
+            'user_starts': self.user_starts.tobytes(),
+            'offsets': self.offsets.tobytes(),
+            'text': bytes(self.text),
+            'envelope_offsets': envelope_offsets.tobytes(),
+            'envelopes': bytes(envelopes),
+        }
+        meta = {
+            'sources': sources,
+            'mbti_codes': mbti_codes,
+            'users': [[u.user_id, u.screen_name, u.location, u.verified, u.statuses_count,
+                       u.total_retweet_count, u.total_favorite_count, code_of[u.mbti_personality]]
+                      for u in self.users],
+            'sections': {},
+        }
+
+        # Section offsets depend on the metadata length, so lay them out relative to its end
+        position = 0
+        for name in SNAPSHOT_SECTIONS:
+            meta['sections'][name] = [position, len(payloads[name])]
+            position += _aligned(len(payloads[name]))
+        meta_bytes = json.dumps(meta, separators=(',', ':')).encode('utf-8')
+        base = _aligned(SNAPSHOT_HEADER.size + len(meta_bytes))
+
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, 'wb') as file:
+                file.write(SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, len(meta_bytes)))
+                file.write(meta_bytes)
+                file.write(b'\0' * (base - SNAPSHOT_HEADER.size - len(meta_bytes)))
+                for name in SNAPSHOT_SECTIONS:
+                    file.write(payloads[name])
+                    file.write(b'\0' * (_aligned(len(payloads[name])) - len(payloads[name])))
+            # Atomic swap so concurrently starting publishers never see a partial file
+            os.replace(tmp_path, path)
+        except BaseException:
+            # E.g. a full disk: leave no partial file behind
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        logger.info(f"Wrote corpus snapshot {path} ({base + position} bytes)")
+
+    @classmethod
+    def open_snapshot(cls, path):
+        """Map a snapshot read-only; processes mapping the same file share its pages"""
+        with open(path, 'rb') as file:
+            mm = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, meta_len = SNAPSHOT_HEADER.unpack_from(mm, 0)
+        if magic != SNAPSHOT_MAGIC:
+            mm.close()
+            raise ValueError(f"{path} is not a corpus snapshot")
+        meta = json.loads(mm[SNAPSHOT_HEADER.size:SNAPSHOT_HEADER.size + meta_len])
+        base = _aligned(SNAPSHOT_HEADER.size + meta_len)
+
+        view = memoryview(mm)
+        sections = {}
+        for name, (start, length) in meta['sections'].items():
+            if base + start + length > len(mm):
+                raise ValueError(f"{path} is truncated ({len(mm)} bytes, section {name} ends at "
+                                 f"{base + start + length})")
+            sections[name] = view[base + start:base + start + length]
+
+        mbti_codes = meta['mbti_codes']
+        users = [UserRecord(user_id, screen_name, location, verified, statuses, retweets, favorites,
+                            mbti_codes[code])
+                 for user_id, screen_name, location, verified, statuses, retweets, favorites, code
+                 in meta['users']]
+
+        envelope_offsets = sections['envelope_offsets'].cast('Q')
+        envelopes = sections['envelopes']
+        user_heads = [bytes(envelopes[envelope_offsets[2 * i]:envelope_offsets[2 * i + 1]])
+                      for i in range(len(users))]
+        user_tails = [bytes(envelopes[envelope_offsets[2 * i + 1]:envelope_offsets[2 * i + 2]])
+                      for i in range(len(users))]
+
+        # Offsets are relative to the text section, not the file
+        corpus = cls(users, sections['user_starts'].cast('Q'), sections['offsets'].cast('Q'),
+                     sections['text'], user_heads, user_tails)
+        corpus.sources = meta['sources']
+        logger.info(f"Mapped corpus snapshot {path}: {len(users)} users, {corpus.tweet_total} tweets")
+        return corpus
+
+    @classmethod
+    def open_or_build(cls, data_dir, snapshot_path):
+        """Map snapshot_path if it matches the source files, otherwise rebuild it"""
+        if os.path.exists(snapshot_path):
+            try:
+                corpus = cls.open_snapshot(snapshot_path)
+                if snapshot_is_current(corpus.sources, data_dir):
+                    return corpus
+                logger.info(f"Corpus snapshot {snapshot_path} is stale, rebuilding")
+            except SNAPSHOT_ERRORS as e:
+                logger.warning(f"Ignoring unreadable corpus snapshot {snapshot_path}: {e}")
+
+        return compile_corpus(data_dir, snapshot_path)
+
+
+def _aligned(size, alignment=8):
+    return (size + alignment - 1) // alignment * alignment
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(READ_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def source_fingerprints(data_dir):
+    """Size, mtime and content hash of each source file"""
+    fingerprints = {}
+    for name in SOURCE_FILES:
+        path = os.path.join(data_dir, name)
+        stat = os.stat(path)
+        fingerprints[name] = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns,
+                              'sha256': file_sha256(path)}
+    return fingerprints
+
+
+def snapshot_is_current(sources, data_dir):
+    """Compare recorded fingerprints with the source files, hashing only when size or mtime moved"""
+    for name in SOURCE_FILES:
+        recorded = sources.get(name)
+        path = os.path.join(data_dir, name)
+        if recorded is None or not os.path.exists(path):
+            return False
+        stat = os.stat(path)
+        if stat.st_size != recorded['size']:
+            return False
+        if stat.st_mtime_ns != recorded['mtime_ns'] and file_sha256(path) != recorded['sha256']:
+            return False
+    return True
+
+
+def compile_corpus(data_dir, snapshot_path):
+    """Build the corpus from the source files and write its snapshot"""
+    sources = source_fingerprints(data_dir)
+    corpus = TweetCorpus.load(data_dir)
+    try:
+        corpus.write_snapshot(snapshot_path, sources)
+    except OSError as e:
+        # A read-only data directory only costs the faster startup next time
+        logger.warning(f"Could not write corpus snapshot {snapshot_path}: {e}")
+    corpus.sources = sources
+    return corpus
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Compile the tweet corpus into a memory-mappable snapshot")
+    parser.add_argument('command', choices=('compile', 'check'),
+                        help="compile: (re)build the snapshot; check: report whether it is current")
+    parser.add_argument('--data-dir', default=os.getenv('DATA_DIR', '/app/data'))
+    parser.add_argument('--snapshot', default=None, help="Snapshot path (default: <data-dir>/corpus.snapshot)")
+    args = parser.parse_args()
+    snapshot = args.snapshot or os.path.join(args.data_dir, 'corpus.snapshot')
+
+    if args.command == 'compile':
+        compile_corpus(args.data_dir, snapshot)
+        return
+
+    try:
+        current = snapshot_is_current(TweetCorpus.open_snapshot(snapshot).sources, args.data_dir)
+    except SNAPSHOT_ERRORS as e:
+        logger.error(f"Cannot read snapshot {snapshot}: {e}")
+        sys.exit(2)
+    logger.info(f"Snapshot {snapshot} is {'current' if current else 'stale'}")
+    sys.exit(0 if current else 1)
+
+
+if __name__ == "__main__":
+    main()
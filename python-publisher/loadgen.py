@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+"""
+High-rate load generator for the tweet pipeline
+Paces MQTT publishing with a token bucket and shapes the target rate with
+constant, step, ramp, sine or spike profiles across several worker processes.
+"""
+
+import argparse
+import logging
+import math
+import multiprocessing as mp
+import os
+import time
+
+import paho.mqtt.client as mqtt
+
+from publisher import (MQTT_BROKER, MQTT_PORT, MQTT_TOPIC, SAMPLE_DISTRIBUTION, SAMPLE_SEED,
+                       WIRE_FORMAT, ZIPF_EXPONENT, TwitterDataPublisher)
+from sampler import DISTRIBUTIONS
+from wire import WIRE_FORMATS
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+PROFILES = ('constant', 'step', 'ramp', 'sine', 'spike')
+
+# Per-worker slots in the shared counter array
+SENT, ERRORS, ACKED = 0, 1, 2
+COUNTERS_PER_WORKER = 3
+
+
+class TokenBucket:
+    """Token bucket refilled continuously at `rate` tokens/sec, holding at most `capacity`"""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = max(capacity, 1.0)
+        self.tokens = 0.0
+        self.updated = time.perf_counter()
+
+    def set_rate(self, rate):
+        self.refill()
+        self.rate = max(rate, 0.0)
+
+    def refill(self):
+        now = time.perf_counter()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def take(self, max_tokens):
+        """Take up to max_tokens whole tokens, waiting only as long as the first one needs"""
+        self.refill()
+        if self.tokens < 1.0:
+            if self.rate <= 0:
+                time.sleep(0.01)
+                return 0
+            deficit = (1.0 - self.tokens) / self.rate
+            time.sleep(deficit)
+            self.refill()
+
+        granted = min(int(self.tokens), max_tokens)
+        self.tokens -= granted
+        return granted
+
+
+class RateProfile:
+    """Target publish rate (msgs/sec) as a function of elapsed seconds"""
+
+    def __init__(self, kind, rate, period=60.0, steps=5, amplitude=0.5, spike_factor=5.0,
+                 spike_seconds=5.0):
+        if kind not in PROFILES:
+            raise ValueError(f"Unknown rate profile: {kind}")
+        self.kind = kind
+        self.rate = rate
+        self.period = period
+        self.steps = steps
+        self.amplitude = amplitude
+        self.spike_factor = spike_factor
+        self.spike_seconds = spike_seconds
+
+    def rate_at(self, elapsed):
+        if self.kind == 'step':
+            # Climb to the target in `steps` equal increments, one per period
+            step = min(int(elapsed // self.period) + 1, self.steps)
+            return self.rate * step / self.steps
+        if self.kind == 'ramp':
+            return self.rate * min(elapsed / self.period, 1.0)
+        if self.kind == 'sine':
+            return self.rate * (1.0 + self.amplitude * math.sin(2 * math.pi * elapsed / self.period))
+        if self.kind == 'spike':
+            # Burst to spike_factor x the base rate for spike_seconds at the start of every period
+            if elapsed % self.period < self.spike_seconds:
+                return self.rate * self.spike_factor
+            return self.rate
+        return self.rate
+
+    def peak_rate(self):
+        if self.kind == 'sine':
+            return self.rate * (1.0 + self.amplitude)
+        if self.kind == 'spike':
+            return self.rate * self.spike_factor
+        return self.rate
+
+
+def run_worker(worker_id, workers, publisher, profile, args, counters, stop_event):
+    """Publish with a dedicated MQTT client until the duration ends or stop_event is set"""
+    base = worker_id * COUNTERS_PER_WORKER
+    acked = [0]
+
+    # Forked workers would otherwise replay the parent's random stream in lockstep
+    seed = None if args.seed is None else args.seed + worker_id
+    publisher.set_sampler(args.distribution, seed, args.zipf_exponent)
+
+    def on_publish(client, userdata, mid):
+        acked[0] += 1
+
+    client = mqtt.Client(client_id=f"loadgen-{os.getpid()}-{worker_id}")
+    client.on_publish = on_publish
+    client.max_inflight_messages_set(args.max_inflight)
+    client.max_queued_messages_set(args.max_queued)
+    client.connect(args.broker, args.port, 60)
+    client.loop_start()
+
+    bucket = TokenBucket(profile.rate_at(0) / workers, args.burst / workers)
+    sent = errors = 0
+    started = time.perf_counter()
+    last_flush = started
+
+    try:
+        while not stop_event.is_set():
+            now = time.perf_counter()
+            elapsed = now - started
+            if args.duration and elapsed >= args.duration:
+                break
+            bucket.set_rate(profile.rate_at(elapsed) / workers)
+
+            for _ in range(bucket.take(args.chunk)):
+                user_idx, tweet_idx = next(publisher.sampler)
+                result = client.publish(args.topic, publisher.render_message(user_idx, tweet_idx), qos=args.qos)
+                if result.rc == mqtt.MQTT_ERR_SUCCESS:
+                    sent += 1
+                else:
+                    errors += 1
+
+            # Shared counters are only touched a few times per second
+            if now - last_flush >= 0.1:
+                counters[base + SENT] = sent
+                counters[base + ERRORS] = errors
+                counters[base + ACKED] = acked[0]
+                last_flush = now
+    except KeyboardInterrupt:
+        pass
+    finally:
+        client.loop_stop()
+        client.disconnect()
+        counters[base + SENT] = sent
+        counters[base + ERRORS] = errors
+        counters[base + ACKED] = acked[0]
+
+
+def totals(counters, workers):
+    sent = sum(counters[w * COUNTERS_PER_WORKER + SENT] for w in range(workers))
+    errors = sum(counters[w * COUNTERS_PER_WORKER + ERRORS] for w in range(workers))
+    acked = sum(counters[w * COUNTERS_PER_WORKER + ACKED] for w in range(workers))
+    return sent, errors, acked
+
+
+def report(counters, workers, profile, started, processes, interval):
+    """Log achieved rate, publish errors and in-flight messages every interval"""
+    last_sent, last_time = 0, started
+    while any(p.is_alive() for p in processes):
+        time.sleep(interval)
+        now = time.perf_counter()
+        sent, errors, acked = totals(counters, workers)
+        rate = (sent - last_sent) / (now - last_time)
+        logger.info(f"Load stats - Target: {profile.rate_at(now - started):,.0f} msg/s, "
+                    f"Achieved: {rate:,.0f} msg/s, Sent: {sent}, Errors: {errors}, "
+                    f"In flight: {sent - acked}")
+        last_sent, last_time = sent, now
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Token-bucket paced MQTT load generator")
+    parser.add_argument('--rate', type=float, default=1000, help="Target (base) rate in msgs/sec across all workers")
+    parser.add_argument('--profile', choices=PROFILES, default='constant', help="Rate profile")
+    parser.add_argument('--period', type=float, default=60, help="Profile period / step length / ramp time in seconds")
+    parser.add_argument('--steps', type=int, default=5, help="Number of steps for the step profile")
+    parser.add_argument('--amplitude', type=float, default=0.5, help="Relative amplitude of the sine profile")
+    parser.add_argument('--spike-factor', type=float, default=5, help="Rate multiplier during a spike")
+    parser.add_argument('--spike-seconds', type=float, default=5, help="Spike length at the start of each period")
+    parser.add_argument('--distribution', choices=DISTRIBUTIONS, default=SAMPLE_DISTRIBUTION,
+                        help="(user, tweet) sampling distribution")
+    parser.add_argument('--seed', type=int, default=SAMPLE_SEED, help="Base seed for reproducible runs (worker i uses seed + i)")
+    parser.add_argument('--zipf-exponent', type=float, default=ZIPF_EXPONENT, help="Skew of the zipf distribution")
+    parser.add_argument('--burst', type=float, default=None, help="Token bucket capacity (default: 0.1 s of peak rate)")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="Worker processes, one MQTT client each")
+    parser.add_argument('--duration', type=float, default=0, help="Seconds to run (0 = until interrupted)")
+    parser.add_argument('--report-interval', type=float, default=5, help="Seconds between stats lines")
+    parser.add_argument('--chunk', type=int, default=256, help="Max messages published per bucket grant")
+    parser.add_argument('--qos', type=int, choices=(0, 1, 2), default=0, help="MQTT QoS")
+    parser.add_argument('--max-inflight', type=int, default=1000, help="Paho in-flight window for QoS > 0")
+    parser.add_argument('--max-queued', type=int, default=100000, help="Paho outgoing queue limit (0 = unbounded)")
+    parser.add_argument('--wire-format', choices=WIRE_FORMATS, default=WIRE_FORMAT, help="Payload encoding")
+    parser.add_argument('--broker', default=MQTT_BROKER)
+    parser.add_argument('--port', type=int, default=MQTT_PORT)
+    parser.add_argument('--topic', default=MQTT_TOPIC)
+    args = parser.parse_args()
+
+    profile = RateProfile(args.profile, args.rate, period=args.period, steps=args.steps,
+                          amplitude=args.amplitude, spike_factor=args.spike_factor,
+                          spike_seconds=args.spike_seconds)
+    if args.burst is None:
+        args.burst = max(profile.peak_rate() * 0.1, args.workers)
+
+    # Load the corpus once; forked workers share it copy-on-write
+    publisher = TwitterDataPublisher(wire_format=args.wire_format)
+    ctx = mp.get_context('fork')
+    counters = ctx.Array('q', args.workers * COUNTERS_PER_WORKER, lock=False)
+    stop_event = ctx.Event()
+
+    logger.info(f"Starting load generator: {args.workers} workers, {args.profile} profile, "
+                f"base rate {args.rate:,.0f} msg/s, burst {args.burst:,.0f}")
+    processes = [
+        ctx.Process(target=run_worker,
+                    args=(w, args.workers, publisher, profile, args, counters, stop_event))
+        for w in range(args.workers)
+    ]
+    started = time.perf_counter()
+    for process in processes:
+        process.start()
+
+    try:
+        report(counters, args.workers, profile, started, processes, args.report_interval)
+    except KeyboardInterrupt:
+        logger.info("Stopping load generator...")
+        stop_event.set()
+    finally:
+        for process in processes:
+            process.join()
+        elapsed = time.perf_counter() - started
+        sent, errors, acked = totals(counters, args.workers)
+        logger.info(f"Load generator finished - Sent: {sent}, Errors: {errors}, "
+                    f"Average rate: {sent / elapsed:,.0f} msg/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,18 @@
-import json
-import numpy as np
-import pandas as pd
 from datetime import datetime
 import time
+import threading
 import paho.mqtt.client as mqtt
 import os
 import logging
 
+from corpus import TweetCorpus
+from histogram import LatencyHistogram, format_summary
+from metrics import MetricsRegistry, serve
+from profiling import SignalProfiler
+from sampled_log import SampledLog
+from sampler import TweetSampler
+from wire import WIRE_FORMATS, timestamp_micros
+
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
@@ -15,110 +21,147 @@ logger = logging.getLogger(__name__)
 MQTT_BROKER = os.getenv('MQTT_BROKER', 'localhost')
 MQTT_PORT = int(os.getenv('MQTT_PORT', 1883))
 MQTT_TOPIC = os.getenv('MQTT_TOPIC', 'twitter/tweets')
+DATA_DIR = os.getenv('DATA_DIR', '/app/data')
+PUBLISH_INTERVAL = float(os.getenv('PUBLISH_INTERVAL', 2))
+# Seconds between publish latency lines (publish() call to on_publish, i.e. handed to the broker)
+PUBLISH_STATS_INTERVAL = int(os.getenv('PUBLISH_STATS_INTERVAL', 60))
+# Seconds between per-message log lines (0 logs every message)
+PUBLISH_LOG_INTERVAL = float(os.getenv('PUBLISH_LOG_INTERVAL', 10))
+# Prometheus /metrics endpoint (see pipeline-common/metrics.py); 0 disables it
+METRICS_PORT = int(os.getenv('METRICS_PORT', 9400))
+# Memory-mapped corpus snapshot (default <data dir>/corpus.snapshot); an empty string
+# disables it and always parses the source files
+CORPUS_SNAPSHOT = os.getenv('CORPUS_SNAPSHOT')
+
+# Sampling: 'tweet' (uniform per tweet), 'user' (uniform per user) or 'zipf' (celebrity skew)
+SAMPLE_DISTRIBUTION = os.getenv('SAMPLE_DISTRIBUTION', 'tweet')
+SAMPLE_SEED = int(os.environ['SAMPLE_SEED']) if os.getenv('SAMPLE_SEED') else None
+ZIPF_EXPONENT = float(os.getenv('ZIPF_EXPONENT', 1.1))
+# Payload encoding: 'json' or 'avro' (binary frames, see wire.py)
+WIRE_FORMAT = os.getenv('WIRE_FORMAT', 'json')
 
 class TwitterDataPublisher:
-    def __init__(self):
+    def __init__(self, data_dir=DATA_DIR, snapshot_path=CORPUS_SNAPSHOT,
+                 distribution=SAMPLE_DISTRIBUTION, seed=SAMPLE_SEED, wire_format=WIRE_FORMAT):
+        if wire_format not in WIRE_FORMATS:
+            raise ValueError(f"Unknown wire format: {wire_format}")
+        self.data_dir = data_dir
+        self.wire_format = wire_format
+        if snapshot_path is None:
+            snapshot_path = os.path.join(data_dir, 'corpus.snapshot')
+        self.snapshot_path = snapshot_path
         self.client = mqtt.Client()
         self.client.on_connect = self.on_connect
         self.client.on_publish = self.on_publish
         self.client.on_disconnect = self.on_disconnect
         
+        # mid -> perf_counter() at publish(); on_publish turns it into a latency sample. publish()
+        # runs under the lock, so the callback cannot look up a mid before it is stored
+        self.publish_lock = threading.RLock()
+        self.publish_started = {}
+        self.publish_latency = LatencyHistogram()
+        self.reported_latency = LatencyHistogram()
+        
+        self.connected = False
+        self.metrics = MetricsRegistry()
+        self.published = self.metrics.counter('publisher_messages_published_total', "Messages handed to the MQTT client")
+        self.publish_errors = self.metrics.counter('publisher_publish_errors_total', "Failed MQTT publish calls")
+        self.metrics.gauge('publisher_mqtt_connected', "1 while connected to the MQTT broker",
+                           function=lambda: int(self.connected))
+        self.metrics.histogram('publisher_publish_latency_seconds', "MQTT publish() call to on_publish",
+                               histogram=self.publish_latency, lock=self.publish_lock)
+        self.published_log = SampledLog(logger, PUBLISH_LOG_INTERVAL)
+        self.error_log = SampledLog(logger, PUBLISH_LOG_INTERVAL, logging.ERROR)
+        
+        # Per-second cache of the formatted timestamp
+        self.timestamp_second = None
+        self.timestamp_text = b''
+        
         # Load data files
         self.load_data()
+        self.set_sampler(distribution, seed)
         
     def on_connect(self, client, userdata, flags, rc):
         if rc == 0:
+            self.connected = True
             logger.info(f"Connected to MQTT broker at {MQTT_BROKER}:{MQTT_PORT}")
         else:
             logger.error(f"Failed to connect to MQTT broker. Return code: {rc}")
     
     def on_publish(self, client, userdata, mid):
-        logger.debug(f"Message {mid} published successfully")
+        with self.publish_lock:
+            started = self.publish_started.pop(mid, None)
+            if started is not None:
+                self.publish_latency.record((time.perf_counter() - started) * 1e6)
+        logger.debug("Message %s published successfully", mid)
     
     def on_disconnect(self, client, userdata, rc):
+        self.connected = False
         logger.warning(f"Disconnected from MQTT broker. Return code: {rc}")
     
     def load_data(self):
         """Load Twitter data files"""
         try:
-            # Load tweets data
-            with open('/app/data/tweets1.json', 'r', encoding='utf-8') as file:
-                self.tweets_data = json.load(file)
-            logger.info(f"Loaded {len(self.tweets_data)} users with tweets")
-            
-            # Load user info
-            with open('/app/data/users1.json', 'r', encoding='utf-8') as file:
-                self.users_data = json.load(file)
-            logger.info(f"Loaded {len(self.users_data)} user profiles")
-            
-            # Load MBTI labels
-            self.mbti_data = pd.read_csv('/app/data/mbti_labels.csv')
-            logger.info(f"Loaded {len(self.mbti_data)} MBTI personality labels")
-            
-            # Create user lookup for MBTI
-            self.mbti_lookup = dict(zip(self.mbti_data['id'], self.mbti_data['mbti_personality']))
-            
-            # Create user info lookup
-            self.user_info_lookup = {user['screen_name']: user for user in self.users_data}
-            
+            if self.snapshot_path:
+                # Map the compiled snapshot, rebuilding it when the source files changed
+                self.corpus = TweetCorpus.open_or_build(self.data_dir, self.snapshot_path)
+            else:
+                # Stream the source files into a compact, pre-encoded corpus
+                self.corpus = TweetCorpus.load(self.data_dir)
         except Exception as e:
             logger.error(f"Error loading data files: {e}")
             raise
     
     def get_user_info(self, user_id):
         """Get user information by user_id"""
-        # Find user in tweets data first
-        user_tweets = None
-        for user in self.tweets_data:
-            if user.get('id') == user_id:
-                user_tweets = user
-                break
+        profile = self.corpus.get_profile(user_id)
+        return profile.as_dict() if profile else None
+    
+    def render_message(self, user_idx, tweet_idx, now=None):
+        """Return the payload for a (user, tweet) pair as bytes, using the pre-encoded corpus"""
+        if now is None:
+            now = datetime.now()
         
-        if not user_tweets:
-            return None
-            
-        # Get screen name and look up additional info
-        screen_name = user_tweets.get('screen_name', '')
-        user_info = self.user_info_lookup.get(screen_name, {})
+        if self.wire_format == 'avro':
+            return self.corpus.render_frame(user_idx, tweet_idx, timestamp_micros(now))
         
-        return {
-            'user_id': user_id,
-            'screen_name': screen_name,
-            'location': user_info.get('location', ''),
-            'verified': user_info.get('verified', False),
-            'statuses_count': user_info.get('statuses_count', 0),
-            'total_retweet_count': user_info.get('total_retweet_count', 0),
-            'total_favorite_count': user_info.get('total_favorite_count', 0),
-            'mbti_personality': self.mbti_lookup.get(user_id, 'unknown')
-        }
+        second = now.replace(microsecond=0)
+        if second != self.timestamp_second:
+            self.timestamp_second = second
+            self.timestamp_text = second.strftime("%Y-%m-%d %H:%M:%S").encode('ascii')
+        
+        return self.corpus.render_message(user_idx, tweet_idx, self.timestamp_text, now.isoformat().encode('ascii'))
     
-    def create_tweet_message(self, user_data, tweet_text):
+    def create_tweet_message(self, user_idx, tweet_idx, now=None):
         """Create a structured tweet message"""
-        now = datetime.now()
+        if now is None:
+            now = datetime.now()
         
-        # Clean tweet text
-        cleaned_text = tweet_text.encode('utf-8', 'ignore').decode('utf-8')
-        cleaned_text = cleaned_text.replace('\n', ' ').replace('"', '').replace('\\', '')
-        if not cleaned_text.endswith('.'):
-            cleaned_text += '.'
+        user = self.corpus.users[user_idx]
         
-        user_info = self.get_user_info(user_data['id'])
-        
-        message = {
-            'user_id': user_data['id'],
-            'screen_name': user_data.get('screen_name', ''),
-            'tweet': cleaned_text,
+        return {
+            'user_id': user.user_id,
+            'screen_name': user.screen_name,
+            'tweet': self.corpus.tweet_text(user_idx, tweet_idx),
             'timestamp': now.strftime("%Y-%m-%d %H:%M:%S"),
             'iso_timestamp': now.isoformat(),
-            'location': user_info.get('location', '') if user_info else '',
-            'verified': user_info.get('verified', False) if user_info else False,
-            'statuses_count': user_info.get('statuses_count', 0) if user_info else 0,
-            'mbti_personality': user_info.get('mbti_personality', 'unknown') if user_info else 'unknown',
-            'total_retweet_count': user_info.get('total_retweet_count', 0) if user_info else 0,
-            'total_favorite_count': user_info.get('total_favorite_count', 0) if user_info else 0
+            'location': user.location,
+            'verified': user.verified,
+            'statuses_count': user.statuses_count,
+            'mbti_personality': user.mbti_personality,
+            'total_retweet_count': user.total_retweet_count,
+            'total_favorite_count': user.total_favorite_count
         }
-        
-        return message
+    
+    def set_sampler(self, distribution=SAMPLE_DISTRIBUTION, seed=SAMPLE_SEED, zipf_exponent=ZIPF_EXPONENT):
+        """Choose how (user, tweet) pairs are drawn; a seed makes the sequence reproducible"""
+        self.sampler = TweetSampler(self.corpus, distribution, seed=seed, zipf_exponent=zipf_exponent)
+        logger.info(f"Sampling tweets with the '{distribution}' distribution"
+                    + (f" (seed {seed})" if seed is not None else ""))
+    
+    def pick_random_tweet(self):
+        """Select the next (user_idx, tweet_idx) pair from the sampler"""
+        return next(self.sampler)
     
     def connect_mqtt(self):
         """Connect to MQTT broker"""
@@ -130,36 +173,54 @@ class TwitterDataPublisher:
             logger.error(f"Error connecting to MQTT broker: {e}")
             return False
     
+    def log_latency(self):
+        """Log publish latency percentiles since the previous call"""
+        with self.publish_lock:
+            current = self.publish_latency.copy()
+        summary = current.since(self.reported_latency).summary()
+        self.reported_latency = current
+        if summary['count']:
+            logger.info(f"Publish latency - {format_summary(summary)}")
+    
     def publish_tweets(self):
         """Main loop to publish tweets"""
         if not self.connect_mqtt():
             return
         
+        serve(self.metrics, METRICS_PORT)
+        SignalProfiler('publisher').install()
         logger.info("Starting tweet publishing...")
+        last_stats = time.time()
         
         while True:
             try:
                 # Select random user and tweet
-                user_idx = np.random.randint(len(self.tweets_data))
-                user_data = self.tweets_data[user_idx]
+                user_idx, tweet_idx = self.pick_random_tweet()
+                user = self.corpus.users[user_idx]
+                
+                # Render the pre-encoded message
+                payload = self.render_message(user_idx, tweet_idx)
                 
-                if 'tweets' in user_data and len(user_data['tweets']) > 0:
-                    tweet_idx = np.random.randint(len(user_data['tweets']))
-                    tweet_text = user_data['tweets'][tweet_idx]
-                    
-                    # Create message
-                    message = self.create_tweet_message(user_data, tweet_text)
-                    
-                    # Publish to MQTT
-                    result = self.client.publish(MQTT_TOPIC, json.dumps(message))
-                    
+                # Publish to MQTT
+                with self.publish_lock:
+                    started = time.perf_counter()
+                    result = self.client.publish(MQTT_TOPIC, payload)
                     if result.rc == mqtt.MQTT_ERR_SUCCESS:
-                        logger.info(f"Published tweet from user {message['screen_name']} (ID: {message['user_id']})")
-                    else:
-                        logger.error(f"Failed to publish message. Return code: {result.rc}")
+                        self.publish_started[result.mid] = started
+                
+                if result.rc == mqtt.MQTT_ERR_SUCCESS:
+                    self.published.inc()
+                    self.published_log("Published tweet from user %s (ID: %s)", user.screen_name, user.user_id)
+                else:
+                    self.publish_errors.inc()
+                    self.error_log("Failed to publish message. Return code: %s", result.rc)
+                
+                if time.time() - last_stats >= PUBLISH_STATS_INTERVAL:
+                    self.log_latency()
+                    last_stats = time.time()
                 
-                # Wait 2 seconds before next tweet
-                time.sleep(2)
+                # Wait before next tweet
+                time.sleep(PUBLISH_INTERVAL)
                 
             except KeyboardInterrupt:
                 logger.info("Stopping tweet publisher...")
@@ -0,0 +1,81 @@
+"""
+Binary wire format of tweet messages
+Besides JSON, messages can travel as Avro binary encoding of TWEET_SCHEMA, framed the
+way Druid's multiple_schemas_inline decoder reads them: the version byte 1, the
+schema id as a 4-byte big-endian integer, then the Avro body. JSON payloads always
+start with '{', so the first byte tells the bridge and the consumer which format a
+payload is in. The schema is also kept in config/schemas/tweet-1.avsc.
+
+Field order is part of the format: user_id comes first so the bridge can read the
+partition key without decoding the rest, and the profile fields come last, so a
+user's messages all end with the same bytes (the consumer caches their decoding).
+"""
+
+import struct
+from datetime import datetime
+
+WIRE_FORMATS = ('json', 'avro')
+
+FRAME_VERSION = 1
+FRAME_HEADER = struct.Struct('>BI')
+TWEET_SCHEMA_ID = 1
+
+TWEET_SCHEMA = {
+    'type': 'record',
+    'name': 'Tweet',
+    'namespace': 'twitter',
+    'fields': [
+        {'name': 'user_id', 'type': 'long'},
+        # Microseconds since the epoch of the naive (UTC) publish time
+        {'name': 'timestamp', 'type': {'type': 'long', 'logicalType': 'timestamp-micros'}},
+        {'name': 'tweet', 'type': 'string'},
+        {'name': 'screen_name', 'type': 'string'},
+        {'name': 'location', 'type': 'string'},
+        {'name': 'verified', 'type': 'boolean'},
+        {'name': 'statuses_count', 'type': 'long'},
+        {'name': 'mbti_personality', 'type': 'string'},
+        {'name': 'total_retweet_count', 'type': 'long'},
+        {'name': 'total_favorite_count', 'type': 'long'},
+    ],
+}
+
+EPOCH = datetime(1970, 1, 1)
+
+
+def encode_long(value):
+    """Avro long: zig-zag encoded base-128 varint"""
+    value = (value << 1) ^ (value >> 63)
+    out = bytearray()
+    while value > 0x7f:
+        out.append(value & 0x7f | 0x80)
+        value >>= 7
+    out.append(value)
+    return bytes(out)
+
+
+def encode_string(text):
+    data = text.encode('utf-8')
+    return encode_long(len(data)) + data
+
+
+def timestamp_micros(moment):
+    delta = moment - EPOCH
+    return (delta.days * 86400 + delta.seconds) * 1000000 + delta.microseconds
+
+
+def frame_head(user):
+    """Frame header and user_id: the bytes before the timestamp"""
+    return FRAME_HEADER.pack(FRAME_VERSION, TWEET_SCHEMA_ID) + encode_long(user.user_id)
+
+
+def frame_tail(user):
+    """Profile fields: the bytes after the tweet text"""
+    return b''.join((
+        encode_string(user.screen_name or ''),
+        encode_string(user.location or ''),
+        b'\x01' if user.verified else b'\x00',
+        encode_long(user.statuses_count or 0),
+        encode_string(user.mbti_personality or 'unknown'),
+        encode_long(user.total_retweet_count or 0),
+        encode_long(user.total_favorite_count or 0),
+    ))
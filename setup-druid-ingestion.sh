@@ -9,12 +9,16 @@ done
 
 echo "Druid is ready!"
 
-# Submit ingestion spec
-echo "Submitting Druid ingestion specification..."
+# Submit ingestion spec; WIRE_FORMAT=avro when the publisher sends binary frames
+SPEC=config/druid/twitter-ingestion-spec.json
+if [ "${WIRE_FORMAT:-json}" = "avro" ]; then
+    SPEC=config/druid/twitter-ingestion-spec-avro.json
+fi
+echo "Submitting Druid ingestion specification $SPEC..."
 curl -X POST \
   http://localhost:8888/druid/indexer/v1/supervisor \
   -H 'Content-Type: application/json' \
-  -d @config/druid/twitter-ingestion-spec.json
+  -d @$SPEC
 
 echo "Druid ingestion specification submitted!"
 